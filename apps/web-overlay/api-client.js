@@ -112,6 +112,8 @@ class ApiClient {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          // 剩余预算，服务端据此丢弃客户端已放弃的请求
+          "X-Request-Timeout-Ms": String(this.timeoutMs),
         },
         body: JSON.stringify(handState),
         signal: controller.signal,
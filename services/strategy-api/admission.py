@@ -0,0 +1,318 @@
+"""
+查询接口准入控制
+
+客户端（apps/web-overlay/api-client.js）5 秒后放弃请求，过载时服务端若仍排队处理所有请求，
+只会让每个请求都超时。本模块在进入处理函数前做准入:
+
+    - 截止时间: X-Request-Timeout-Ms（客户端剩余预算）或 REQUEST_TIMEOUT_MS，从到达时刻起算；
+      排队期间或进入处理函数前已过期的请求直接丢弃（504），处理函数可用 expired() 提前退出
+    - 自适应并发上限（梯度算法）: 以长期平均延迟为基线，短期延迟升高时按比例收缩上限，
+      延迟平稳且并发打满时按 sqrt(limit) 增长
+    - 超出上限的请求在有界队列中最多等待 ADMISSION_QUEUE_TIMEOUT_MS，仍无空位时快速拒绝:
+      单条查询默认返回降级结果（L1 中的策略，允许过期；否则近邻 / 保守策略），
+      其余返回 503 + Retry-After（降级结果是成功响应，不带 Retry-After）
+    - 计数: 准入 / 排队 / 拒绝（按原因）/ 降级 / 过期，见 /metrics 的 admission
+
+    ADMISSION_CONTROL=0 关闭；ADMISSION_SHED_MODE=reject 时过载一律 503
+"""
+import asyncio
+import contextvars
+import json
+import math
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "1") != "0"
+ADMISSION_SHED_MODE = os.getenv("ADMISSION_SHED_MODE", "degrade")  # degrade | reject
+REQUEST_TIMEOUT_MS = int(os.getenv("REQUEST_TIMEOUT_MS", "5000"))
+ADMISSION_INITIAL_LIMIT = int(os.getenv("ADMISSION_INITIAL_LIMIT", "64"))
+ADMISSION_MIN_LIMIT = int(os.getenv("ADMISSION_MIN_LIMIT", "4"))
+ADMISSION_MAX_LIMIT = int(os.getenv("ADMISSION_MAX_LIMIT", "1024"))
+ADMISSION_QUEUE = int(os.getenv("ADMISSION_QUEUE", "128"))  # 等待准入的请求数上限
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "50"))
+RETRY_AFTER_S = int(os.getenv("ADMISSION_RETRY_AFTER_S", "1"))
+
+TIMEOUT_HEADER = b"x-request-timeout-ms"
+VERSION_HEADER = b"x-solution-version"
+ADMITTED_PATHS = {"/v1/strategy/query", "/v1/strategy/query_batch"}
+DEGRADABLE_PATHS = {"/v1/strategy/query"}
+
+# 当前请求的截止时刻（perf_counter_ns），处理函数通过 expired() 检查
+_deadline: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar(
+    "deadline", default=None
+)
+
+
+def expired() -> bool:
+    """当前请求是否已超过截止时间（不在准入控制下时恒为 False）"""
+    deadline = _deadline.get()
+    return deadline is not None and time.perf_counter_ns() >= deadline
+
+
+class AdaptiveLimit:
+    """
+    梯度并发上限（参考 Netflix concurrency-limits Gradient2）
+
+    每 window 个样本（或 window_s 秒）计算一次短期平均延迟 short，长期基线 long 为 short 的
+    慢速 EWMA；gradient = clamp(tolerance × long / short, 0.5, 1)，
+    新上限 = limit × gradient + sqrt(limit)，再与旧值平滑。窗口内最大并发不足上限一半时
+    （负载不足，延迟不能说明容量）不增长。
+    """
+
+    def __init__(self, initial: int = ADMISSION_INITIAL_LIMIT, min_limit: int = ADMISSION_MIN_LIMIT,
+                 max_limit: int = ADMISSION_MAX_LIMIT, window: int = 100, window_s: float = 1.0,
+                 tolerance: float = 1.5, smoothing: float = 0.2):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.window = window
+        self.window_ns = int(window_s * 1e9)
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.long_ns = 0.0
+        self.short_ns = 0.0
+        self._sum_ns = 0
+        self._count = 0
+        self._max_inflight = 0
+        self._window_start = time.perf_counter_ns()
+
+    def sample(self, latency_ns: int, inflight: int) -> None:
+        self._sum_ns += latency_ns
+        self._count += 1
+        if inflight > self._max_inflight:
+            self._max_inflight = inflight
+        now = time.perf_counter_ns()
+        if self._count >= self.window or now - self._window_start >= self.window_ns:
+            self._update()
+            self._window_start = now
+
+    def _update(self) -> None:
+        short = self._sum_ns / self._count
+        self.short_ns = short
+        if not self.long_ns:
+            self.long_ns = short
+        else:
+            self.long_ns = self.long_ns * 0.95 + short * 0.05
+            if self.long_ns > short * 2:
+                self.long_ns *= 0.9  # 负载下降后基线较快回落，避免长期高估
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_ns / short))
+        target = self.limit * gradient + math.sqrt(self.limit)
+        if gradient >= 1.0 and self._max_inflight < self.limit / 2:
+            target = self.limit
+        limit = self.limit * (1 - self.smoothing) + target * self.smoothing
+        self.limit = max(float(self.min_limit), min(float(self.max_limit), limit))
+        self._sum_ns = self._count = self._max_inflight = 0
+
+    def stats(self) -> Dict:
+        return {
+            "limit": round(self.limit, 1),
+            "latency_long_ms": round(self.long_ns / 1e6, 3),
+            "latency_short_ms": round(self.short_ns / 1e6, 3),
+        }
+
+
+class AdmissionController:
+    """并发上限 + 有界 FIFO 等待队列（单事件循环内使用，无需加锁）"""
+
+    def __init__(self, limit: Optional[AdaptiveLimit] = None, max_queue: int = ADMISSION_QUEUE,
+                 queue_timeout_ms: float = ADMISSION_QUEUE_TIMEOUT_MS):
+        self.limiter = limit or AdaptiveLimit()
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_ms / 1000
+        self.inflight = 0
+        self._waiters: deque = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.shed: Dict[str, int] = {"queue_full": 0, "queue_timeout": 0}
+        self.expired = 0
+        self.degraded = 0
+
+    def _has_capacity(self) -> bool:
+        return self.inflight < int(self.limiter.limit)
+
+    async def acquire(self, deadline_ns: int) -> Optional[str]:
+        """获取处理名额；成功返回 None，否则返回拒绝原因（queue_full / queue_timeout / expired）"""
+        if self._has_capacity() and not self._waiters:
+            self.inflight += 1
+            self.admitted += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            self.shed["queue_full"] += 1
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        timeout = min(self.queue_timeout_s, (deadline_ns - time.perf_counter_ns()) / 1e9)
+        try:
+            await asyncio.wait_for(waiter, max(timeout, 0))
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                self.release_slot()  # 超时与获得名额同时发生: 交还名额
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if time.perf_counter_ns() >= deadline_ns:
+                self.expired += 1
+                return "expired"
+            self.shed["queue_timeout"] += 1
+            return "queue_timeout"
+        self.admitted += 1
+        return None
+
+    def release(self, latency_ns: int) -> None:
+        self.limiter.sample(latency_ns, self.inflight)
+        self.release_slot()
+
+    def release_slot(self) -> None:
+        """名额直接交给队首等待者，否则归还"""
+        self.inflight -= 1
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.inflight += 1
+                waiter.set_result(None)
+
+    def stats(self) -> Dict:
+        return {
+            **self.limiter.stats(),
+            "in_flight": self.inflight,
+            "queue": len(self._waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": dict(self.shed),
+            "degraded": self.degraded,
+            "expired": self.expired,
+        }
+
+    def prometheus(self) -> str:
+        lines = [
+            "# TYPE strategy_admission_limit gauge",
+            f"strategy_admission_limit {self.limiter.limit:.1f}",
+            "# TYPE strategy_admission_queue gauge",
+            f"strategy_admission_queue {len(self._waiters)}",
+            "# TYPE strategy_admission_shed_total counter",
+        ]
+        lines += [
+            f'strategy_admission_shed_total{{reason="{reason}"}} {n}'
+            for reason, n in self.shed.items()
+        ]
+        lines += [
+            "# TYPE strategy_admission_degraded_total counter",
+            f"strategy_admission_degraded_total {self.degraded}",
+            "# TYPE strategy_admission_expired_total counter",
+            f"strategy_admission_expired_total {self.expired}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+# degrade(body, solution_version) -> 降级响应体（200），无法降级时返回 None
+Degrader = Callable[[bytes, Optional[str]], Optional[bytes]]
+
+
+def error_body(code: str, message: str, details: Dict) -> bytes:
+    """与版本协商错误相同的错误格式"""
+    return json.dumps({
+        "success": False,
+        "error": {"code": code, "message": message, "details": details},
+    }).encode()
+
+
+class AdmissionMiddleware:
+    """纯 ASGI 中间件: 对查询接口做截止时间与并发准入"""
+
+    def __init__(self, app, controller: AdmissionController,
+                 degrade: Optional[Degrader] = None, shed_mode: str = ADMISSION_SHED_MODE,
+                 default_timeout_ms: int = REQUEST_TIMEOUT_MS):
+        self.app = app
+        self.controller = controller
+        self.degrade = degrade if shed_mode == "degrade" else None
+        self.default_timeout_ms = default_timeout_ms
+
+    def _timeout_ms(self, headers) -> float:
+        for name, value in headers:
+            if name == TIMEOUT_HEADER:
+                try:
+                    return max(0.0, float(value))
+                except ValueError:
+                    break
+        return self.default_timeout_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in ADMITTED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        start_ns = time.perf_counter_ns()
+        deadline_ns = start_ns + int(self._timeout_ms(scope["headers"]) * 1e6)
+        reason = await self.controller.acquire(deadline_ns)
+        if reason is not None:
+            await self._reject(scope, receive, send, reason)
+            return
+
+        token = _deadline.set(deadline_ns)
+        try:
+            if time.perf_counter_ns() >= deadline_ns:
+                self.controller.expired += 1
+                await self._respond(send, 504, error_body(
+                    "DEADLINE_EXCEEDED", "Request deadline passed before processing", {}
+                ))
+                return
+            await self.app(scope, receive, send)
+        finally:
+            _deadline.reset(token)
+            self.controller.release(time.perf_counter_ns() - start_ns)
+
+    async def _reject(self, scope, receive, send, reason: str) -> None:
+        if reason == "expired":
+            await self._respond(send, 504, error_body(
+                "DEADLINE_EXCEEDED", "Request deadline passed while queued", {}
+            ))
+            return
+        if self.degrade is not None and scope["path"] in DEGRADABLE_PATHS:
+            body = self.degrade(await read_body(receive), header(scope, VERSION_HEADER))
+            if body is not None:
+                self.controller.degraded += 1
+                await self._respond(send, 200, body, degraded=True)
+                return
+        await self._respond(send, 503, error_body(
+            "OVERLOADED", "Server is shedding load, retry later",
+            {"reason": reason, "retry_after_s": RETRY_AFTER_S},
+        ))
+
+    async def _respond(self, send, status: int, body: bytes, degraded: bool = False) -> None:
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ]
+        if status == 503:
+            headers.append((b"retry-after", str(RETRY_AFTER_S).encode()))
+        if degraded:
+            headers.append((b"x-degraded", b"overload"))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+def header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+async def read_body(receive: Callable[[], Awaitable[Dict]]) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+controller = AdmissionController()
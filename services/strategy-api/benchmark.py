@@ -1,204 +1,300 @@
 """
-压测脚本 - 100/300/500 RPS 三档测试
+压测脚本 - 开环 (open-loop) 异步负载生成器
+
+- 按精确到达时间表发送请求（固定间隔或泊松到达），不因慢响应而推迟后续请求
+- 延迟从“计划发送时刻”起算，避免 coordinated omission
+- 单个 aiohttp 会话 + keep-alive 连接复用
+- 对数分桶直方图统计分位数（与服务端 /metrics 同一实现）
+- 超时与连接错误同样按“计划发送时刻 -> 放弃时刻”计入延迟直方图，最慢的请求不会从分位数中消失
+- 请求混合: 命中场景（--scenes 指定服务端加载的策略文件，缺省为内置示例数据）/ 未命中场景 / 错误请求
+
+用法:
+    python benchmark.py                                  # 100/300/500 RPS 三档，每档 30 秒
+    python benchmark.py --rates 200 --duration 10 --mix hit=0.7,miss=0.2,bad=0.1
+    python benchmark.py --scenes data/solutions.jsonl     # 服务端以 STRATEGY_FILE / 导入版本运行时
 """
+import argparse
 import asyncio
-import aiohttp
+import itertools
+import json
+import os
+import random
 import time
-import statistics
-from concurrent.futures import ThreadPoolExecutor
-import requests
+from typing import Dict, Iterable, List, Optional
+
+import aiohttp
+
+from loader import iter_records, sample_records
+from metrics import LatencyHistogram
 
 API_URL = "http://localhost:8000/v1/strategy/query"
 HEALTH_URL = "http://localhost:8000/health"
+REPORT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "docs", "latency_report.md"
+)
+
+DEFAULT_MIX = {"hit": 0.80, "miss": 0.15, "bad": 0.05}
+P95_TARGET_MS = 250
+MAX_HIT_SCENES = 100000  # --scenes 文件中最多取用的场景数
+
 
-# 测试样本
-TEST_SAMPLES = [
-    {
-        "hand_id": "load_test",
-        "table_id": "table_001",
-        "street": "preflop",
-        "hero_pos": "BTN",
-        "effective_stack_bb": 100,
+def hit_payload(i: int, scene: str) -> Dict:
+    """原始场景串 "preflop|BTN|100|OPEN"（翻后可带公共牌 "|AhKd7c"）-> 查询请求"""
+    street, pos, stack, line, *board = scene.split("|")
+    payload = {
+        "hand_id": f"load_hit_{i}",
+        "table_id": f"table_{i % 12:03d}",
+        "street": street,
+        "hero_pos": pos,
+        "effective_stack_bb": float(stack),
         "pot_bb": 1.5,
-        "action_line": "FOLD_FOLD_FOLD_FOLD"
+        "action_line": line,
     }
-] * 100  # 100个样本
+    if board:
+        payload["board"] = [board[0][j:j + 2] for j in range(0, len(board[0]), 2)]
+    return payload
+
+
+def build_payloads(seed: int = 42,
+                   records: Optional[Iterable[Dict]] = None) -> Dict[str, List[Dict]]:
+    """
+    按类别生成请求样本: 命中场景来自 records（服务端加载的策略文件），缺省为示例策略表
+
+    只有旧格式指纹、没有 "scene" 的记录无法还原成请求，跳过
+    """
+    records = sample_records() if records is None else records
+    scenes = (r["scene"] for r in records if "|" in r.get("scene", ""))
+    scenes = itertools.islice(scenes, MAX_HIT_SCENES)
+    hits = [hit_payload(i, scene) for i, scene in enumerate(scenes)]
+    if not hits:
+        raise ValueError("No scenes to build hit requests from")
+    rng = random.Random(seed)
+    misses = [
+        {
+            "hand_id": f"load_miss_{i}",
+            "table_id": f"table_{i % 12:03d}",
+            "street": rng.choice(["flop", "turn", "river"]),
+            "hero_pos": rng.choice(["BTN", "SB", "BB", "UTG", "MP", "CO"]),
+            "effective_stack_bb": rng.uniform(10, 300),
+            "pot_bb": rng.uniform(2, 40),
+            "action_line": f"CHECK_BET_{i}",
+        }
+        for i in range(100)
+    ]
+    bad = [{"hand_id": f"load_bad_{i}"} for i in range(10)]  # 缺少必填字段 -> 422
+    return {"hit": hits, "miss": misses, "bad": bad}
+
 
-def check_health():
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, weight = part.split("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        raise ValueError(f"Unknown mix categories: {sorted(unknown)}")
+    return mix
+
+
+def arrival_schedule(rps: int, duration: float, poisson: bool, rng: random.Random) -> List[float]:
+    """计划发送时刻（相对开始的秒数）"""
+    if not poisson:
+        return [i / rps for i in range(int(rps * duration))]
+    times, t = [], 0.0
+    while True:
+        t += rng.expovariate(rps)
+        if t >= duration:
+            return times
+        times.append(t)
+
+
+async def check_health(session: aiohttp.ClientSession, url: str) -> bool:
     """检查API健康状态"""
     try:
-        r = requests.get(HEALTH_URL, timeout=5)
-        return r.status_code == 200
-    except:
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as r:
+            return r.status == 200
+    except Exception:
         return False
 
-def single_request(payload):
-    """单次请求"""
-    start = time.time()
-    try:
-        r = requests.post(API_URL, json=payload, timeout=10)
-        latency = (time.time() - start) * 1000  # ms
-        return {
-            "status": r.status_code,
-            "latency": latency,
-            "success": r.status_code == 200 and r.json().get("success")
-        }
-    except Exception as e:
-        return {
-            "status": 0,
-            "latency": (time.time() - start) * 1000,
-            "success": False,
-            "error": str(e)
-        }
 
-def run_load_test(rps, duration=30):
+async def run_load_test(
+    session: aiohttp.ClientSession,
+    rps: int,
+    duration: float = 30,
+    mix: Dict[str, float] = DEFAULT_MIX,
+    poisson: bool = False,
+    url: str = API_URL,
+    timeout: float = 10,
+    seed: int = 42,
+    payloads: Optional[Dict[str, List[Dict]]] = None,
+) -> Dict:
     """
-    运行负载测试
+    运行一档开环负载测试
+
     rps: 目标每秒请求数
     duration: 测试持续时间(秒)
+    payloads: build_payloads 的结果，缺省用示例策略表
     """
     print(f"\n{'='*60}")
-    print(f"负载测试: {rps} RPS, {duration}秒")
+    print(f"负载测试: {rps} RPS, {duration}秒, mix={mix}, {'poisson' if poisson else 'uniform'}")
     print(f"{'='*60}")
-    
-    if not check_health():
-        print("❌ API 未启动，请先运行 ./start.sh")
-        return
-    
-    results = []
-    start_time = time.time()
-    request_interval = 1.0 / rps
-    
-    with ThreadPoolExecutor(max_workers=rps*2) as executor:
-        futures = []
-        
-        while time.time() - start_time < duration:
-            for sample in TEST_SAMPLES[:rps]:
-                future = executor.submit(single_request, sample)
-                futures.append(future)
-            
-            time.sleep(request_interval)
-            
-            # 收集已完成的请求
-            done = [f for f in futures if f.done()]
-            for f in done:
-                results.append(f.result())
-                futures.remove(f)
-        
-        # 等待剩余请求完成
-        for f in futures:
-            try:
-                results.append(f.result(timeout=5))
-            except:
-                results.append({"success": False, "latency": 0})
-    
-    # 计算指标
-    total = len(results)
-    successes = [r for r in results if r.get("success")]
-    errors = total - len(successes)
-    latencies = [r["latency"] for r in successes if r.get("latency", 0) > 0]
-    
-    if not latencies:
-        print("❌ 没有成功的请求")
-        return
-    
-    # 排序计算分位数
-    latencies.sort()
-    p50 = latencies[int(len(latencies) * 0.5)]
-    p95 = latencies[int(len(latencies) * 0.95)]
-    p99 = latencies[int(len(latencies) * 0.99)]
-    
-    actual_duration = time.time() - start_time
-    actual_rps = total / actual_duration
-    
-    print(f"\n📊 测试结果:")
-    print(f"  总请求数: {total}")
-    print(f"  成功: {len(successes)} ({len(successes)/total*100:.1f}%)")
-    print(f"  错误: {errors} ({errors/total*100:.1f}%)")
-    print(f"  实际RPS: {actual_rps:.1f}")
-    print(f"\n⏱️  延迟 (ms):")
-    print(f"  P50: {p50:.1f}")
-    print(f"  P95: {p95:.1f}")
-    print(f"  P99: {p99:.1f}")
-    print(f"  Min: {min(latencies):.1f}")
-    print(f"  Max: {max(latencies):.1f}")
-    print(f"  Avg: {statistics.mean(latencies):.1f}")
-    
-    return {
+
+    rng = random.Random(seed)
+    payloads = payloads or build_payloads(seed)
+    categories = list(mix)
+    weights = [mix[c] for c in categories]
+    schedule = arrival_schedule(rps, duration, poisson, rng)
+    plan = []
+    for t in schedule:
+        category = rng.choices(categories, weights)[0]
+        plan.append((t, category, rng.choice(payloads[category])))
+
+    latency = LatencyHistogram()  # 计划发送时刻 -> 响应完成
+    service = LatencyHistogram()  # 实际发送时刻 -> 响应完成
+    by_category = {c: LatencyHistogram() for c in categories}
+    counts = {"ok": 0, "error": 0, "timeout": 0}
+    outcomes: Dict[str, int] = {}
+    max_lag_ms = 0.0
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async def send(intended_ns: int, category: str, payload: Dict):
+        sent_ns = time.perf_counter_ns()
+        status = None
+        try:
+            async with session.post(url, json=payload, timeout=client_timeout) as r:
+                body = await r.read()
+                status = r.status
+        except asyncio.TimeoutError:
+            counts["timeout"] += 1
+        except Exception:
+            counts["error"] += 1
+        # 失败的请求同样计入（延迟为放弃时刻），否则最慢的请求会从 p99 中消失
+        done_ns = time.perf_counter_ns()
+        latency.record(done_ns - intended_ns)
+        service.record(done_ns - sent_ns)
+        by_category[category].record(done_ns - intended_ns)
+        if status is None:
+            return
+
+        expected = 422 if category == "bad" else 200
+        if status != expected:
+            counts["error"] += 1
+            return
+        counts["ok"] += 1
+        if status == 200:
+            cache_status = json.loads(body)["data"]["cache_status"]
+            outcomes[cache_status] = outcomes.get(cache_status, 0) + 1
+
+    tasks = []
+    start_ns = time.perf_counter_ns()
+    for offset, category, payload in plan:
+        intended_ns = start_ns + int(offset * 1e9)
+        delay = (intended_ns - time.perf_counter_ns()) / 1e9
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            max_lag_ms = max(max_lag_ms, -delay * 1000)
+        tasks.append(asyncio.create_task(send(intended_ns, category, payload)))
+    send_elapsed = (time.perf_counter_ns() - start_ns) / 1e9
+    await asyncio.gather(*tasks)
+    elapsed = (time.perf_counter_ns() - start_ns) / 1e9
+
+    total = len(plan)
+    summary = latency.summary_ms()
+    result = {
         "rps_target": rps,
-        "rps_actual": actual_rps,
+        "rps_actual": round(total / send_elapsed, 1) if send_elapsed else 0.0,
+        "throughput": round(counts["ok"] / elapsed, 1) if elapsed else 0.0,
+        "duration_s": duration,
+        "arrival": "poisson" if poisson else "uniform",
+        "mix": mix,
         "total_requests": total,
-        "success_rate": len(successes)/total,
-        "error_rate": errors/total,
-        "latency_p50": p50,
-        "latency_p95": p95,
-        "latency_p99": p99
+        "success_rate": counts["ok"] / total if total else 0.0,
+        "error_rate": (counts["error"] + counts["timeout"]) / total if total else 0.0,
+        "timeouts": counts["timeout"],
+        "outcomes": outcomes,
+        "latency_ms": summary,
+        "service_time_ms": service.summary_ms(),
+        "latency_ms_by_category": {c: h.summary_ms() for c, h in by_category.items()},
+        "max_schedule_lag_ms": round(max_lag_ms, 3),
     }
 
-def main():
-    """主函数 - 运行三档压测"""
-    print("🚀 GTO Strategy API 压测开始")
-    print("请确保 API 已启动: ./start.sh")
-    
-    results = []
-    
-    # 100 RPS
-    result_100 = run_load_test(100, duration=30)
-    if result_100:
-        results.append(result_100)
-    
-    time.sleep(5)  # 冷却
-    
-    # 300 RPS
-    result_300 = run_load_test(300, duration=30)
-    if result_300:
-        results.append(result_300)
-    
-    time.sleep(5)  # 冷却
-    
-    # 500 RPS
-    result_500 = run_load_test(500, duration=30)
-    if result_500:
-        results.append(result_500)
-    
-    # 生成报告
-    generate_report(results)
-
-def generate_report(results):
+    print("\n📊 测试结果:")
+    print(f"  总请求数: {total}")
+    print(f"  成功: {counts['ok']} ({result['success_rate']*100:.1f}%)")
+    print(f"  错误/超时: {counts['error']}/{counts['timeout']} ({result['error_rate']*100:.1f}%)")
+    print(f"  实际RPS: {result['rps_actual']:.1f}  吞吐: {result['throughput']:.1f} req/s")
+    print(f"  调度最大滞后: {result['max_schedule_lag_ms']:.1f}ms")
+    print("\n⏱️  延迟 (ms, 从计划发送时刻起算):")
+    for key in ("p50", "p95", "p99", "max", "mean"):
+        print(f"  {key.upper()}: {summary[key]:.2f}")
+    return result
+
+
+async def run_all(args) -> List[Dict]:
+    connector = aiohttp.TCPConnector(limit=args.connections, keepalive_timeout=60)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        if not await check_health(session, args.health_url):
+            print("❌ API 未启动，请先运行 ./start.sh")
+            return []
+        payloads = build_payloads(args.seed, iter_records(args.scenes) if args.scenes else None)
+        print(f"🎯 命中场景: {len(payloads['hit'])} 个（{args.scenes or '内置示例数据'}）")
+        results = []
+        for i, rps in enumerate(args.rates):
+            if i:
+                await asyncio.sleep(args.cooldown)  # 冷却
+            results.append(await run_load_test(
+                session, rps, args.duration, args.mix, args.poisson, args.url,
+                args.timeout, args.seed, payloads,
+            ))
+        return results
+
+
+def generate_report(results: List[Dict], path: str = REPORT_PATH, url: str = API_URL) -> str:
     """生成压测报告"""
-    report = """# 压测报告
+    first = results[0]
+    report = f"""# 压测报告
 
 ## 测试环境
-- API: http://localhost:8000
-- 测试时间: {timestamp}
-- 测试工具: Python requests + ThreadPoolExecutor
+- API: {url.rsplit('/v1', 1)[0]}
+- 测试时间: {time.strftime("%Y-%m-%d %H:%M:%S")}
+- 测试工具: benchmark.py (asyncio + aiohttp 开环负载，keep-alive 连接复用)
 
 ## 测试场景
 POST /v1/strategy/query
-- Payload: preflop BTN 100BB standard open
-- 每项测试持续 30 秒
+- 请求混合: {", ".join(f"{k} {v:.0%}" for k, v in first["mix"].items())}（命中场景取自预加载策略表）
+- 到达过程: {first["arrival"]}，每项测试持续 {first["duration_s"]} 秒
+- 延迟从计划发送时刻起算（无 coordinated omission），超时 / 错误按放弃时刻计入分位数
 
 ## 结果汇总
 
-| RPS | 实际RPS | 成功率 | P50 (ms) | P95 (ms) | P99 (ms) |
-|-----|---------|--------|----------|----------|----------|
-""".format(timestamp=time.strftime("%Y-%m-%d %H:%M:%S"))
-    
+| RPS | 实际RPS | 成功率 | 错误率 | P50 (ms) | P95 (ms) | P99 (ms) | 吞吐 (req/s) |
+|-----|---------|--------|--------|----------|----------|----------|--------------|
+"""
     for r in results:
-        report += f"| {r['rps_target']} | {r['rps_actual']:.1f} | {r['success_rate']*100:.1f}% | {r['latency_p50']:.1f} | {r['latency_p95']:.1f} | {r['latency_p99']:.1f} |\n"
-    
-    report += """
-## 结论
+        lat = r["latency_ms"]
+        report += (
+            f"| {r['rps_target']} | {r['rps_actual']:.1f} | {r['success_rate']*100:.1f}% "
+            f"| {r['error_rate']*100:.1f}% | {lat['p50']:.1f} | {lat['p95']:.1f} "
+            f"| {lat['p99']:.1f} | {r['throughput']:.1f} |\n"
+        )
+
+    report += "\n## 分类延迟 (P95 ms)\n\n| RPS | " + " | ".join(first["mix"]) + " |\n"
+    report += "|-----|" + "|".join("-----" for _ in first["mix"]) + "|\n"
+    for r in results:
+        cells = " | ".join(f"{h['p95']:.1f}" for h in r["latency_ms_by_category"].values())
+        report += f"| {r['rps_target']} | {cells} |\n"
+
+    report += "\n## 结论\n\n"
 
-"""
-    
     # 检查是否满足目标
     for r in results:
-        if r['latency_p95'] < 250:
-            report += f"- ✅ {r['rps_target']} RPS: P95 {r['latency_p95']:.1f}ms < 250ms (达标)\n"
+        p95 = r["latency_ms"]["p95"]
+        if p95 < P95_TARGET_MS:
+            report += f"- ✅ {r['rps_target']} RPS: P95 {p95:.1f}ms < {P95_TARGET_MS}ms (达标)\n"
         else:
-            report += f"- ❌ {r['rps_target']} RPS: P95 {r['latency_p95']:.1f}ms > 250ms (未达标)\n"
-    
+            report += f"- ❌ {r['rps_target']} RPS: P95 {p95:.1f}ms > {P95_TARGET_MS}ms (未达标)\n"
+
     report += """
 ## 建议
 
@@ -212,12 +308,48 @@ POST /v1/strategy/query
    - 超时配置
    - 资源使用（CPU/内存）
 """
-    
-    with open("docs/latency_report.md", "w") as f:
+
+    with open(path, "w") as f:
         f.write(report)
-    
-    print("\n✅ 报告已生成: docs/latency_report.md")
-    print(report)
+    return report
+
+
+def main():
+    """主函数 - 默认运行三档压测"""
+    parser = argparse.ArgumentParser(description="GTO Strategy API 开环压测")
+    parser.add_argument("--rates", type=int, nargs="+", default=[100, 300, 500])
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--cooldown", type=float, default=5)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="请求混合比例，如 hit=0.8,miss=0.15,bad=0.05")
+    parser.add_argument("--poisson", action="store_true", help="泊松到达（默认固定间隔）")
+    parser.add_argument("--connections", type=int, default=256, help="连接池上限")
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenes", help="服务端加载的策略 JSON Lines 文件（命中请求取自其中的场景），"
+                                         "缺省为内置示例数据")
+    parser.add_argument("--url", default=API_URL)
+    parser.add_argument("--health-url", default=HEALTH_URL)
+    parser.add_argument("--json-out", default="bench_results.json", help="机器可读结果")
+    parser.add_argument("--report", default=REPORT_PATH)
+    parser.add_argument("--no-report", action="store_true")
+    args = parser.parse_args()
+
+    print("🚀 GTO Strategy API 压测开始")
+    print("请确保 API 已启动: ./start.sh")
+
+    results = asyncio.run(run_all(args))
+    if not results:
+        return
+
+    with open(args.json_out, "w") as f:
+        json.dump({"generated_at": time.time(), "results": results}, f, indent=2)
+    print(f"\n✅ 结果已写入: {args.json_out}")
+
+    if not args.no_report:
+        generate_report(results, args.report, args.url)
+        print(f"✅ 报告已生成: {args.report}")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,130 @@
+"""
+进程内微基准工具
+
+bench fixture 自动标定迭代次数，取多轮中位数得到 ns/op，并与 baseline.json 比较。
+绝对耗时随机器（CPU 型号、频率、负载）变化很大，因此基线不记录 ns，而是记录相对值:
+每个基准的 ns/op 除以紧挨着测得的标定循环（纯 Python 的字典/字符串/JSON/哈希混合负载，
+在基准前后各测一次取平均）耗时，换一台机器或机器负载漂移时两者同比例变化，比值保持稳定:
+    pytest benchmarks/                       # 对比基线，相对值超过阈值则失败
+    BENCH_UPDATE=1 pytest benchmarks/        # 重新记录基线
+    BENCH_THRESHOLD=0.3 pytest benchmarks/   # 允许的回退比例（默认 0.5 即 +50%）
+    BENCH_ADVISORY=1 pytest benchmarks/      # 只报告不失败（共享 / 嘈杂的 CI 机器）
+"""
+import hashlib
+import json
+import os
+import statistics
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+THRESHOLD = float(os.getenv("BENCH_THRESHOLD", "0.5"))
+UPDATE = os.getenv("BENCH_UPDATE") == "1"
+ADVISORY = os.getenv("BENCH_ADVISORY") == "1"
+ROUNDS = 7
+TARGET_ROUND_NS = 20_000_000  # 每轮约 20ms
+
+_results = {}  # name -> 相对值（ns/op ÷ 标定耗时）
+_calibrations = []  # 本会话各次标定耗时（ns）
+
+
+def _load_baseline():
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            return json.load(f).get("relative", {})
+    return {}
+
+
+def measure(fn, *args):
+    """返回 fn(*args) 的 ns/op（多轮中位数）"""
+    loops = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(loops):
+            fn(*args)
+        elapsed = time.perf_counter_ns() - start
+        if elapsed >= TARGET_ROUND_NS / 10 or loops >= 1 << 20:
+            break
+        loops *= 2
+    loops = max(1, int(loops * TARGET_ROUND_NS / max(elapsed, 1)))
+
+    rounds = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter_ns()
+        for _ in range(loops):
+            fn(*args)
+        rounds.append((time.perf_counter_ns() - start) / loops)
+    return statistics.median(rounds)
+
+
+def _calibration_workload():
+    """与热路径同类的解释器开销: 字典构造、字符串格式化、JSON 序列化与哈希"""
+    record = {f"field_{i}": i * 0.5 for i in range(32)}
+    text = json.dumps(record)
+    hashlib.sha256(text.encode()).hexdigest()
+    return sorted(record, key=record.get)
+
+
+def calibrate():
+    """测量一次标定耗时（ns）"""
+    ns = measure(_calibration_workload)
+    _calibrations.append(ns)
+    return ns
+
+
+def calibration_ns():
+    """本会话标定耗时的中位数（报告用）"""
+    return statistics.median(_calibrations) if _calibrations else calibrate()
+
+
+@pytest.fixture
+def bench(request):
+    """bench(fn, *args, per_call=1): 记录 ns/op，按标定耗时归一后与基线比较"""
+    name = request.node.name
+
+    def run(fn, *args, per_call: int = 1):
+        before = calibrate()
+        ns = measure(fn, *args) / per_call
+        relative = ns / ((before + calibrate()) / 2)
+        _results[name] = relative
+        baseline = _load_baseline().get(name)
+        if baseline and not UPDATE and not ADVISORY:
+            limit = baseline * (1 + THRESHOLD)
+            assert relative <= limit, (
+                f"{name}: {relative:.3f}x calibration ({ns:.0f} ns/op) regressed beyond "
+                f"{limit:.3f}x (baseline {baseline:.3f}x, threshold +{THRESHOLD:.0%})"
+            )
+        return ns
+
+    return run
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if UPDATE and _results:
+        baseline = _load_baseline()
+        baseline.update({k: round(v, 4) for k, v in _results.items()})
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({
+                "calibration_ns": round(calibration_ns(), 1),  # 仅供参考，比较只用 relative
+                "relative": dict(sorted(baseline.items())),
+            }, f, indent=2)
+            f.write("\n")
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+    baseline = _load_baseline()
+    cal = calibration_ns()
+    mode = " (advisory)" if ADVISORY else ""
+    terminalreporter.section(f"microbenchmarks (ns/op, calibration {cal:.0f} ns){mode}")
+    for name, relative in _results.items():
+        base = baseline.get(name)
+        delta = f"{(relative / base - 1) * 100:+.1f}%" if base else "n/a"
+        terminalreporter.write_line(
+            f"{name:<45} {relative * cal:>12.0f}   {relative:>9.3f}x   vs baseline {delta}"
+        )
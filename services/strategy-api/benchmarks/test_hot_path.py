@@ -0,0 +1,133 @@
+"""
+微基准: 查询热路径
+
+分别测量指纹、存储查询、响应构造与完整处理函数（进程内 ASGI 客户端，内存存储）。
+"""
+import asyncio
+
+import httpx
+import pytest
+
+import cards
+import main
+import scene_key
+from loader import record_fingerprint, sample_records
+from storage import MemoryStore
+
+HIT_PAYLOAD = {
+    "hand_id": "bench_hit",
+    "table_id": "table_001",
+    "street": "preflop",
+    "hero_pos": "BTN",
+    "effective_stack_bb": 100,
+    "pot_bb": 1.5,
+    "action_line": "OPEN",
+}
+MISS_PAYLOAD = dict(HIT_PAYLOAD, hand_id="bench_miss", hero_pos="UNKNOWN_POS")
+REQUESTS_PER_CALL = 200
+
+
+@pytest.fixture(scope="module", autouse=True)
+def memory_backend():
+    """使用内存存储并加载示例数据，避免受外部 Redis 影响"""
+    original = main.strategy_store
+    main.strategy_store = MemoryStore(main.strategy_db)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main.load_sample_data())
+    yield loop
+    loop.close()
+    main.strategy_store = original
+
+
+@pytest.fixture(scope="module")
+def hand_state():
+    return main.HandState(**HIT_PAYLOAD)
+
+
+def test_fingerprint_indexed(bench, hand_state):
+    """已加载场景: 规范化 + 索引命中"""
+    bench(scene_key.fingerprint_for_state, hand_state)
+
+
+def test_fingerprint_postflop(bench):
+    """翻后场景: 公共牌查表规范化 + 指纹（记忆化后的稳态）"""
+    state = main.HandState(**{**HIT_PAYLOAD, "street": "flop", "board": ["Ah", "Kd", "7c"]})
+    bench(scene_key.fingerprint_for_state, state)
+
+
+def test_combo_canonicalization(bench):
+    """手牌 -> 规范组合下标（解析 + 查表）"""
+    board = ["Ks", "9s", "Ts"]
+    hole = ["Ah", "Qd"]
+    bench(lambda: cards.canonical_combo(cards.parse_cards(board), cards.parse_cards(hole)))
+
+
+def test_fingerprint_sha256(bench):
+    """未记忆化的原始哈希成本"""
+    bench(scene_key._hash_scene.__wrapped__, ("preflop", "BTN", 100, "OPEN"))
+
+
+def test_storage_lookup_memory(bench, memory_backend):
+    """内存存储查询（单次协程调用，批量摊销事件循环开销）"""
+    key = f"strat:{main.SOLUTION_VERSION}:{record_fingerprint(next(sample_records()))}"
+    store = main.strategy_store
+
+    async def lookups():
+        for _ in range(REQUESTS_PER_CALL):
+            await store.get(key)
+
+    bench(lambda: memory_backend.run_until_complete(lookups()), per_call=REQUESTS_PER_CALL)
+
+
+def test_l1_cache_lookup(bench):
+    """L1 缓存命中"""
+    key = f"strat:{main.SOLUTION_VERSION}:bench"
+    main.l1_cache.set(key, {"actions": [], "source": "bench"})
+    bench(main.l1_cache.get, key)
+
+
+def test_response_construction(bench, hand_state):
+    """StrategyAdvice + QueryResponse 构造与 JSON 序列化"""
+    data = {"actions": list(sample_records())[0]["actions"], "source": "preflop_db"}
+
+    def build():
+        advice = main.build_advice("req_1", "abcdef0123456789", data, "memory_hit", 0)
+        return main.QueryResponse(
+            success=True, data=advice, request_id="req_1", server_latency_ms=0
+        ).model_dump_json()
+
+    bench(build)
+
+
+def test_response_fast_path(bench):
+    """快速路径: 预编码动作列表 + 模板拼接"""
+    import fast_json
+
+    data = {"actions": list(sample_records())[0]["actions"], "source": "preflop_db"}
+
+    def build():
+        advice, _ = main.encode_advice("req_1", "abcdef0123456789", data, "memory_hit", 0)
+        return fast_json.query_response_bytes(advice, "req_1", 0)
+
+    bench(build)
+
+
+def _handler_bench(bench, loop, payload):
+    async def requests():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for _ in range(REQUESTS_PER_CALL):
+                r = await client.post("/v1/strategy/query", json=payload)
+                assert r.status_code == 200
+
+    bench(lambda: loop.run_until_complete(requests()), per_call=REQUESTS_PER_CALL)
+
+
+def test_full_handler_hit(bench, memory_backend):
+    """完整处理函数（ASGI 进程内，命中）"""
+    _handler_bench(bench, memory_backend, HIT_PAYLOAD)
+
+
+def test_full_handler_miss(bench, memory_backend):
+    """完整处理函数（ASGI 进程内，未命中 fallback）"""
+    _handler_bench(bench, memory_backend, MISS_PAYLOAD)
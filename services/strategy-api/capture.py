@@ -0,0 +1,236 @@
+"""
+线上流量采集（可选开启）
+
+把 /v1/strategy/query 与 /v1/strategy/query_batch 的原始请求体连同到达时间写入紧凑的
+追加式日志，供 replay.py 按原始节奏重放。请求路径上只做一次有界队列追加，
+压缩与写盘在后台线程中完成；队列满时丢弃并计数，不阻塞请求。
+
+    CAPTURE_DIR        日志目录，未设置时不采集（默认关闭）
+    CAPTURE_SAMPLE     采样比例（默认 1.0）
+    CAPTURE_MAX_BYTES  单个分段文件上限（压缩后字节，默认 64MB），超过后轮转
+    CAPTURE_MAX_FILES  目录中保留的分段数（默认 8），超出时删除最旧的分段
+    CAPTURE_QUEUE      待写队列上限（默认 10000 条）
+
+分段文件 capture-{pid}-{序号}.log.gz（多 worker 各写各的），gzip 流中为连续的帧:
+    body_len u32 | arrival_ns i64（time.time_ns，跨进程可比）| kind u8 | body
+每次批量写入后 Z_SYNC_FLUSH，进程异常退出时只丢失最后一批。
+"""
+import gzip
+import heapq
+import os
+import random
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from glob import glob
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+CAPTURE_DIR = os.getenv("CAPTURE_DIR")
+CAPTURE_SAMPLE = float(os.getenv("CAPTURE_SAMPLE", "1.0"))
+CAPTURE_MAX_BYTES = int(os.getenv("CAPTURE_MAX_BYTES", str(64 * 1024 * 1024)))
+CAPTURE_MAX_FILES = int(os.getenv("CAPTURE_MAX_FILES", "8"))
+CAPTURE_QUEUE = int(os.getenv("CAPTURE_QUEUE", "10000"))
+
+FRAME = struct.Struct("<IqB")
+KIND_QUERY = 0
+KIND_BATCH = 1
+CAPTURED_PATHS = {
+    "/v1/strategy/query": KIND_QUERY,
+    "/v1/strategy/query_batch": KIND_BATCH,
+}
+FILE_PATTERN = "capture-*.log.gz"
+
+Frame = Tuple[int, int, bytes]  # (arrival_ns, kind, body)
+
+
+class TrafficCapture:
+    """有界队列 + 后台写线程的追加式采集日志"""
+
+    def __init__(self, directory: str, sample: float = CAPTURE_SAMPLE,
+                 max_bytes: int = CAPTURE_MAX_BYTES, max_files: int = CAPTURE_MAX_FILES,
+                 queue_size: int = CAPTURE_QUEUE, flush_interval: float = 0.5):
+        self.directory = directory
+        self.sample = sample
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self._queue: deque = deque()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._seq = 0
+        self._raw = None
+        self._gz = None
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+        self.rotations = 0
+        self.errors = 0
+
+    def offer(self, arrival_ns: int, kind: int, body: bytes) -> bool:
+        """请求路径调用: 采样后入队，队列满时丢弃；返回是否入队"""
+        if self.sample < 1.0 and random.random() >= self.sample:
+            return False
+        if len(self._queue) >= self.queue_size:
+            self.dropped += 1
+            return False
+        if self._pid != os.getpid():
+            self._start()  # 首次采集或 fork 后的 worker 中启动写线程
+        self._queue.append((arrival_ns, kind, body))
+        self.captured += 1
+        return True
+
+    def _start(self) -> None:
+        self._pid = os.getpid()
+        self._raw = self._gz = None  # fork 继承的文件句柄属于父进程
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._drain()
+        self._drain()
+        self._close_segment()
+
+    def _drain(self) -> None:
+        if not self._queue:
+            return
+        try:
+            if self._gz is None:
+                self._open_segment()
+            queue, write = self._queue, self._gz.write
+            while queue:
+                arrival_ns, kind, body = queue.popleft()
+                write(FRAME.pack(len(body), arrival_ns, kind))
+                write(body)
+                self.written += 1
+            self._gz.flush(zlib.Z_SYNC_FLUSH)
+            if self._raw.tell() >= self.max_bytes:
+                self._close_segment()
+                self.rotations += 1
+        except OSError:
+            self.errors += 1
+            self._queue.clear()
+            self._close_segment()
+
+    def _open_segment(self) -> None:
+        self._seq += 1
+        path = os.path.join(self.directory, f"capture-{self._pid}-{self._seq:06d}.log.gz")
+        self._raw = open(path, "ab")
+        self._gz = gzip.GzipFile(fileobj=self._raw, mode="ab")
+        self._prune()
+
+    def _close_segment(self) -> None:
+        if self._gz is not None:
+            try:
+                self._gz.close()
+                self._raw.close()
+            except OSError:
+                self.errors += 1
+        self._raw = self._gz = None
+
+    def _prune(self) -> None:
+        """目录中只保留最新的 max_files 个分段（所有 worker 合计）"""
+        files = sorted(glob(os.path.join(self.directory, FILE_PATTERN)), key=os.path.getmtime)
+        for path in files[:max(0, len(files) - self.max_files)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """等待队列写完（测试与关闭时使用）"""
+        deadline = time.monotonic() + timeout
+        while self._queue and time.monotonic() < deadline:
+            self._wakeup.set()
+            time.sleep(0.01)
+
+    def close(self) -> None:
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict:
+        return {
+            "directory": self.directory,
+            "sample": self.sample,
+            "captured": self.captured,
+            "written": self.written,
+            "dropped": self.dropped,
+            "queued": len(self._queue),
+            "rotations": self.rotations,
+            "errors": self.errors,
+        }
+
+
+class CaptureMiddleware:
+    """纯 ASGI 中间件: 收集被采集路径的请求体（只保留 chunk 引用），请求结束后入队"""
+
+    def __init__(self, app, capture: TrafficCapture):
+        self.app = app
+        self.capture = capture
+
+    async def __call__(self, scope, receive, send):
+        kind = CAPTURED_PATHS.get(scope["path"]) if scope["type"] == "http" else None
+        if kind is None or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        arrival_ns = time.time_ns()
+        chunks = []
+
+        async def receive_and_keep():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunks.append(message.get("body", b""))
+            return message
+
+        try:
+            await self.app(scope, receive_and_keep, send)
+        finally:
+            if chunks:
+                self.capture.offer(arrival_ns, kind, b"".join(chunks))
+
+
+def read_segment(path: str) -> Iterator[Frame]:
+    """读取一个分段；末尾不完整的帧（进程异常退出）被忽略"""
+    with gzip.open(path, "rb") as f:
+        while True:
+            try:
+                head = f.read(FRAME.size)
+                if len(head) < FRAME.size:
+                    return
+                length, arrival_ns, kind = FRAME.unpack(head)
+                body = f.read(length)
+            except (EOFError, zlib.error):
+                return
+            if len(body) < length:
+                return
+            yield arrival_ns, kind, body
+
+
+def read_capture(paths: Iterable[str]) -> Iterator[Frame]:
+    """
+    流式读取多个分段（目录或文件），按到达时间归并
+
+    每个分段内帧按入队顺序写入，与到达顺序只有并发请求间的微小差异，
+    归并时不整体排序，避免把整份日志读入内存
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob(os.path.join(path, FILE_PATTERN))))
+        else:
+            files.append(path)
+    return heapq.merge(*(read_segment(path) for path in files), key=lambda frame: frame[0])
+
+
+traffic_capture: Optional[TrafficCapture] = TrafficCapture(CAPTURE_DIR) if CAPTURE_DIR else None
@@ -0,0 +1,163 @@
+"""
+扑克牌编码与花色同构（查表实现）
+
+    - 牌: rank * 4 + suit（rank 0..12 对应 2..A，suit 0..3 对应 c/d/h/s），取值 0..51
+    - 起手组合: 两张牌 (hi > lo) 映射到 0..1325 的组合下标
+    - 公共牌规范化: 在 24 种花色置换中取字典序最小的公共牌，
+      同构公共牌（如 AhKd7c 与 AsKc7d）得到同一规范形式与对应置换，
+      手牌经同一置换映射后即可在规范公共牌的策略表中查找；
+      多个置换得到同一规范公共牌时（如单色面中其余三种花色可互换），
+      手牌取这些置换下组合下标最小者，保证同构手牌落在同一组合上
+
+导入时预计算: 牌面字符串 -> 牌编号、(牌, 牌) -> 组合下标、每个置换下的牌/组合映射。
+每个公共牌的规范形式与 1326 个组合的规范映射按需计算并记忆化，
+请求路径上的牌面规范化只剩字典/列表查找。
+"""
+from functools import lru_cache
+from itertools import permutations
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+RANKS = "23456789TJQKA"
+SUITS = "cdhs"
+NUM_CARDS = 52
+NUM_COMBOS = NUM_CARDS * (NUM_CARDS - 1) // 2  # 1326
+BOARD_MEMO_SIZE = 8192
+
+SUIT_PERMUTATIONS: List[Tuple[int, ...]] = list(permutations(range(4)))
+
+# 牌面字符串（大小写、"10h" 写法）-> 牌编号
+CARD_INDEX: Dict[str, int] = {}
+for _r, _rank in enumerate(RANKS):
+    for _s, _suit in enumerate(SUITS):
+        for _rank_text in {_rank, _rank.lower(), "10" if _rank == "T" else _rank}:
+            for _suit_text in (_suit, _suit.upper()):
+                CARD_INDEX[_rank_text + _suit_text] = _r * 4 + _s
+
+CARD_NAMES: List[str] = [RANKS[c >> 2] + SUITS[c & 3] for c in range(NUM_CARDS)]
+
+# (a, b) -> 组合下标（扁平 52*52 表，a == b 为 -1）与组合下标 -> (hi, lo)
+COMBO_TABLE: List[int] = [-1] * (NUM_CARDS * NUM_CARDS)
+COMBO_CARDS: List[Tuple[int, int]] = []
+for _hi in range(NUM_CARDS):
+    for _lo in range(_hi):
+        COMBO_TABLE[_hi * NUM_CARDS + _lo] = COMBO_TABLE[_lo * NUM_CARDS + _hi] = len(COMBO_CARDS)
+        COMBO_CARDS.append((_hi, _lo))
+
+# 置换下标 -> 牌映射 / 组合映射
+PERM_CARD: List[List[int]] = [
+    [(c & ~3) | perm[c & 3] for c in range(NUM_CARDS)] for perm in SUIT_PERMUTATIONS
+]
+PERM_COMBO: List[List[int]] = [
+    [COMBO_TABLE[pc[hi] * NUM_CARDS + pc[lo]] for hi, lo in COMBO_CARDS] for pc in PERM_CARD
+]
+IDENTITY_COMBO: List[int] = list(range(NUM_COMBOS))
+
+
+def parse_card(text: str) -> int:
+    """"Ah" / "10h" / "ah" -> 牌编号；格式错误抛出 ValueError"""
+    card = CARD_INDEX.get(text.strip())
+    if card is None:
+        raise ValueError(f"Invalid card: {text!r}")
+    return card
+
+
+def card_str(card: int) -> str:
+    return CARD_NAMES[card]
+
+
+def parse_cards(cards) -> List[int]:
+    """["Ah", "Kd"] 或 "AhKd" -> 牌编号列表（不允许重复牌）"""
+    if isinstance(cards, str):
+        cards = [cards[i:i + 2] for i in range(0, len(cards), 2)]
+    parsed = [parse_card(c) for c in cards]
+    if len(set(parsed)) != len(parsed):
+        raise ValueError(f"Duplicate cards: {cards!r}")
+    return parsed
+
+
+def combo_index(a: int, b: int) -> int:
+    """两张不同的牌 -> 组合下标 0..1325（与顺序无关）"""
+    return COMBO_TABLE[a * NUM_CARDS + b]
+
+
+def combo_cards(index: int) -> Tuple[int, int]:
+    """组合下标 -> (hi, lo)"""
+    return COMBO_CARDS[index]
+
+
+def permute(card: int, perm: Sequence[int]) -> int:
+    return (card & ~3) | perm[card & 3]
+
+
+@lru_cache(maxsize=BOARD_MEMO_SIZE)
+def _canonical(board: Tuple[int, ...]) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    """(翻牌降序 + 转牌/河牌) -> (规范公共牌, 得到该形式的置换下标)"""
+    best = None
+    perm_ids: List[int] = []
+    for p, pc in enumerate(PERM_CARD):
+        flop = sorted((pc[board[0]], pc[board[1]], pc[board[2]]), reverse=True)
+        form = tuple(flop) + tuple(pc[c] for c in board[3:])
+        if best is None or form < best:
+            best, perm_ids = form, [p]
+        elif form == best:
+            perm_ids.append(p)
+    return best, tuple(perm_ids)
+
+
+def _board_key(board: Sequence[int]) -> Tuple[int, ...]:
+    """翻牌顺序无关: 记忆化 key 中翻牌按降序排列"""
+    return tuple(sorted(board[:3], reverse=True)) + tuple(board[3:])
+
+
+def canonical_board(board: Sequence[int]) -> Tuple[Tuple[int, ...], Tuple[Tuple[int, ...], ...]]:
+    """公共牌 -> (规范公共牌, 得到该形式的全部花色置换)"""
+    canonical, perm_ids = _canonical(_board_key(board))
+    return canonical, tuple(SUIT_PERMUTATIONS[p] for p in perm_ids)
+
+
+@lru_cache(maxsize=BOARD_MEMO_SIZE)
+def _combo_map(board: Tuple[int, ...]) -> List[int]:
+    """原始组合下标 -> 规范组合下标（1326 项）"""
+    _, perm_ids = _canonical(board)
+    if len(perm_ids) == 1:
+        return PERM_COMBO[perm_ids[0]]
+    tables = [PERM_COMBO[p] for p in perm_ids]
+    return [min(t[c] for t in tables) for c in IDENTITY_COMBO]
+
+
+def canonical_combo(board: Sequence[int], hole: Sequence[int]) -> Tuple[Tuple[int, ...], int]:
+    """公共牌 + 两张手牌 -> (规范公共牌, 规范组合下标)"""
+    key = _board_key(board)
+    canonical, _ = _canonical(key)
+    return canonical, _combo_map(key)[COMBO_TABLE[hole[0] * NUM_CARDS + hole[1]]]
+
+
+def pack_board(board: Sequence[int]) -> int:
+    """规范公共牌 -> 整数 key（每张牌 6 位，牌编号 + 1，最多 5 张）"""
+    packed = 0
+    for card in board:
+        packed = (packed << 6) | (card + 1)
+    return packed
+
+
+def unpack_board(packed: int) -> Tuple[int, ...]:
+    board = []
+    while packed:
+        board.append((packed & 63) - 1)
+        packed >>= 6
+    return tuple(reversed(board))
+
+
+def board_key(board: Iterable[int]) -> str:
+    return "".join(CARD_NAMES[c] for c in board)
+
+
+def memo_stats() -> Dict:
+    boards = _canonical.cache_info()
+    combos = _combo_map.cache_info()
+    return {
+        "board_memo_size": boards.currsize,
+        "board_memo_hits": boards.hits,
+        "board_memo_misses": boards.misses,
+        "combo_map_size": combos.currsize,
+    }
@@ -0,0 +1,318 @@
+"""
+手牌历史离线评估
+
+流式读取手牌历史（JSON Lines，每行一个 HandState 加上实际选择的动作），在进程内复用
+查询路径的 generate_fingerprint 与存储查询，按块分发到进程池并行评估，汇总:
+
+    - 覆盖率: 命中策略表（含翻后策略表）的手牌比例，按 street / 位置拆分，以及未覆盖最多的场景
+    - 动作对比: 实际动作与推荐动作（频率最高）一致的比例、实际动作在策略中的频率
+    - EV 损失: 推荐动作 EV - 实际动作 EV（实际动作不在策略中时计入 off_strategy）
+    - 吞吐: 每次运行的 hands/sec
+
+用法:
+    python evaluator.py --input hands.jsonl --strategies solutions.jsonl --output report.json
+    python evaluator.py --input hands.jsonl.gz --packed strategies.gtos --workers 8
+    python evaluator.py --input hands.jsonl --version v0.2.0        # 使用 STRATEGY_BACKEND / Redis
+
+记录格式（每行一手）:
+    {"hand_id": "h1", "table_id": "t1", "street": "preflop", "hero_pos": "BTN",
+     "effective_stack_bb": 100, "pot_bb": 1.5, "action_line": "OPEN", "hero_action": "raise_2.5x"}
+"""
+import argparse
+import asyncio
+import gzip
+import heapq
+import json
+import multiprocessing
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from pydantic import ValidationError
+
+import scene_key
+from loader import bulk_load, iter_records
+from metrics import KNOWN_POSITIONS, KNOWN_STREETS
+from models import SOLUTION_VERSION, HandState, generate_fingerprint
+from postflop import POSTFLOP_TABLES, load_tables
+from storage import MemoryStore, StrategyStore, create_store
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_WORKERS = os.cpu_count() or 1
+TOP_MISSING = 20  # 报告中列出的未覆盖场景数
+PROGRESS_EVERY = 100000  # 每评估多少手输出一次进度
+
+
+class Report:
+    """可合并的评估汇总（各进程分别累加，父进程合并）"""
+
+    def __init__(self):
+        self.hands = 0
+        self.invalid = 0
+        self.hits = 0
+        self.scored = 0  # 有实际动作且命中的手牌
+        self.agree = 0
+        self.off_strategy = 0
+        self.chosen_frequency = 0.0
+        self.ev_lost = 0.0
+        self.by_scene: Dict[str, List[int]] = defaultdict(lambda: [0, 0])  # label -> [hands, hits]
+        self.missing: Counter = Counter()
+
+    def add(self, hand: HandState, hero_action: Optional[str], data: Optional[Dict]) -> None:
+        self.hands += 1
+        street = hand.street if hand.street in KNOWN_STREETS else "other"
+        pos = hand.hero_pos if hand.hero_pos in KNOWN_POSITIONS else "other"
+        for label in (street, f"{street}/{pos}"):
+            self.by_scene[label][0] += 1
+            self.by_scene[label][1] += bool(data)
+        if not data:
+            self.missing[scene_key.scene_str(scene_key.scene_of(hand))] += 1
+            return
+        self.hits += 1
+        if not hero_action:
+            return
+        self.scored += 1
+        actions = {a["action"]: a for a in data["actions"]}
+        best = max(data["actions"], key=lambda a: a["frequency"])
+        chosen = actions.get(hero_action)
+        if hero_action == best["action"]:
+            self.agree += 1
+        if chosen is None:
+            self.off_strategy += 1
+            return
+        self.chosen_frequency += chosen["frequency"]
+        self.ev_lost += max(0.0, best["ev"] - chosen["ev"])
+
+    def merge(self, other: "Report") -> None:
+        for name in ("hands", "invalid", "hits", "scored", "agree", "off_strategy",
+                     "chosen_frequency", "ev_lost"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for label, (hands, hits) in other.by_scene.items():
+            self.by_scene[label][0] += hands
+            self.by_scene[label][1] += hits
+        self.missing.update(other.missing)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["by_scene"] = dict(self.by_scene)  # defaultdict(lambda) 不可 pickle
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.by_scene = defaultdict(lambda: [0, 0], state["by_scene"])
+
+    def to_dict(self) -> Dict:
+        def rate(n: float, d: int) -> float:
+            return round(n / d, 4) if d else 0.0
+
+        matched = self.scored - self.off_strategy
+        return {
+            "hands": self.hands,
+            "invalid": self.invalid,
+            "hits": self.hits,
+            "coverage": rate(self.hits, self.hands),
+            "scored": self.scored,
+            "agreement_rate": rate(self.agree, self.scored),
+            "off_strategy": self.off_strategy,
+            "mean_chosen_frequency": rate(self.chosen_frequency, matched),
+            "ev_lost_bb": round(self.ev_lost, 2),
+            "ev_lost_per_hand_bb": rate(self.ev_lost, matched),
+            "coverage_by_scene": {
+                label: {"hands": hands, "coverage": rate(hits, hands)}
+                for label, (hands, hits) in sorted(self.by_scene.items())
+            },
+            "top_missing_scenes": [  # 次数相同按场景排序，与各块合并顺序无关
+                {"scene": scene, "hands": n} for scene, n in heapq.nsmallest(
+                    TOP_MISSING, self.missing.items(), key=lambda item: (-item[1], item[0])
+                )
+            ],
+        }
+
+
+class _Evaluator:
+    """单个进程内的查询上下文: 存储 + 翻后策略表 + 常驻事件循环（Redis 连接池绑定在其上）"""
+
+    def __init__(self, config: Dict):
+        self.config = config
+        self.version = config["version"]
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        self.store = self.loop.run_until_complete(open_store(config))
+        self.tables = load_tables(config["postflop"]).get(self.version)
+
+    def postflop(self, hand: HandState, data: Optional[Dict]) -> Optional[Dict]:
+        """存储未命中时与查询接口一致，退回翻后策略表"""
+        if data or self.tables is None or not hand.board or not hand.hero_cards:
+            return data
+        try:
+            return self.tables.lookup(scene_key.scene_of(hand), hand.board, hand.hero_cards)
+        except ValueError:
+            return None
+
+    def evaluate(self, lines: List[str]) -> Report:
+        if os.getpid() != self.pid:
+            # fork 出的子进程不能共用父进程事件循环的 selector
+            self.pid, self.loop = os.getpid(), asyncio.new_event_loop()
+        report = Report()
+        hands = []
+        for line in lines:
+            try:
+                record = json.loads(line)
+                hands.append((HandState(**record), record.get("hero_action")))
+            except (ValueError, TypeError, ValidationError):
+                report.invalid += 1
+        keys = [f"strat:{self.version}:{generate_fingerprint(hand)}" for hand, _ in hands]
+        found = self.loop.run_until_complete(self.store.mget(keys))  # 每块一次 MGET
+        for (hand, hero_action), data in zip(hands, found):
+            report.add(hand, hero_action, self.postflop(hand, data))
+        return report
+
+
+async def open_store(config: Dict) -> StrategyStore:
+    """按配置打开存储: 策略 JSON Lines 导入内存 / packed 文件 / STRATEGY_BACKEND"""
+    if config.get("strategies"):
+        store = MemoryStore()
+        await bulk_load(store, iter_records(config["strategies"]), config["version"], ttl=None)
+        return store
+    if config.get("packed"):
+        from packed_store import PackedStore
+
+        return PackedStore(config["packed"])
+    return create_store()
+
+
+_evaluator: Optional[_Evaluator] = None
+
+
+def _init_worker(config: Dict) -> None:
+    """进程池初始化: fork 时沿用父进程已打开的上下文（写时复制），否则在子进程中打开"""
+    global _evaluator
+    if _evaluator is None or _evaluator.config != config:
+        _evaluator = _Evaluator(config)
+
+
+def _evaluate_chunk(lines: List[str]) -> Report:
+    return _evaluator.evaluate(lines)
+
+
+def iter_lines(path: str) -> Iterator[str]:
+    """流式读取 JSON Lines（.gz 自动解压），跳过空行"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def iter_chunks(lines: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def evaluate(
+    lines: Iterable[str],
+    config: Dict,
+    workers: int = DEFAULT_WORKERS,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress=None,
+) -> Dict:
+    """
+    评估手牌流，返回汇总报告（含 elapsed_s / hands_per_s）
+
+    config: version、strategies（JSON Lines 策略文件）或 packed（packed 文件）、postflop（翻后表目录）。
+    workers > 1 时按块分发到进程池，同时在途的块不超过 2 × workers，输入不会整体读入内存
+    """
+    config = {"postflop": POSTFLOP_TABLES, **config}
+    start = time.perf_counter()
+    total = Report()
+    chunks = iter_chunks(lines, chunk_size)
+    next_report = PROGRESS_EVERY
+
+    def collect(report: Report) -> None:
+        nonlocal next_report
+        total.merge(report)
+        if progress and total.hands >= next_report:
+            progress(total.hands, time.perf_counter() - start)
+            next_report += PROGRESS_EVERY
+
+    if workers <= 1:
+        _init_worker(config)
+        for chunk in chunks:
+            collect(_evaluate_chunk(chunk))
+    else:
+        context = multiprocessing.get_context()
+        if context.get_start_method() == "fork":
+            _init_worker(config)  # 父进程加载一次，子进程写时复制共享
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(config,)) as pool:
+            pending = set()
+            for chunk in chunks:
+                pending.add(pool.submit(_evaluate_chunk, chunk))
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future.result())
+            for future in pending:
+                collect(future.result())
+
+    elapsed = time.perf_counter() - start
+    result = total.to_dict()
+    result.update({
+        "version": config["version"],
+        "workers": workers,
+        "chunk_size": chunk_size,
+        "elapsed_s": round(elapsed, 3),
+        "hands_per_s": round((total.hands + total.invalid) / elapsed, 1) if elapsed > 0 else 0.0,
+    })
+    return result
+
+
+def print_progress(hands: int, elapsed: float) -> None:
+    print(f"  ... {hands} hands, {hands / elapsed:.0f} hands/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="手牌历史离线评估")
+    parser.add_argument("--input", required=True, help="手牌历史 JSON Lines（可为 .gz）")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--strategies", help="策略 JSON Lines（导入进程内存）")
+    source.add_argument("--packed", help="packed 策略文件（mmap）")
+    parser.add_argument("--version", default=SOLUTION_VERSION, help="评估的策略版本")
+    parser.add_argument("--postflop", default=POSTFLOP_TABLES, help="翻后策略表目录")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--output", help="报告输出路径（JSON）")
+    args = parser.parse_args()
+
+    config = {
+        "version": args.version,
+        "strategies": args.strategies,
+        "packed": args.packed,
+        "postflop": args.postflop,
+    }
+    print(f"🔎 Evaluating {args.input} against {args.version} with {args.workers} workers ...")
+    result = evaluate(iter_lines(args.input), config, args.workers, args.chunk_size,
+                      progress=print_progress)
+    print(
+        f"✅ {result['hands']} hands ({result['invalid']} invalid) in {result['elapsed_s']}s "
+        f"({result['hands_per_s']:.0f} hands/s): coverage {result['coverage']:.1%}, "
+        f"agreement {result['agreement_rate']:.1%}, "
+        f"EV lost {result['ev_lost_per_hand_bb']} bb/hand"
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"📄 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
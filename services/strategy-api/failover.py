@@ -0,0 +1,232 @@
+"""
+远程存储熔断与进程内只读副本
+
+Redis 变慢或宕机时，RedisStore 的每次查询都要等到 socket 超时（REDIS_SOCKET_TIMEOUT）
+或抛出异常，P99 随之失控。FailoverStore 包装远程存储:
+
+    - 每次读取带紧的超时（STORE_CALL_TIMEOUT_MS），超时与异常计为失败
+    - 熔断器: 连续 BREAKER_FAILURES 次失败后打开，打开期间读取直接走副本，
+      BREAKER_OPEN_S 秒后半开，只放行一个探测请求，成功则关闭、失败则重新打开
+    - 副本: 当前版本全部策略的内存快照（scan_version 分块读取后整体替换），
+      每 REPLICA_REFRESH_S 秒在熔断器关闭时后台刷新；写入当前版本的数据同步写入副本
+    - 远程存储未给出结果且副本中也没有的 key 返回 UNAVAILABLE（假值）而不是 None，
+      调用方据此不写负缓存（只有远程存储确认不存在才算未命中）
+
+每个 worker 启动时调用 follow(当前版本)（serve.py 预加载的父进程不启动后台任务）。
+
+写入（导入、版本指针）不经过熔断器，直接写远程存储。
+
+    REDIS_FAILOVER=0 关闭（远程存储不再包装）
+"""
+import asyncio
+import os
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+from storage import UNAVAILABLE, MemoryStore, StrategyStore
+
+REDIS_FAILOVER = os.getenv("REDIS_FAILOVER", "1") != "0"
+STORE_CALL_TIMEOUT_MS = float(os.getenv("STORE_CALL_TIMEOUT_MS", "50"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_OPEN_S = float(os.getenv("BREAKER_OPEN_S", "5"))
+REPLICA_REFRESH_S = float(os.getenv("REPLICA_REFRESH_S", "300"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+BREAKER_STATE_CODE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """连续失败计数熔断器（单事件循环内使用）"""
+
+    def __init__(self, failures: int = BREAKER_FAILURES, open_s: float = BREAKER_OPEN_S):
+        self.failure_threshold = failures
+        self.open_s = open_s
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.opens = 0
+
+    def allow(self) -> bool:
+        """是否访问远程存储；打开满 open_s 后转为半开，只放行一个探测请求"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_s:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def success(self) -> None:
+        self.failures = 0
+        self._probing = False
+        self.state = CLOSED
+
+    def failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opens += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "opens": self.opens}
+
+
+class FailoverStore(StrategyStore):
+    """远程存储 + 熔断器 + 当前版本的进程内只读副本"""
+
+    remote = True
+    replica_source = "replica_hit"
+
+    def __init__(self, primary: StrategyStore, breaker: Optional[CircuitBreaker] = None,
+                 call_timeout_ms: float = STORE_CALL_TIMEOUT_MS,
+                 refresh_s: float = REPLICA_REFRESH_S):
+        self.primary = primary
+        self.backend = primary.backend
+        self.breaker = breaker or CircuitBreaker()
+        self.call_timeout = call_timeout_ms / 1000
+        self.refresh_s = refresh_s
+        self.replica = MemoryStore()
+        self.version: Optional[str] = None  # 副本对应的版本
+        self.synced_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.timeouts = 0
+        self.errors = 0
+        self.replica_reads = 0
+        self.syncs = 0
+        self.sync_errors = 0
+
+    @property
+    def hit_source(self) -> str:
+        return self.primary.hit_source if self.breaker.state == CLOSED else self.replica_source
+
+    async def _call(self, method: str, *args):
+        """经熔断器调用远程存储；不放行、超时或出错时返回 None（由调用方读副本）"""
+        if not self.breaker.allow():
+            return None
+        try:
+            result = await asyncio.wait_for(getattr(self.primary, method)(*args), self.call_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.breaker.failure()
+            return None
+        except Exception:
+            self.errors += 1
+            self.breaker.failure()
+            return None
+        self.breaker.success()
+        return (result,)
+
+    async def get(self, key: str) -> Optional[Dict]:
+        return (await self.mget([key]))[0]
+
+    async def mget(self, keys: List[str]) -> List[Optional[Dict]]:
+        """远程存储的结果（未命中为 None）；远程存储未给出结果时读副本，副本中没有为 UNAVAILABLE"""
+        result = await self._call("mget", keys)
+        if result is not None:
+            return result[0]
+        self.replica_reads += len(keys)
+        db = self.replica.db
+        return [db.get(key, UNAVAILABLE) for key in keys]
+
+    def _mirror(self, items: Dict[str, Dict]) -> None:
+        if self.version is None:
+            return
+        prefix = f"strat:{self.version}:"
+        self.replica.db.update((k, v) for k, v in items.items() if k.startswith(prefix))
+
+    async def set(self, key: str, value: Dict, ttl: Optional[int] = None) -> None:
+        await self.primary.set(key, value, ttl=ttl)
+        self._mirror({key: value})
+
+    async def set_many(self, items: Dict[str, Dict], ttl: Optional[int] = None) -> None:
+        await self.primary.set_many(items, ttl=ttl)
+        self._mirror(items)
+
+    async def get_active_version(self) -> Optional[str]:
+        # 启动 / 管理路径: 不经过熔断器，读不到指针时由调用方报错而不是当作“无版本”
+        return await self.primary.get_active_version()
+
+    async def set_active_version(self, version: str) -> None:
+        await self.primary.set_active_version(version)
+
+    def scan_version(self, version: str, batch: int = 1000) -> AsyncIterator[Dict[str, Dict]]:
+        return self.primary.scan_version(version, batch)
+
+    async def sync(self) -> int:
+        """从远程存储拉取副本版本的完整快照，成功后整体替换副本；返回记录数"""
+        version = self.version
+        db: Dict[str, Dict] = {}
+        async for chunk in self.primary.scan_version(version):
+            db.update(chunk)
+        if version != self.version:
+            return 0  # 同步期间已切换版本，丢弃
+        self.replica.db = db
+        self.synced_at = time.time()
+        self.syncs += 1
+        return len(db)
+
+    def follow(self, version: str) -> None:
+        """副本切换到 version（当前版本变化时调用），后台立即同步，之后定期刷新"""
+        self.version = version  # 旧快照保留到新快照就绪（不同版本的 key 不会命中）
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._refresh_loop())
+        self._wakeup.set()
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.refresh_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self.version is None or self.breaker.state != CLOSED:
+                continue  # 远程存储故障期间保留现有副本
+            try:
+                await self.sync()
+            except Exception:
+                self.sync_errors += 1
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.primary.close()
+
+    def stats(self) -> Dict:
+        return {
+            **self.primary.stats(),
+            "breaker": self.breaker.stats(),
+            "call_timeout_ms": round(self.call_timeout * 1000, 1),
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "replica": {
+                "version": self.version,
+                "records": len(self.replica.db),
+                "age_s": round(time.time() - self.synced_at, 1) if self.synced_at else None,
+                "reads": self.replica_reads,
+                "syncs": self.syncs,
+                "sync_errors": self.sync_errors,
+            },
+        }
+
+    def prometheus(self) -> str:
+        return "\n".join([
+            "# TYPE strategy_store_breaker_state gauge",
+            f"strategy_store_breaker_state {BREAKER_STATE_CODE[self.breaker.state]}",
+            "# TYPE strategy_store_call_failures_total counter",
+            f'strategy_store_call_failures_total{{reason="timeout"}} {self.timeouts}',
+            f'strategy_store_call_failures_total{{reason="error"}} {self.errors}',
+            "# TYPE strategy_store_replica_reads_total counter",
+            f"strategy_store_replica_reads_total {self.replica_reads}",
+            "# TYPE strategy_store_replica_records gauge",
+            f"strategy_store_replica_records {len(self.replica.db)}",
+        ]) + "\n"
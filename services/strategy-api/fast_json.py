@@ -0,0 +1,95 @@
+"""
+快速 JSON 序列化
+
+命中路径的响应体很小，Pydantic 构造 + 校验 + 标准库编码占了大部分服务端耗时。
+这里把动作列表预编码为 bytes（每条策略只编码一次），请求时拼接进响应模板，
+直接以原始 bytes 返回。字段与顺序与 QueryResponse / StrategyAdvice 完全一致。
+
+orjson 可用时使用 orjson，否则退回标准库 json。
+"""
+from typing import Dict, List
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+
+    def dumps(value) -> bytes:
+        return orjson.dumps(value)
+
+    JSON_BACKEND = "orjson"
+except ImportError:  # pragma: no cover - 依赖缺失时的降级路径
+    import json
+
+    def dumps(value) -> bytes:
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+    JSON_BACKEND = "json"
+
+# 进程内缓存编码结果的私有字段（只写入内存中的策略 dict，不会写回存储）
+ENCODED_KEY = "_actions_json"
+
+
+class RawJSONResponse(Response):
+    """已编码好的 JSON bytes 直接作为响应体"""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return content
+
+
+def actions_bytes(data: Dict) -> bytes:
+    """策略 dict 的 actions 编码结果（首次编码后缓存在 dict 上）"""
+    encoded = data.get(ENCODED_KEY)
+    if encoded is None:
+        encoded = data[ENCODED_KEY] = dumps(data["actions"])
+    return encoded
+
+
+def precompute(records) -> int:
+    """加载时批量预编码，返回处理条数"""
+    count = 0
+    for data in records:
+        actions_bytes(data)
+        count += 1
+    return count
+
+
+def advice_bytes(
+    request_id: str,
+    fingerprint: str,
+    solution_version: str,
+    data: Dict,
+    source: str,
+    confidence: float,
+    retrieval_latency_ms: int,
+    cache_status: str,
+) -> bytes:
+    """StrategyAdvice 的 JSON 编码（与 StrategyAdvice.model_dump_json 等价）"""
+    return b"".join((
+        b'{"request_id":', dumps(request_id),
+        b',"scene_fingerprint":', dumps(fingerprint),
+        b',"solution_version":', dumps(solution_version),
+        b',"actions":', actions_bytes(data),
+        b',"source":', dumps(source),
+        b',"confidence":', dumps(confidence),
+        b',"retrieval_latency_ms":', str(retrieval_latency_ms).encode(),
+        b',"cache_status":', dumps(cache_status),
+        b"}",
+    ))
+
+
+def query_response_bytes(advice: bytes, request_id: str, server_latency_ms: int) -> bytes:
+    """QueryResponse 的 JSON 编码"""
+    return b"".join((
+        b'{"success":true,"data":', advice,
+        b',"request_id":', dumps(request_id),
+        b',"server_latency_ms":', str(server_latency_ms).encode(),
+        b"}",
+    ))
+
+
+def batch_response_bytes(advices: List[bytes], request_id: str, server_latency_ms: int) -> bytes:
+    """BatchQueryResponse 的 JSON 编码"""
+    return query_response_bytes(b"[" + b",".join(advices) + b"]", request_id, server_latency_ms)
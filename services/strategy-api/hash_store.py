@@ -0,0 +1,433 @@
+"""
+Redis 紧凑存储布局（哈希分桶 + 二进制编码）
+
+默认布局每个场景一个顶层 string key（strat:{version}:{fingerprint} -> JSON），
+每个 key 都有 dictEntry/robj/过期表开销，JSON 中动作名与字段名又重复出现在每条记录里，
+在 maxmemory 256mb 下大策略表会被淘汰。本布局:
+
+    strat:{version}:layout   JSON: 格式号、桶数、动作名字典、来源字典（追加式，id 稳定）
+    strat:{version}:b:{n}    hash: field = 8 字节指纹，value = 二进制策略
+
+    value: source_id u8 | n_actions u8 | n_actions × (action_id u8, freq u16, ev i16)（小端）
+
+桶数按每桶不超过 hash-max-listpack-entries（默认 128）选择，使哈希保持 listpack 编码；
+频率量化为 1/65535，EV 量化为 0.01bb（与 packed_store 相同）。TTL 与续期作用在桶上，
+淘汰也以桶为单位。
+
+布局 key 不带 TTL，要求 maxmemory-policy 为 volatile-*（infra/redis.conf 为 volatile-lru）:
+allkeys-lru 下布局 key 可能被淘汰而桶仍在，此时无法解码该版本。写入时发现布局缺失但桶已存在，
+拒绝新建布局（新字典的 id 与已有桶中的值不一致）并抛出 ValueError，需重新完整导入该版本。
+
+用法:
+    STRATEGY_BACKEND=redis_hash REDIS_HASH_BUCKETS=2048 \
+        python loader.py --file solutions.jsonl --version v0.2.0
+    python hash_store.py report --sample                   # 估算每场景字节数（无需 Redis）
+    python hash_store.py report --input solutions.jsonl --measure   # 写入临时版本并用 MEMORY USAGE 实测
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import struct
+import zlib
+from collections import defaultdict
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from storage import ACTIVE_VERSION_KEY, RedisStore
+
+LAYOUT_FORMAT = 1
+REDIS_HASH_BUCKETS = int(os.getenv("REDIS_HASH_BUCKETS", "1024"))
+LISTPACK_MAX_ENTRIES = 128  # Redis hash-max-listpack-entries 默认值（infra/redis.conf）
+LISTPACK_MAX_VALUE = 64  # hash-max-listpack-value 默认值
+
+VALUE_HEAD = struct.Struct("<BB")
+ACTION_SLOT = struct.Struct("<BHh")
+FREQ_SCALE = 65535
+EV_SCALE = 100
+EV_MIN, EV_MAX = -32768, 32767
+
+# 估算用的 Redis 每 key 固定开销（字节，64 位 jemalloc）:
+# 主字典 dictEntry 24 + key sds 头 + robj 16 + 过期字典 dictEntry 24
+STRING_KEY_OVERHEAD = 72
+HASH_KEY_OVERHEAD = 96  # 同上，另含 listpack 头尾
+LISTPACK_ENTRY_OVERHEAD = 4  # 每个 field/value 元素的编码头与回溯长度
+
+
+def field_of(fingerprint: str) -> bytes:
+    """16 位十六进制指纹 -> 8 字节 field（非十六进制指纹原样编码）"""
+    try:
+        return bytes.fromhex(fingerprint)
+    except ValueError:
+        return fingerprint.encode()
+
+
+def fingerprint_of(field: bytes) -> str:
+    """field_of 的逆变换（指纹为 16 位十六进制）"""
+    return field.hex() if len(field) == 8 else field.decode()
+
+
+def bucket_of(field: bytes, buckets: int) -> int:
+    return zlib.crc32(field) % buckets
+
+
+def buckets_for(records: int, per_bucket: int = LISTPACK_MAX_ENTRIES * 3 // 4) -> int:
+    """记录数 -> 桶数（平均每桶约 3/4 上限，给哈希分布不均留余量）"""
+    return max(1, math.ceil(records / per_bucket))
+
+
+class Layout:
+    """某个版本的桶数与动作名/来源字典"""
+
+    def __init__(self, buckets: int, actions: Optional[List[str]] = None,
+                 sources: Optional[List[str]] = None):
+        self.buckets = buckets
+        self.actions: List[str] = actions or []
+        self.sources: List[str] = sources or []
+        self._action_ids = {a: i for i, a in enumerate(self.actions)}
+        self._source_ids = {s: i for i, s in enumerate(self.sources)}
+
+    @classmethod
+    def loads(cls, raw) -> "Layout":
+        meta = json.loads(raw)
+        if meta.get("format") != LAYOUT_FORMAT:
+            raise ValueError(f"Unsupported hash layout format {meta.get('format')}")
+        return cls(meta["buckets"], meta["actions"], meta["sources"])
+
+    def dumps(self) -> str:
+        return json.dumps({
+            "format": LAYOUT_FORMAT,
+            "buckets": self.buckets,
+            "actions": self.actions,
+            "sources": self.sources,
+        })
+
+    def _intern(self, ids: Dict[str, int], names: List[str], name: str) -> int:
+        i = ids.get(name)
+        if i is None:
+            if len(names) >= 256:
+                raise ValueError("Too many distinct actions/sources for hash layout")
+            i = ids[name] = len(names)
+            names.append(name)
+        return i
+
+    def encode(self, value: Dict) -> bytes:
+        actions = value["actions"]
+        if len(actions) > 255:
+            raise ValueError("Too many actions in one strategy")
+        out = [VALUE_HEAD.pack(
+            self._intern(self._source_ids, self.sources, value.get("source", "preflop_db")),
+            len(actions),
+        )]
+        for a in actions:
+            out.append(ACTION_SLOT.pack(
+                self._intern(self._action_ids, self.actions, a["action"]),
+                round(a["frequency"] * FREQ_SCALE),
+                min(max(round(a["ev"] * EV_SCALE), EV_MIN), EV_MAX),
+            ))
+        return b"".join(out)
+
+    def decode(self, raw: bytes) -> Dict:
+        """raw 中的 id 超出字典时抛出 IndexError（字典在其他进程中扩充过）"""
+        source_id, n = VALUE_HEAD.unpack_from(raw, 0)
+        slots = raw[VALUE_HEAD.size:VALUE_HEAD.size + n * ACTION_SLOT.size]
+        actions = [
+            {
+                "action": self.actions[action_id],
+                "frequency": round(freq / FREQ_SCALE, 4),
+                "ev": ev / EV_SCALE,
+            }
+            for action_id, freq, ev in ACTION_SLOT.iter_unpack(slots)
+        ]
+        return {"actions": actions, "source": self.sources[source_id]}
+
+
+def split_key(key: str) -> Tuple[str, str]:
+    """strat:{version}:{fingerprint} -> (version, fingerprint)"""
+    prefix, _, fingerprint = key.rpartition(":")
+    return prefix[len("strat:"):], fingerprint
+
+
+def layout_key(version: str) -> str:
+    return f"strat:{version}:layout"
+
+
+def bucket_key(version: str, bucket: int) -> str:
+    return f"strat:{version}:b:{bucket}"
+
+
+class RedisHashStore(RedisStore):
+    """策略按版本分桶写入 Redis 哈希，值为字典编码的二进制"""
+
+    backend = "redis_hash"
+    decode_responses = False  # 值为二进制
+
+    def __init__(self, buckets: int = REDIS_HASH_BUCKETS, **kwargs):
+        super().__init__(**kwargs)
+        self.buckets = buckets
+        self._layouts: Dict[str, Layout] = {}
+
+    async def _layout(self, version: str, reload: bool = False) -> Optional[Layout]:
+        """读取（并缓存）版本布局；版本未以本布局写入时返回 None"""
+        layout = self._layouts.get(version)
+        if layout is None or reload:
+            raw = await self.client.get(layout_key(version))
+            if raw is None:
+                return None
+            layout = self._layouts[version] = Layout.loads(raw)
+        return layout
+
+    def _locate(self, layout: Layout, key: str) -> Tuple[str, bytes]:
+        version, fingerprint = split_key(key)
+        field = field_of(fingerprint)
+        return bucket_key(version, bucket_of(field, layout.buckets)), field
+
+    async def _decode(self, version: str, layout: Layout, raw: bytes) -> Dict:
+        try:
+            return layout.decode(raw)
+        except IndexError:
+            # 写入方追加了新的动作名/来源，重新读取字典
+            return (await self._layout(version, reload=True)).decode(raw)
+
+    async def get(self, key: str) -> Optional[Dict]:
+        return (await self.mget([key]))[0]
+
+    async def mget(self, keys: List[str]) -> List[Optional[Dict]]:
+        if not keys:
+            return []
+        # 按桶分组，每个桶一条 HMGET，整体一次 pipeline 往返
+        groups: Dict[str, List[Tuple[int, bytes]]] = defaultdict(list)
+        versions: Dict[int, Tuple[str, Layout]] = {}
+        for i, key in enumerate(keys):
+            version, _ = split_key(key)
+            layout = await self._layout(version)
+            if layout is None:
+                continue
+            bucket, field = self._locate(layout, key)
+            groups[bucket].append((i, field))
+            versions[i] = (version, layout)
+
+        results: List[Optional[Dict]] = [None] * len(keys)
+        if not groups:
+            return results
+        buckets = list(groups)
+        async with self.client.pipeline(transaction=False) as pipe:
+            for bucket in buckets:
+                pipe.hmget(bucket, [field for _, field in groups[bucket]])
+            if self.refresh_window:
+                for bucket in buckets:
+                    pipe.ttl(bucket)
+            replies = await pipe.execute()
+
+        hit_buckets = []
+        for bucket, raws in zip(buckets, replies):
+            for (i, _), raw in zip(groups[bucket], raws):
+                if raw:
+                    results[i] = await self._decode(*versions[i], raw)
+            if any(raws):
+                hit_buckets.append(bucket)
+        if self.refresh_window:
+            ttls = dict(zip(buckets, replies[len(buckets):]))
+            self._maybe_refresh([(b, ttls[b]) for b in hit_buckets])
+        return results
+
+    async def _has_buckets(self, version: str) -> bool:
+        async for _ in self.client.scan_iter(match=f"strat:{version}:b:*", count=1000):
+            return True
+        return False
+
+    async def _writable_layout(self, version: str) -> Layout:
+        """写入用布局；版本首次写入时新建，布局缺失而桶已存在（被淘汰）时拒绝写入"""
+        layout = await self._layout(version)
+        if layout is not None:
+            return layout
+        if await self._has_buckets(version):
+            raise ValueError(
+                f"Hash layout for {version} is missing but its buckets exist "
+                "(evicted? check maxmemory-policy); reload the whole version under a new name"
+            )
+        return Layout(self.buckets)
+
+    async def set(self, key: str, value: Dict, ttl: Optional[int] = None) -> None:
+        await self.set_many({key: value}, ttl=ttl)
+
+    async def set_many(self, items: Dict[str, Dict], ttl: Optional[int] = None) -> None:
+        """
+        一次 pipeline 写入整块: HSET 到各桶 + 桶 TTL，字典扩充时同时更新布局
+
+        版本首次写入时创建布局（桶数取 self.buckets）；已有布局（重新加载同一版本、
+        分块追加）沿用其桶数，并在原字典后追加新名字，已写入的 id 不变。
+        布局已丢失而桶仍在时抛出 ValueError（见模块说明）
+        """
+        by_version: Dict[str, Dict[str, Dict]] = defaultdict(dict)
+        for key, value in items.items():
+            by_version[split_key(key)[0]][key] = value
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            for version, chunk in by_version.items():
+                layout = await self._writable_layout(version)
+                known = (len(layout.actions), len(layout.sources))
+                fields: Dict[str, Dict[bytes, bytes]] = defaultdict(dict)
+                for key, value in chunk.items():
+                    bucket, field = self._locate(layout, key)
+                    fields[bucket][field] = layout.encode(value)
+                if known != (len(layout.actions), len(layout.sources)):
+                    pipe.set(layout_key(version), layout.dumps())
+                    self._layouts[version] = layout
+                for bucket, mapping in fields.items():
+                    pipe.hset(bucket, mapping=mapping)
+                    if ttl:
+                        pipe.expire(bucket, ttl)
+            await pipe.execute()
+
+    async def get_active_version(self) -> Optional[str]:
+        raw = await self.client.get(ACTIVE_VERSION_KEY)
+        return raw.decode() if raw else None
+
+    async def scan_version(self, version: str, batch: int = 1000) -> AsyncIterator[Dict[str, Dict]]:
+        """按桶 HGETALL（每次 pipeline 约 batch 条记录对应的桶数）"""
+        layout = await self._layout(version, reload=True)
+        if layout is None:
+            return
+        prefix = f"strat:{version}:"
+        step = max(1, batch // LISTPACK_MAX_ENTRIES)
+        for start in range(0, layout.buckets, step):
+            async with self.client.pipeline(transaction=False) as pipe:
+                for bucket in range(start, min(start + step, layout.buckets)):
+                    pipe.hgetall(bucket_key(version, bucket))
+                replies = await pipe.execute()
+            chunk = {}
+            for reply in replies:
+                for field, raw in reply.items():
+                    chunk[prefix + fingerprint_of(field)] = await self._decode(version, layout, raw)
+            yield chunk
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats["buckets"] = self.buckets
+        stats["layouts"] = {v: layout.buckets for v, layout in self._layouts.items()}
+        return stats
+
+
+def estimate_footprint(records: Iterable[Dict], buckets: Optional[int] = None) -> Dict:
+    """
+    估算两种布局下每个场景占用的 Redis 内存（不连接 Redis）
+
+    string 布局按 key + JSON 值 + 每 key 固定开销计算；hash 布局按 listpack 元素
+    （8 字节 field + 二进制值 + 元素开销）加上每桶固定开销计算。
+    同时检查各桶是否满足 listpack 编码条件（超出时 Redis 转为 hashtable，开销显著增大）
+    """
+    from loader import record_fingerprint
+
+    records = list(records)
+    buckets = buckets or buckets_for(len(records))
+    layout = Layout(buckets)
+    string_bytes = 0
+    listpack_bytes = 0
+    per_bucket: Dict[int, int] = defaultdict(int)
+    max_value = 0
+    for record in records:
+        fingerprint = record_fingerprint(record)
+        value = {"actions": record["actions"], "source": record.get("source", "preflop_db")}
+        key = f"strat:v0.0.0:{fingerprint}"
+        string_bytes += len(key) + len(json.dumps(value)) + STRING_KEY_OVERHEAD
+        field = field_of(fingerprint)
+        encoded = layout.encode(value)
+        max_value = max(max_value, len(encoded))
+        listpack_bytes += len(field) + len(encoded) + 2 * LISTPACK_ENTRY_OVERHEAD
+        per_bucket[bucket_of(field, buckets)] += 1
+
+    used = len(per_bucket)
+    hash_bytes = listpack_bytes + used * (HASH_KEY_OVERHEAD + len("strat:v0.0.0:b:") + 4)
+    hash_bytes += len(layout.dumps())
+    count = len(records)
+    return {
+        "records": count,
+        "buckets": buckets,
+        "max_per_bucket": max(per_bucket.values(), default=0),
+        "max_value_bytes": max_value,
+        "listpack": (
+            max(per_bucket.values(), default=0) <= LISTPACK_MAX_ENTRIES
+            and max_value <= LISTPACK_MAX_VALUE
+        ),
+        "actions": len(layout.actions),
+        "string_bytes_per_scene": round(string_bytes / count, 1) if count else 0.0,
+        "hash_bytes_per_scene": round(hash_bytes / count, 1) if count else 0.0,
+        "ratio": round(string_bytes / hash_bytes, 1) if hash_bytes else 0.0,
+    }
+
+
+async def measure_footprint(records: List[Dict], buckets: int, url: Optional[str] = None) -> Dict:
+    """
+    实测: 同一批记录分别写入两个临时版本，用 MEMORY USAGE 汇总后删除
+
+    需要可用的 Redis（REDIS_URL）；不修改 active version 指针
+    """
+    from loader import bulk_load
+
+    kwargs = {"url": url} if url else {}
+    string_store = RedisStore(**kwargs)
+    hash_store = RedisHashStore(buckets=buckets, **kwargs)
+    results = {}
+    try:
+        for name, store, version in (
+            ("string", string_store, "_footprint_string"),
+            ("hash", hash_store, "_footprint_hash"),
+        ):
+            await bulk_load(store, records, version, ttl=None)
+            keys = [k async for k in store.client.scan_iter(match=f"strat:{version}:*", count=1000)]
+            total = 0
+            for i in range(0, len(keys), 1000):
+                async with store.client.pipeline(transaction=False) as pipe:
+                    for k in keys[i:i + 1000]:
+                        pipe.memory_usage(k, samples=0)
+                    total += sum(n or 0 for n in await pipe.execute())
+            if name == "hash" and keys:
+                sample = next(k for k in keys if b":b:" in k)
+                results["hash_encoding"] = (await store.client.object("encoding", sample)).decode()
+            for i in range(0, len(keys), 1000):
+                await store.client.delete(*keys[i:i + 1000])
+            results[f"{name}_bytes_per_scene"] = round(total / len(records), 1)
+    finally:
+        await string_store.close()
+        await hash_store.close()
+    results["ratio"] = round(results["string_bytes_per_scene"] / results["hash_bytes_per_scene"], 1)
+    return results
+
+
+def main():
+    from loader import iter_records, sample_records
+
+    parser = argparse.ArgumentParser(description="Redis 紧凑存储布局工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report = sub.add_parser("report", help="对比 string / hash 布局的每场景字节数")
+    source = report.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="JSON Lines 策略文件")
+    source.add_argument("--sample", action="store_true", help="使用内置示例数据")
+    report.add_argument("--buckets", type=int, help="桶数（默认按记录数计算）")
+    report.add_argument("--measure", action="store_true", help="写入 Redis 临时版本实测")
+    args = parser.parse_args()
+
+    records = list(sample_records() if args.sample else iter_records(args.input))
+    stats = estimate_footprint(records, args.buckets)
+    print(
+        f"📦 {stats['records']} scenes, {stats['actions']} actions, {stats['buckets']} buckets "
+        f"(max {stats['max_per_bucket']}/bucket, max value {stats['max_value_bytes']} B, "
+        f"listpack={'yes' if stats['listpack'] else 'NO'})"
+    )
+    print(
+        f"  estimate: string {stats['string_bytes_per_scene']} B/scene -> "
+        f"hash {stats['hash_bytes_per_scene']} B/scene ({stats['ratio']}x)"
+    )
+    if args.measure:
+        measured = asyncio.run(measure_footprint(records, stats["buckets"]))
+        print(
+            f"  measured: string {measured['string_bytes_per_scene']} B/scene -> "
+            f"hash {measured['hash_bytes_per_scene']} B/scene ({measured['ratio']}x, "
+            f"encoding={measured.get('hash_encoding')})"
+        )
+    print(f"  set REDIS_HASH_BUCKETS={stats['buckets']} STRATEGY_BACKEND=redis_hash to load")
+
+
+if __name__ == "__main__":
+    main()
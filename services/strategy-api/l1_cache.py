@@ -0,0 +1,142 @@
+"""
+进程内 L1 策略缓存
+
+位于 Redis 之前，缓存已解析的策略数据 (key: strat:{version}:{fingerprint})。
+LRU + TTL 淘汰，启动切换版本时清空旧版本条目，版本重新加载时清除该版本条目。
+
+    - 负缓存: 存储中不存在的 key 以 MISSING 记录（短 TTL），期间不再查询存储
+    - stale-while-revalidate: 条目过期后的宽限期内仍返回旧数据，
+      并通过 on_stale 回调通知调用方在后台刷新
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+L1_CACHE_SIZE = int(os.getenv("L1_CACHE_SIZE", "4096"))
+L1_CACHE_TTL = float(os.getenv("L1_CACHE_TTL", "300"))  # 秒
+L1_NEGATIVE_TTL = float(os.getenv("L1_NEGATIVE_TTL", "10"))  # 未命中 key 的缓存时间（秒）
+L1_STALE_TTL = float(os.getenv("L1_STALE_TTL", "60"))  # 过期后仍可返回旧数据的宽限期（秒）
+
+
+class _Missing:
+    """负缓存标记: 布尔值为 False，与 None（未缓存）区分"""
+
+    __slots__ = ()
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __repr__(self) -> str:
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+
+class StrategyCache:
+    """有界 LRU/TTL 缓存，带命中/未命中计数"""
+
+    def __init__(self, max_size: int = L1_CACHE_SIZE, ttl: float = L1_CACHE_TTL,
+                 negative_ttl: float = L1_NEGATIVE_TTL, stale_ttl: float = L1_STALE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.version: Optional[str] = None
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, data)
+        # 过期条目在宽限期内被读取时调用（由调用方在后台刷新），未设置时不返回过期数据
+        self.on_stale: Optional[Callable[[str], None]] = None
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """返回缓存数据；负缓存返回 MISSING，未缓存或已过期（超出宽限期）返回 None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, data = entry
+        now = time.monotonic()
+        if expires_at < now:
+            if data is not MISSING and self.on_stale and now < expires_at + self.stale_ttl:
+                self.stale_hits += 1
+                self.on_stale(key)
+            else:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+        self._entries.move_to_end(key)
+        if data is MISSING:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return data
+
+    def peek(self, key: str) -> Optional[Dict]:
+        """过载降级用: 返回条目数据（无论是否过期，负缓存视为无），不计数、不触发刷新"""
+        entry = self._entries.get(key)
+        return entry[1] if entry is not None and entry[1] is not MISSING else None
+
+    def set(self, key: str, data: Dict) -> None:
+        self._put(key, data, self.ttl)
+
+    def set_missing(self, key: str) -> None:
+        """记录存储中不存在的 key（negative_ttl 内不再查询存储）"""
+        if self.negative_ttl > 0:
+            self._put(key, MISSING, self.negative_ttl)
+
+    def _put(self, key: str, data, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def set_version(self, version: str) -> int:
+        """切换当前策略版本，清除其他版本的条目，返回清除数量"""
+        if version == self.version:
+            return 0
+        self.version = version
+        prefix = f"strat:{version}:"
+        stale = [k for k in self._entries if not k.startswith(prefix)]
+        for k in stale:
+            del self._entries[k]
+        return len(stale)
+
+    def invalidate_version(self, version: str) -> int:
+        """清除某个版本的全部条目（该版本重新加载时调用），返回清除数量"""
+        prefix = f"strat:{version}:"
+        stale = [k for k in self._entries if k.startswith(prefix)]
+        for k in stale:
+            del self._entries[k]
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses + self.negative_hits
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_s": self.ttl,
+            "negative_ttl_s": self.negative_ttl,
+            "stale_ttl_s": self.stale_ttl,
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "stale_hits": self.stale_hits,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
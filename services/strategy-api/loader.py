@@ -0,0 +1,215 @@
+"""
+策略批量导入
+
+从 JSON Lines 文件流式读取策略记录，按块批量写入存储（Redis 走 pipeline），
+输出进度与吞吐；新版本写入独立的 strat:{version}: 命名空间，全部写完后
+再原子切换 active version 指针。
+
+用法:
+    python loader.py --file solutions.jsonl --version v0.2.0 --activate
+    python loader.py --dump-sample sample.jsonl
+
+记录格式（每行一条）:
+    {"scene": "preflop|BTN|100|OPEN", "actions": [{"action": ..., "frequency": ..., "ev": ...}],
+     "source": "..."}
+也接受已哈希的 "fingerprint" 字段（16位指纹）。
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+import scene_key
+from storage import STRATEGY_TTL, StrategyStore, create_store
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_TTL = STRATEGY_TTL  # 默认 24h，可由 STRATEGY_TTL 覆盖
+PROGRESS_EVERY = 50000  # 每写入多少条输出一次进度
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """流式读取 JSON Lines 记录，跳过空行"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def record_fingerprint(record: Dict) -> str:
+    """
+    记录 -> 存储指纹，并登记到场景索引
+
+    "scene" 或旧格式 "fingerprint"（原始 street|pos|stack|line 串）经 scene_key 规范化哈希，
+    与查询侧 generate_fingerprint 结果一致。
+    """
+    raw = record.get("scene") or record["fingerprint"]
+    if "|" in raw:
+        return scene_key.register_raw(raw)
+    return raw
+
+
+def sample_records() -> Iterator[Dict]:
+    """生成示例 preflop 策略数据（270条）"""
+    positions = ["BTN", "SB", "BB", "UTG", "MP", "CO"]
+    stacks = [20, 30, 40, 50, 60, 80, 100, 150, 200]
+
+    for pos in positions:
+        for stack in stacks:
+            for action_seq in ["OPEN", "CALL", "RAISE", "FOLD_FOLD_RAISE", "RAISE_CALL"]:
+                scene = f"preflop|{pos}|{stack}|{action_seq}"
+
+                # 基于位置调整策略
+                if pos == "BTN":
+                    actions = [
+                        {"action": "raise_2.5x", "frequency": 0.45, "ev": 2.5 + stack / 100},
+                        {"action": "fold", "frequency": 0.30, "ev": 0.0},
+                        {"action": "call", "frequency": 0.25, "ev": 1.8},
+                    ]
+                elif pos == "SB":
+                    actions = [
+                        {"action": "raise_3x", "frequency": 0.35, "ev": 2.0},
+                        {"action": "fold", "frequency": 0.40, "ev": 0.0},
+                        {"action": "call", "frequency": 0.25, "ev": 1.5},
+                    ]
+                elif pos == "BB":
+                    actions = [
+                        {"action": "call", "frequency": 0.40, "ev": 1.2},
+                        {"action": "3bet_9x", "frequency": 0.25, "ev": 3.5},
+                        {"action": "fold", "frequency": 0.35, "ev": 0.0},
+                    ]
+                else:  # UTG, MP, CO
+                    actions = [
+                        {"action": "raise_2.5x", "frequency": 0.25, "ev": 1.5},
+                        {"action": "fold", "frequency": 0.55, "ev": 0.0},
+                        {"action": "call", "frequency": 0.20, "ev": 1.0},
+                    ]
+
+                yield {"scene": scene, "actions": actions, "source": "preflop_db"}
+
+
+async def bulk_load(
+    store: StrategyStore,
+    records: Iterable[Dict],
+    version: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ttl: Optional[int] = DEFAULT_TTL,
+    progress: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
+    """
+    分块写入策略记录到 strat:{version}: 命名空间
+
+    每块调用一次 store.set_many（Redis 为一次 pipeline 往返），
+    progress 回调每 PROGRESS_EVERY 条触发一次。返回导入统计。
+    """
+    start = time.perf_counter()
+    count = 0
+    chunks = 0
+    next_report = PROGRESS_EVERY
+    chunk: Dict[str, Dict] = {}
+
+    def stats() -> Dict:
+        elapsed = time.perf_counter() - start
+        return {
+            "version": version,
+            "records": count,
+            "chunks": chunks,
+            "elapsed_s": round(elapsed, 3),
+            "records_per_s": round(count / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+    for record in records:
+        value = {"actions": record["actions"], "source": record.get("source", "preflop_db")}
+        raw = record.get("scene") or record.get("fingerprint", "")
+        if "|" in raw:
+            value["scene"] = raw  # 原始场景串: 服务重启采用已有版本时据此重建近邻索引
+        chunk[f"strat:{version}:{record_fingerprint(record)}"] = value
+        if len(chunk) >= chunk_size:
+            await store.set_many(chunk, ttl=ttl)
+            count += len(chunk)
+            chunks += 1
+            chunk = {}
+            await asyncio.sleep(0)  # 每块让出事件循环，服务内后台加载时不阻塞在线查询
+            if progress and count >= next_report:
+                progress(stats())
+                next_report += PROGRESS_EVERY
+
+    if chunk:
+        await store.set_many(chunk, ttl=ttl)
+        count += len(chunk)
+        chunks += 1
+
+    return stats()
+
+
+async def load_and_activate(
+    store: StrategyStore,
+    records: Iterable[Dict],
+    version: str,
+    activate: bool = True,
+    **kwargs,
+) -> Dict:
+    """导入完整版本后再切换 active version 指针（单次写入，原子可见）"""
+    result = await bulk_load(store, records, version, **kwargs)
+    if activate:
+        await store.set_active_version(version)
+    result["activated"] = activate
+    return result
+
+
+def print_progress(stats: Dict) -> None:
+    print(
+        f"  ... {stats['records']} records, {stats['chunks']} chunks, "
+        f"{stats['records_per_s']:.0f} rec/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量导入策略数据")
+    parser.add_argument("--file", help="JSON Lines 策略文件")
+    parser.add_argument("--version", help="目标策略版本，如 v0.2.0")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--ttl", type=int, default=DEFAULT_TTL, help="key TTL 秒，0 表示不过期")
+    parser.add_argument("--activate", action="store_true", help="导入完成后切换为当前版本")
+    parser.add_argument("--dump-sample", metavar="PATH", help="导出示例数据为 JSON Lines")
+    args = parser.parse_args()
+
+    if args.dump_sample:
+        with open(args.dump_sample, "w", encoding="utf-8") as f:
+            for record in sample_records():
+                f.write(json.dumps(record) + "\n")
+        print(f"✅ Sample records written to {args.dump_sample}")
+        return
+
+    if not args.file or not args.version:
+        parser.error("--file 和 --version 为必填参数")
+
+    store = create_store()
+    if not store.remote:
+        parser.error("Redis 不可用，批量导入需要 REDIS_URL 指向可用实例")
+
+    async def run():
+        try:
+            return await load_and_activate(
+                store,
+                iter_records(args.file),
+                args.version,
+                activate=args.activate,
+                chunk_size=args.chunk_size,
+                ttl=args.ttl or None,
+                progress=print_progress,
+            )
+        finally:
+            await store.close()
+
+    print(f"🚚 Loading {args.file} into strat:{args.version}: ...")
+    result = asyncio.run(run())
+    print(
+        f"✅ Loaded {result['records']} records in {result['elapsed_s']}s "
+        f"({result['records_per_s']:.0f} rec/s), activated={result['activated']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,91 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+from fastapi import BackgroundTasks, FastAPI, Header, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel, ValidationError
+from typing import Iterable, List, Dict, Optional
+import asyncio
 import json
+import os
+import secrets
+from pathlib import Path
+import threading
 import time
-import hashlib
 from datetime import datetime
 
-# 尝试连接Redis，否则使用内存存储
-try:
-    import redis
-    redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
-    redis_client.ping()
-    USE_REDIS = True
-    print("✅ Connected to Redis")
-except:
-    USE_REDIS = False
-    redis_client = {}
-    print("⚠️ Using in-memory storage (Redis not available)")
+import admission
+import fast_json
+import peers
+import scene_key
+import tracing
+from capture import CaptureMiddleware, traffic_capture
+from failover import REDIS_FAILOVER, FailoverStore
+from l1_cache import StrategyCache
+from metrics import metrics
+from models import SOLUTION_VERSION, HandState, generate_fingerprint  # noqa: F401 (再导出)
+from popularity import load_hot_set, popularity, save_hot_set
+from postflop import load_tables
+from single_flight import SingleFlight
+from loader import bulk_load, iter_records, print_progress, record_fingerprint, sample_records
+from storage import PACKED_STRATEGY_FILE, REDIS_URL, UNAVAILABLE, create_store
+from versions import STATUS_LOADING, VersionError, VersionRegistry, VersionState
 
 app = FastAPI(title="GTO Strategy API", version="0.1.0")
-
-# 全局版本配置
-SOLUTION_VERSION = "v0.1.0"  # 策略版本，升级时更新
+if admission.ADMISSION_CONTROL:
+    # 最内层: 追踪与流量采集也覆盖被拒绝 / 降级的请求（degraded_query 定义在下方）
+    app.add_middleware(admission.AdmissionMiddleware, controller=admission.controller,
+                       degrade=lambda body, version: degraded_query(body, version))
+app.add_middleware(tracing.TracingMiddleware)  # 分阶段耗时 Server-Timing + 慢请求采样
+if traffic_capture is not None:
+    app.add_middleware(CaptureMiddleware, capture=traffic_capture)  # CAPTURE_DIR: 流量采集
 
 # 全局策略数据存储（内存模式）
 strategy_db = {}
 
-# 数据模型
-class HandState(BaseModel):
-    hand_id: str
-    table_id: str
-    street: str  # preflop, flop, turn, river
-    hero_pos: str  # BTN, SB, BB, UTG, MP, CO
-    effective_stack_bb: float
-    pot_bb: float
-    action_line: str
-    hero_cards: Optional[List[str]] = None
-    board: Optional[List[str]] = None
+# 尝试连接Redis（REDIS_URL），否则使用内存存储
+strategy_store = create_store(strategy_db)
+USE_REDIS = strategy_store.remote
+if USE_REDIS:
+    print(f"✅ Connected to Redis ({REDIS_URL}, {strategy_store.backend} layout)")
+elif strategy_store.backend == "packed":
+    print(f"✅ Using packed strategy file ({PACKED_STRATEGY_FILE}, {len(strategy_store)} records)")
+else:
+    print("⚠️ Using in-memory storage (Redis not available)")
+
+# 远程存储: 熔断器 + 当前版本的进程内副本，Redis 故障时读取自动切到副本
+failover: Optional[FailoverStore] = None
+if USE_REDIS and REDIS_FAILOVER:
+    strategy_store = failover = FailoverStore(strategy_store)
+
+# 进程内 L1 缓存（已解析的策略数据），按版本失效
+l1_cache = StrategyCache()
+l1_cache.set_version(SOLUTION_VERSION)
+
+# L1 未命中时的并发存储查询按 cache key 合并
+store_flight = SingleFlight()
+
+# 已加载的策略版本（各自带近邻回退索引）与当前版本指针
+versions = VersionRegistry(SOLUTION_VERSION)
+versions.publish(versions.begin(SOLUTION_VERSION), records=0)
+
+# 翻后列式策略表（POSTFLOP_TABLES 目录，按版本），未构建时为空
+postflop_tables = load_tables()
+if postflop_tables:
+    loaded = ", ".join(f"{v} ({len(t)} scenes)" for v, t in postflop_tables.items())
+    print(f"✅ Postflop tables: {loaded}")
 
+# 管理接口令牌: /admin/* 与 /debug/* 需携带 X-Admin-Token，未设置时这些接口一律拒绝（503）
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# POST /admin/versions/{version}/load 只能读取该目录下的策略文件
+STRATEGY_DATA_DIR = os.getenv("STRATEGY_DATA_DIR", "data")
+
+# 版本加载完成 / 切换版本后预热 L1 的条目上限（热点场景优先）
+WARM_L1_LIMIT = int(os.getenv("WARM_L1_LIMIT", "1024"))
+
+# 数据加载状态: serve.py 在 fork 前预加载并置 preloaded，worker 启动时跳过重复加载
+preloaded = False
+data_ready = False
+
+# 数据模型（HandState 见 models.py）
 class StrategyAdvice(BaseModel):
     request_id: str
     scene_fingerprint: str
@@ -54,214 +102,759 @@ class QueryResponse(BaseModel):
     request_id: str
     server_latency_ms: int
 
-# 生成场景指纹
-def generate_fingerprint(hand_state: HandState) -> str:
-    """基于手牌状态生成唯一指纹"""
-    key_parts = [
-        hand_state.street,
-        hand_state.hero_pos,
-        str(int(hand_state.effective_stack_bb / 10) * 10),  # 离散化
-        hand_state.action_line
-    ]
-    key_string = "|".join(key_parts)
-    return hashlib.sha256(key_string.encode()).hexdigest()[:16]
-
-# 预加载示例数据
+class BatchQueryResponse(BaseModel):
+    success: bool
+    data: List[StrategyAdvice]
+    request_id: str
+    server_latency_ms: int
+
+# 策略版本加载 / 接管 / 切换
+async def load_version(version: str, records: Iterable[Dict], progress=None,
+                       state: Optional[VersionState] = None) -> Dict:
+    """
+    加载一个策略版本到 strat:{version}: 命名空间
+
+    后台分块写入并构建该版本的近邻索引，期间其他版本照常服务；
+    写入完成后预热 L1（热点场景优先，其余按文件顺序补足 WARM_L1_LIMIT 条）再发布为可选版本。
+    不切换当前版本，切换见 activate_version。
+    state 为调用方已登记的加载状态（管理接口在返回 202 前登记，防止重复加载），缺省时新建。
+    """
+    state = state or versions.begin(version)
+    warm_keys: List[str] = []
+
+    def collect(records):
+        for record in state.neighbor_index.track(records):
+            if len(warm_keys) < WARM_L1_LIMIT:
+                warm_keys.append(f"strat:{version}:{record_fingerprint(record)}")
+            yield record
+
+    try:
+        result = await bulk_load(strategy_store, collect(records), version, progress=progress)
+        l1_cache.invalidate_version(version)  # 重新加载同一版本时丢弃旧数据
+        await prewarm_l1(version, warm_keys)
+        if strategy_store.backend == "memory":
+            fast_json.precompute(strategy_db.values())  # 预编码动作列表
+    except Exception as e:
+        versions.fail(state, repr(e))
+        raise
+    versions.publish(state, result["records"])
+    return result
+
+async def adopt_version(version: str) -> int:
+    """
+    采用存储中已有的版本（loader.py --activate 导入）: 不写入任何数据，
+    从 scan_version 读取记录构建近邻索引并预热 L1，返回记录数
+
+    近邻索引需要值中的原始场景串（bulk_load 写入）；紧凑哈希布局不保存场景串，
+    此时近邻回退不可用，未命中直接走保守策略
+    """
+    state = versions.begin(version)
+    records = 0
+    try:
+        async for chunk in strategy_store.scan_version(version):
+            for data in state.neighbor_index.track(chunk.values()):
+                if "scene" in data:
+                    scene_key.register_raw(data["scene"])
+                records += 1
+            await asyncio.sleep(0)  # 分块让出事件循环
+        await prewarm_l1(version)
+    except Exception as e:
+        versions.fail(state, repr(e))
+        raise
+    versions.publish(state, records)
+    return records
+
+async def prewarm_l1(version: str, keys: Iterable[str] = ()) -> int:
+    """
+    按热度预热 L1: 热点场景在前，keys 补足到 WARM_L1_LIMIT 条，返回写入条数
+
+    倒序写入，LRU 中最热的条目最后被淘汰
+    """
+    hot = [f"strat:{version}:{fp}" for fp in popularity.hot_fingerprints(WARM_L1_LIMIT)]
+    warm_keys = list(dict.fromkeys([*hot, *keys]))[:WARM_L1_LIMIT]
+    warmed = 0
+    for key, data in reversed(list(zip(warm_keys, await strategy_store.mget(warm_keys)))):
+        if data:
+            fast_json.actions_bytes(data)
+            l1_cache.set(key, data)
+            warmed += 1
+    return warmed
+
+async def activate_version(version: str) -> str:
+    """先写存储中的 active version 指针，再原子切换进程内当前版本，返回旧版本"""
+    versions.require(version)
+    if not strategy_store.read_only:
+        await strategy_store.set_active_version(version)
+    return await switch_version(version)
+
+async def switch_version(version: str) -> str:
+    """只切换本进程的当前版本（副本跟随、预热 L1），返回旧版本；其他 worker 重放切换时使用"""
+    previous = versions.activate(version)
+    if failover is not None:
+        failover.follow(version)
+    warmed = await prewarm_l1(version)  # 加载后 L1 中的条目可能已被旧版本流量挤出
+    print(f"🔀 Active solution version: {previous} -> {version} ({warmed} hot scenes warmed)")
+    return previous
+
+# 预加载策略数据
 @app.on_event("startup")
 async def load_sample_data():
-    """加载200-500条preflop示例数据到Redis"""
-    global strategy_db
-    sample_data = [
-        # BTN vs BB 场景
-        {
-            "fingerprint": "preflop|BTN|50|FOLD_FOLD_FOLD_FOLD_RAISE",
-            "actions": [
-                {"action": "raise_2.5x", "frequency": 0.45, "ev": 2.5},
-                {"action": "fold", "frequency": 0.35, "ev": 0.0},
-                {"action": "call", "frequency": 0.20, "ev": 1.8}
-            ]
-        },
-        {
-            "fingerprint": "preflop|BTN|100|FOLD_FOLD_FOLD_FOLD_RAISE",
-            "actions": [
-                {"action": "raise_2.5x", "frequency": 0.55, "ev": 3.2},
-                {"action": "raise_3x", "frequency": 0.25, "ev": 3.0},
-                {"action": "fold", "frequency": 0.20, "ev": 0.0}
-            ]
-        },
-        # SB vs BTN 场景
-        {
-            "fingerprint": "preflop|SB|30|RAISE_CALL",
-            "actions": [
-                {"action": "3bet_9x", "frequency": 0.40, "ev": 4.5},
-                {"action": "call", "frequency": 0.35, "ev": 2.1},
-                {"action": "fold", "frequency": 0.25, "ev": 0.0}
-            ]
-        },
-        # BB 防守场景
-        {
-            "fingerprint": "preflop|BB|40|RAISE",
-            "actions": [
-                {"action": "3bet_10x", "frequency": 0.30, "ev": 5.2},
-                {"action": "call", "frequency": 0.50, "ev": 2.8},
-                {"action": "fold", "frequency": 0.20, "ev": 0.0}
-            ]
-        },
-        # UTG 开局场景
-        {
-            "fingerprint": "preflop|UTG|100|FOLD_FOLD_FOLD_FOLD",
-            "actions": [
-                {"action": "raise_2.5x", "frequency": 0.25, "ev": 1.8},
-                {"action": "raise_3x", "frequency": 0.15, "ev": 1.6},
-                {"action": "fold", "frequency": 0.60, "ev": 0.0}
-            ]
-        },
-        # MP 场景
-        {
-            "fingerprint": "preflop|MP|80|FOLD_FOLD_FOLD",
-            "actions": [
-                {"action": "raise_2.5x", "frequency": 0.30, "ev": 2.1},
-                {"action": "raise_3x", "frequency": 0.20, "ev": 1.9},
-                {"action": "fold", "frequency": 0.50, "ev": 0.0}
-            ]
-        },
-        # CO 场景
-        {
-            "fingerprint": "preflop|CO|60|FOLD_FOLD_FOLD_FOLD",
-            "actions": [
-                {"action": "raise_2.5x", "frequency": 0.40, "ev": 2.8},
-                {"action": "raise_3x", "frequency": 0.20, "ev": 2.5},
-                {"action": "fold", "frequency": 0.40, "ev": 0.0}
-            ]
-        }
-    ]
-    
-    # 生成更多变体数据（达到200+条）
-    positions = ["BTN", "SB", "BB", "UTG", "MP", "CO"]
-    stacks = [20, 30, 40, 50, 60, 80, 100, 150, 200]
+    """
+    分块批量加载策略数据到Redis/内存
+
+    - 设置 STRATEGY_FILE 时从 JSON Lines 文件导入（存储中有 active version 指针时写入该版本）
+    - 否则存储中已有 active version 指针（loader.py --activate 写入）时直接采用该版本，
+      不写入任何数据，近邻索引从存储中的记录重建
+    - 都没有时加载270条preflop示例数据到缺省版本
+    只读存储（packed 文件）不导入数据，版本取自文件头。
+    """
+    global data_ready
+    if preloaded:
+        return
     
-    count = 0
-    for pos in positions:
-        for stack in stacks:
-            for action_seq in ["OPEN", "CALL", "RAISE", "FOLD_FOLD_RAISE", "RAISE_CALL"]:
-                fingerprint = f"preflop|{pos}|{stack}|{action_seq}"
-                
-                # 基于位置调整策略
-                if pos == "BTN":
-                    actions = [
-                        {"action": "raise_2.5x", "frequency": 0.45, "ev": 2.5 + stack/100},
-                        {"action": "fold", "frequency": 0.30, "ev": 0.0},
-                        {"action": "call", "frequency": 0.25, "ev": 1.8}
-                    ]
-                elif pos == "SB":
-                    actions = [
-                        {"action": "raise_3x", "frequency": 0.35, "ev": 2.0},
-                        {"action": "fold", "frequency": 0.40, "ev": 0.0},
-                        {"action": "call", "frequency": 0.25, "ev": 1.5}
-                    ]
-                elif pos == "BB":
-                    actions = [
-                        {"action": "call", "frequency": 0.40, "ev": 1.2},
-                        {"action": "3bet_9x", "frequency": 0.25, "ev": 3.5},
-                        {"action": "fold", "frequency": 0.35, "ev": 0.0}
-                    ]
-                else:  # UTG, MP, CO
-                    actions = [
-                        {"action": "raise_2.5x", "frequency": 0.25, "ev": 1.5},
-                        {"action": "fold", "frequency": 0.55, "ev": 0.0},
-                        {"action": "call", "frequency": 0.20, "ev": 1.0}
-                    ]
-                
-                if USE_REDIS:
-                    redis_client.setex(
-                        f"strat:{SOLUTION_VERSION}:{fingerprint}",
-                        86400,  # 24h TTL
-                        json.dumps({"actions": actions, "source": "preflop_db"})
-                    )
-                else:
-                    strategy_db[f"strat:{SOLUTION_VERSION}:{fingerprint}"] = {"actions": actions, "source": "preflop_db"}
-                count += 1
+    active = await strategy_store.get_active_version()
+    version = active or SOLUTION_VERSION
+    l1_cache.set_version(version)
+    hot = load_hot_set()  # 上次关闭时的热点集合，用于预热
+    if hot:
+        print(f"🔥 Loaded {hot} hot scenes for prewarming")
     
-    print(f"✅ Loaded {count} sample strategy records to {'Redis' if USE_REDIS else 'memory'}")
+    if strategy_store.read_only:
+        versions.publish(versions.begin(version), len(strategy_store))
+        await prewarm_l1(version)
+    elif active and not os.getenv("STRATEGY_FILE"):
+        records = await adopt_version(version)
+        print(f"✅ Using active version {version} from {strategy_store.backend}: {records} records")
+    else:
+        strategy_file = os.getenv("STRATEGY_FILE")
+        records = iter_records(strategy_file) if strategy_file else sample_records()
+        result = await load_version(version, records, progress=print_progress)
+        print(
+            f"✅ Loaded {result['records']} strategy records to "
+            f"{'Redis' if USE_REDIS else 'memory'} "
+            f"in {result['elapsed_s']}s ({result['records_per_s']:.0f} rec/s)"
+        )
+    if version != versions.active:
+        versions.activate(version)
+        versions.discard(SOLUTION_VERSION)  # 缺省版本未加载数据
+        print(f"🔀 Active solution version: {version}")
+    data_ready = True
+
+@app.on_event("startup")
+async def start_replica():
+    """每个进程（含 serve.py fork 出的 worker）各自启动副本同步任务"""
+    if failover is not None:
+        failover.follow(versions.active)
+
+async def apply_peer_event(event: Dict) -> None:
+    """
+    重放其他 worker 完成的管理操作（serve.py 转发，见 peers.py）
+
+    共享存储（Redis）中数据已由发起的 worker 写入，这里只接管（adopt_version 不写入）；
+    内存存储每个进程各有一份，重新读取同一文件加载
+    """
+    op, version = event["op"], event["version"]
+    if op == peers.EVENT_LOADED:
+        if strategy_store.remote:
+            records = await adopt_version(version)
+        else:
+            file = event.get("file")
+            records = (await load_version(
+                version, iter_records(file) if file else sample_records()
+            ))["records"]
+        print(f"✅ Loaded version {version} from peer: {records} records")
+    elif op == peers.EVENT_ACTIVATED:
+        if versions.get(version) is None and strategy_store.remote:
+            await adopt_version(version)
+        await switch_version(version)
+    elif op == peers.EVENT_DEPRECATED:
+        versions.deprecate(version, event.get("sunset_date"))
+
+@app.on_event("startup")
+async def start_peers():
+    """serve.py 的 worker 接收其他 worker 的版本加载 / 切换 / 弃用事件"""
+    await peers.channel.start(apply_peer_event)
+
+@app.on_event("shutdown")
+async def close_store():
+    """保存热点集合，释放存储连接池，写完采集队列"""
+    save_hot_set()
+    await strategy_store.close()
+    if traffic_capture is not None:
+        traffic_capture.close()
 
 @app.get("/health")
 async def health_check():
     """健康检查端点"""
     return {"status": "ok", "timestamp": datetime.now().isoformat()}
 
+@app.get("/ready")
+async def readiness_check():
+    """就绪检查端点: 策略数据加载完成前返回503"""
+    if not data_ready:
+        raise HTTPException(status_code=503, detail="Strategy data is still loading")
+    return {"status": "ready", "solution_version": versions.active, "pid": os.getpid()}
+
+@app.get("/v1/version")
+async def get_version():
+    """版本查询: 当前版本、可选版本与已弃用版本"""
+    return versions.summary()
+
+# 未命中时的保守策略
+FALLBACK_STRATEGY = {
+    "actions": [
+        {"action": "fold", "frequency": 0.80, "ev": 0.0},
+        {"action": "call", "frequency": 0.15, "ev": 0.5},
+        {"action": "raise_2.5x", "frequency": 0.05, "ev": 1.2}
+    ],
+    "source": "fallback_safe"
+}
+
+# 批量查询单次最多场景数
+MAX_BATCH_SIZE = 64
+
+async def fetch_strategy(cache_key: str) -> Optional[Dict]:
+    """查询存储（远程存储时合并相同 key 的并发查询）"""
+    if strategy_store.remote:
+        return await store_flight.do(cache_key, strategy_store.get)
+    return await strategy_store.get(cache_key)
+
+async def fetch_strategies(cache_keys: List[str]) -> List[Optional[Dict]]:
+    """批量查询存储（远程存储时在途的 key 复用已有查询，其余合并为一次 MGET）"""
+    if strategy_store.remote:
+        return await store_flight.do_many(cache_keys, strategy_store.mget)
+    return await strategy_store.mget(cache_keys)
+
+def lookup_postflop(hand_state: HandState, scene: scene_key.SceneTuple,
+                    state: VersionState) -> Optional[Dict]:
+    """
+    翻后场景: 公共牌花色同构规范化后按手牌组合查询列式策略表
+
+    表未加载、场景未收录、手牌不在范围内或牌面无效时返回 None（继续近邻/fallback）
+    """
+    tables = postflop_tables.get(state.version)
+    if tables is None or len(scene) != 5 or not hand_state.hero_cards:
+        return None  # 翻前或未提供公共牌的场景元组不带公共牌
+    try:
+        return tables.lookup(scene, hand_state.board, hand_state.hero_cards)
+    except ValueError:
+        return None
+
+def cache_result(cache_key: str, data: Optional[Dict]) -> None:
+    """存储读取结果写入 L1: 命中缓存数据；只有存储确认不存在时写负缓存（UNAVAILABLE 不缓存）"""
+    if data:
+        l1_cache.set(cache_key, data)
+    elif data is not UNAVAILABLE:
+        l1_cache.set_missing(cache_key)
+
+async def lookup_strategies(cache_keys: List[str]) -> List[tuple]:
+    """
+    批量查询策略: 先查 L1 缓存，剩余的 key 一次 MGET 查询存储
+
+    返回与 cache_keys 顺序一致的 (data, source) 列表，未命中时 data 为假值
+    （None 或负缓存标记 MISSING）
+    """
+    results = [(l1_cache.get(key), "l1_hit") for key in cache_keys]
+    missing = [i for i, (data, _) in enumerate(results) if data is None]
+    if missing:
+        fetched = await fetch_strategies([cache_keys[i] for i in missing])
+        for i, data in zip(missing, fetched):
+            results[i] = (data, strategy_store.hit_source)
+            cache_result(cache_keys[i], data)
+    return results
+
+# 正在后台刷新的 L1 key 与刷新任务（持有引用防止任务被回收）
+revalidating: set = set()
+background_tasks: set = set()
+
+def revalidate(cache_key: str) -> None:
+    """L1 条目过期但仍在宽限期内: 先返回旧数据，同一 key 只发起一次后台刷新"""
+    if cache_key in revalidating:
+        return
+    try:
+        task = asyncio.get_running_loop().create_task(refresh_l1(cache_key))
+    except RuntimeError:
+        return  # 不在事件循环中（如离线工具），不刷新
+    revalidating.add(cache_key)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+async def refresh_l1(cache_key: str) -> None:
+    try:
+        data = await fetch_strategy(cache_key)
+        if data:
+            fast_json.actions_bytes(data)
+        cache_result(cache_key, data)
+    except Exception as e:
+        # 刷新失败保留旧条目，宽限期结束后按普通未命中处理
+        print(f"⚠️ L1 refresh failed for {cache_key}: {e!r}")
+    finally:
+        revalidating.discard(cache_key)
+
+l1_cache.on_stale = revalidate
+
+def resolve_strategy(cached_data: Optional[Dict], source: str,
+                     scene: Optional[scene_key.SceneTuple] = None,
+                     state: Optional[VersionState] = None) -> tuple:
+    """
+    确定返回的策略: 命中直接返回，未命中先找该版本的近邻策略，再退回fallback策略
+
+    返回 (data, source, confidence, cache_status)
+    """
+    if cached_data:
+        return cached_data, source, 0.95, "hit"
+    state = state or versions.resolve(None)
+    neighbor = state.neighbor_index.lookup(scene) if scene is not None else None
+    if neighbor:
+        # 未命中 - 近邻插值/最近档位
+        data, confidence = neighbor
+        return data, data["source"], confidence, "approx"
+    # 未命中 - 返回fallback策略
+    return FALLBACK_STRATEGY, "fallback", 0.60, "miss"
+
+def build_advice(request_id: str, fingerprint: str, cached_data: Optional[Dict],
+                 source: str, retrieval_latency: int,
+                 scene: Optional[scene_key.SceneTuple] = None,
+                 state: Optional[VersionState] = None) -> StrategyAdvice:
+    """构造 StrategyAdvice 模型（响应 schema 的参考实现，热路径使用 encode_advice）"""
+    state = state or versions.resolve(None)
+    data, source, confidence, cache_status = resolve_strategy(cached_data, source, scene, state)
+    return StrategyAdvice(
+        request_id=request_id,
+        scene_fingerprint=fingerprint,
+        solution_version=state.version,  # 强制返回实际使用的版本号
+        actions=data["actions"],
+        source=source,
+        confidence=confidence,
+        retrieval_latency_ms=retrieval_latency,
+        cache_status=cache_status
+    )
+
+def encode_advice(request_id: str, fingerprint: str, cached_data: Optional[Dict],
+                  source: str, retrieval_latency: int,
+                  scene: Optional[scene_key.SceneTuple] = None,
+                  state: Optional[VersionState] = None) -> tuple:
+    """
+    快速路径: 直接编码 StrategyAdvice JSON（动作列表使用预编码 bytes）
+
+    返回 (advice_json_bytes, cache_status)
+    """
+    state = state or versions.resolve(None)
+    data, source, confidence, cache_status = resolve_strategy(cached_data, source, scene, state)
+    encoded = fast_json.advice_bytes(
+        request_id, fingerprint, state.version, data, source, confidence,
+        retrieval_latency, cache_status
+    )
+    return encoded, cache_status
+
+def degraded_query(body: bytes, version: Optional[str]) -> Optional[bytes]:
+    """
+    过载降级: 只查 L1（允许过期条目），不访问存储，未缓存时走近邻 / 保守策略
+
+    请求体或版本无效时返回 None（由准入中间件返回 503）
+    """
+    try:
+        hand_state = HandState.model_validate_json(body)
+        state = versions.resolve(version)
+    except (ValidationError, VersionError):
+        return None
+    scene = scene_key.scene_of(hand_state)
+    fingerprint = scene_key.fingerprint(scene)
+    request_id = f"req_{int(time.time() * 1000)}"
+    cached_data = l1_cache.peek(f"strat:{state.version}:{fingerprint}")
+    advice, _ = encode_advice(request_id, fingerprint, cached_data, "l1_degraded", 0, scene, state)
+    return fast_json.query_response_bytes(advice, request_id, 0)
+
+def deadline_exceeded_response() -> fast_json.RawJSONResponse:
+    """截止时间已过（客户端已放弃），不再访问存储"""
+    admission.controller.expired += 1
+    return fast_json.RawJSONResponse(admission.error_body(
+        "DEADLINE_EXCEEDED", "Request deadline passed before retrieval", {}
+    ), status_code=504)
+
+# cache_status -> 指标中的结果分类
+OUTCOME_BY_STATUS = {"hit": "hit", "approx": "approx", "miss": "fallback"}
+
+def version_error_response(e: VersionError) -> JSONResponse:
+    """版本协商错误响应（格式见 docs/version_strategy.md）"""
+    return JSONResponse(e.to_response(), status_code=e.status_code)
+
 @app.post("/v1/strategy/query", response_model=QueryResponse)
-async def query_strategy(hand_state: HandState):
+async def query_strategy(hand_state: HandState,
+                         x_solution_version: Optional[str] = Header(None)):
     """
     查询GTO策略建议
     
+    - 按 X-Solution-Version 选择已加载版本（缺省为当前版本）
     - 生成场景指纹
-    - 查询Redis缓存
+    - 查询L1缓存 / Redis
     - 返回策略建议
     """
-    start_time = time.time()
-    request_id = f"req_{int(start_time * 1000)}"
-    
-    # 生成指纹
-    fingerprint = generate_fingerprint(hand_state)
-    cache_key = f"strat:{SOLUTION_VERSION}:{fingerprint}"  # 版本强绑定
-    
-    # 查询Redis或内存存储
-    retrieval_start = time.time()
-    if USE_REDIS:
-        cached_data = redis_client.get(cache_key)
-        cached_data = json.loads(cached_data) if cached_data else None
-    else:
-        cached_data = strategy_db.get(cache_key)
-    retrieval_latency = int((time.time() - retrieval_start) * 1000)
-    
-    if cached_data:
-        data = cached_data
-        source = "redis_hit" if USE_REDIS else "memory_hit"
-        cache_status = "hit"
-        confidence = 0.95
-    else:
-            # 未命中 - 返回fallback策略
-            data = {
-                "actions": [
-                    {"action": "fold", "frequency": 0.80, "ev": 0.0},
-                    {"action": "call", "frequency": 0.15, "ev": 0.5},
-                    {"action": "raise_2.5x", "frequency": 0.05, "ev": 1.2}
-                ],
-                "source": "fallback_safe"
-            }
-            source = "fallback"
-            cache_status = "miss"
-            confidence = 0.60
+    try:
+        state = versions.resolve(x_solution_version)
+    except VersionError as e:
+        return version_error_response(e)
+    start_ns = time.perf_counter_ns()
+    tracing.begin_handler(start_ns)
+    request_id = f"req_{int(time.time() * 1000)}"
+    metrics.in_flight += 1
+    try:
+        # 生成指纹
+        scene = scene_key.scene_of(hand_state)
+        fingerprint = scene_key.fingerprint(scene)
+        cache_key = f"strat:{state.version}:{fingerprint}"  # 版本强绑定
+        retrieval_start_ns = time.perf_counter_ns()
+        tracing.observe("fingerprint", retrieval_start_ns - start_ns)
+        
+        # 先查 L1 缓存（含负缓存），未命中再查Redis或内存存储（非阻塞，并发相同 key 合并）
+        cached_data = l1_cache.get(cache_key)
+        source = "l1_hit"
+        if cached_data is None:
+            if admission.expired():
+                return deadline_exceeded_response()
+            cached_data = await fetch_strategy(cache_key)
+            source = strategy_store.hit_source
+            cache_result(cache_key, cached_data)
+        if not cached_data and postflop_tables:
+            cached_data = lookup_postflop(hand_state, scene, state)
+            source = "postflop_table"
+        build_start_ns = time.perf_counter_ns()
+        retrieval_ns = build_start_ns - retrieval_start_ns
+        tracing.observe("retrieval", retrieval_ns)
+        
+        advice, cache_status = encode_advice(
+            request_id, fingerprint, cached_data, source, retrieval_ns // 1_000_000, scene, state
+        )
+        metrics.count_outcome(scene[0], scene[1], OUTCOME_BY_STATUS[cache_status])
+        popularity.record(fingerprint, scene, cache_status)
+        tracing.annotate(solution_version=state.version, source=source, cache_status=cache_status)
+        
+        # 快速序列化: 拼接预编码 bytes，跳过 Pydantic 响应模型构造与校验
+        end_ns = time.perf_counter_ns()
+        body = fast_json.query_response_bytes(
+            advice, request_id, (end_ns - start_ns) // 1_000_000
+        )
+        tracing.observe("serialization", time.perf_counter_ns() - build_start_ns)
+        return fast_json.RawJSONResponse(body)
+    finally:
+        metrics.in_flight -= 1
+        metrics.observe("request", time.perf_counter_ns() - start_ns)
+
+@app.post("/v1/strategy/query_batch", response_model=BatchQueryResponse)
+async def query_strategy_batch(hand_states: List[HandState],
+                               x_solution_version: Optional[str] = Header(None)):
+    """
+    批量查询GTO策略建议（多桌场景）
     
-    # 获取最佳动作
-    best_action = max(data["actions"], key=lambda x: x["ev"])
+    - 整批使用同一版本（X-Solution-Version，缺省为当前版本）
+    - 一次性生成所有场景指纹
+    - L1 未命中的 key 合并为一次 MGET
+    - 按请求顺序返回每个场景的策略建议，命中/fallback语义与单条查询一致
+    """
+    if len(hand_states) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch size {len(hand_states)} exceeds limit {MAX_BATCH_SIZE}"
+        )
+    try:
+        state = versions.resolve(x_solution_version)
+    except VersionError as e:
+        return version_error_response(e)
     
-    server_latency = int((time.time() - start_time) * 1000)
+    start_ns = time.perf_counter_ns()
+    tracing.begin_handler(start_ns)
+    request_id = f"req_{int(time.time() * 1000)}"
+    metrics.in_flight += 1
+    try:
+        scenes = [scene_key.scene_of(hs) for hs in hand_states]
+        fingerprints = [scene_key.fingerprint(scene) for scene in scenes]
+        cache_keys = [f"strat:{state.version}:{fp}" for fp in fingerprints]
+        retrieval_start_ns = time.perf_counter_ns()
+        tracing.observe("fingerprint", retrieval_start_ns - start_ns)
+        
+        if admission.expired():
+            return deadline_exceeded_response()
+        results = await lookup_strategies(cache_keys)
+        build_start_ns = time.perf_counter_ns()
+        retrieval_ns = build_start_ns - retrieval_start_ns
+        tracing.observe("retrieval", retrieval_ns)
+        
+        advices = []
+        for i, (fp, scene, (data, source)) in enumerate(zip(fingerprints, scenes, results)):
+            if not data and postflop_tables:
+                data, source = lookup_postflop(hand_states[i], scene, state), "postflop_table"
+            advice, cache_status = encode_advice(
+                f"{request_id}_{i}", fp, data, source, retrieval_ns // 1_000_000, scene, state
+            )
+            metrics.count_outcome(scene[0], scene[1], OUTCOME_BY_STATUS[cache_status])
+            popularity.record(fp, scene, cache_status)
+            advices.append(advice)
+        tracing.annotate(solution_version=state.version, batch_size=len(hand_states))
+        
+        end_ns = time.perf_counter_ns()
+        body = fast_json.batch_response_bytes(
+            advices, request_id, (end_ns - start_ns) // 1_000_000
+        )
+        tracing.observe("serialization", time.perf_counter_ns() - build_start_ns)
+        return fast_json.RawJSONResponse(body)
+    finally:
+        metrics.in_flight -= 1
+        metrics.observe("batch_request", time.perf_counter_ns() - start_ns)
+
+# 单个 WebSocket 连接最多订阅的桌数
+MAX_STREAM_TABLES = 32
+
+@app.websocket("/v1/strategy/stream")
+async def stream_strategy(websocket: WebSocket):
+    """
+    按桌订阅策略建议（WebSocket）
     
-    return QueryResponse(
-        success=True,
-        data=StrategyAdvice(
-            request_id=request_id,
-            scene_fingerprint=fingerprint,
-            solution_version=SOLUTION_VERSION,  # 强制返回版本号
-            actions=data["actions"],
-            source=source,
-            confidence=confidence,
-            retrieval_latency_ms=retrieval_latency,
-            cache_status=cache_status
-        ),
-        request_id=request_id,
-        server_latency_ms=server_latency
+    - 客户端每条消息为某张桌的 HandState 增量: {"table_id": ..., 变化字段...}
+    - 服务端维护每桌的完整状态，合并增量后仅在场景指纹变化时重新查询
+    - 推送帧: {"type": "advice", "table_id", "data": StrategyAdvice}
+    - {"type": "close_table", "table_id"} 释放该桌状态；错误（含非 JSON / 非对象帧）以
+      {"type": "error"} 帧返回，连接保持可用
+    - 版本由握手时的 X-Solution-Version 头或 ?version= 指定，缺省跟随当前版本
+    """
+    await websocket.accept()
+    requested_version = (
+        websocket.headers.get("x-solution-version") or websocket.query_params.get("version")
     )
+    try:
+        versions.resolve(requested_version)
+    except VersionError as e:
+        await websocket.send_json({"type": "error", **e.to_response()["error"]})
+        await websocket.close(code=1008)
+        return
+    tables: Dict[str, Dict] = {}  # table_id -> 合并后的 HandState 字段
+    last_fingerprint: Dict[str, str] = {}
+    try:
+        while True:
+            raw = await websocket.receive()
+            if raw["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(raw.get("code", 1000))
+            try:
+                message = json.loads(raw.get("text") or raw.get("bytes") or "")
+            except ValueError:
+                await websocket.send_json({"type": "error", "detail": "Frame is not valid JSON"})
+                continue
+            if not isinstance(message, dict):
+                await websocket.send_json(
+                    {"type": "error", "detail": "Frame must be a JSON object"}
+                )
+                continue
+            table_id = message.get("table_id")
+            if not table_id:
+                await websocket.send_json({"type": "error", "detail": "table_id is required"})
+                continue
+            if message.get("type") == "close_table":
+                tables.pop(table_id, None)
+                last_fingerprint.pop(table_id, None)
+                continue
+            if table_id not in tables and len(tables) >= MAX_STREAM_TABLES:
+                await websocket.send_json({
+                    "type": "error",
+                    "table_id": table_id,
+                    "detail": f"Too many tables per stream (limit {MAX_STREAM_TABLES})"
+                })
+                continue
+            
+            state = tables.setdefault(table_id, {})
+            state.update({k: v for k, v in message.items() if k != "type"})
+            try:
+                hand_state = HandState(**state)
+            except ValidationError as e:
+                await websocket.send_json({
+                    "type": "error",
+                    "table_id": table_id,
+                    "detail": e.errors(include_url=False, include_context=False)
+                })
+                continue
+            
+            scene = scene_key.scene_of(hand_state)
+            fingerprint = scene_key.fingerprint(scene)
+            if last_fingerprint.get(table_id) == fingerprint:
+                continue  # 场景未变化，客户端沿用上一帧建议
+            try:
+                vstate = versions.resolve(requested_version)  # 未指定版本时跟随热切换
+            except VersionError as e:
+                await websocket.send_json(
+                    {"type": "error", "table_id": table_id, **e.to_response()["error"]}
+                )
+                continue
+            last_fingerprint[table_id] = fingerprint
+            
+            start_ns = time.perf_counter_ns()
+            [(data, source)] = await lookup_strategies([f"strat:{vstate.version}:{fingerprint}"])
+            if not data and postflop_tables:
+                data, source = lookup_postflop(hand_state, scene, vstate), "postflop_table"
+            retrieval_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
+            advice, cache_status = encode_advice(
+                f"ws_{int(time.time() * 1000)}", fingerprint, data, source, retrieval_ms, scene,
+                vstate
+            )
+            metrics.count_outcome(scene[0], scene[1], OUTCOME_BY_STATUS[cache_status])
+            frame = b'{"type":"advice","table_id":' + fast_json.dumps(table_id)
+            await websocket.send_text((frame + b',"data":' + advice + b"}").decode())
+    except WebSocketDisconnect:
+        pass
+
+class LoadVersionRequest(BaseModel):
+    file: Optional[str] = None  # STRATEGY_DATA_DIR 下的 JSON Lines 文件，缺省加载示例数据
+    activate: bool = True  # 加载完成后切换为当前版本
+
+def check_admin(token: Optional[str]) -> None:
+    """校验 X-Admin-Token；未配置 ADMIN_TOKEN 时管理接口关闭（fail closed）"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=503, detail="Admin API disabled: ADMIN_TOKEN is not set")
+    if not secrets.compare_digest(token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def resolve_data_file(file: str) -> str:
+    """管理接口传入的策略文件路径 -> STRATEGY_DATA_DIR 内的绝对路径（目录外 403，不存在 404）"""
+    root = Path(STRATEGY_DATA_DIR).resolve()
+    path = (root / file).resolve()
+    if not path.is_relative_to(root):
+        raise HTTPException(status_code=403, detail=f"File must be inside {STRATEGY_DATA_DIR}")
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail=f"Strategy file not found: {file}")
+    return str(path)
+
+async def load_version_task(state: VersionState, file: Optional[str], activate: bool) -> None:
+    """后台加载任务: 失败记录在版本状态中，不影响正在服务的版本"""
+    version = state.version
+    try:
+        records = iter_records(file) if file else sample_records()
+        result = await load_version(version, records, state=state)
+        print(f"✅ Loaded version {version}: {result['records']} records in {result['elapsed_s']}s")
+        peers.channel.publish(peers.EVENT_LOADED, version, file=file)
+        if activate:
+            await activate_version(version)
+            peers.channel.publish(peers.EVENT_ACTIVATED, version)
+    except Exception as e:
+        print(f"❌ Loading version {version} failed: {e!r}")
+
+@app.get("/admin/versions")
+async def list_versions(x_admin_token: Optional[str] = Header(None)):
+    """已加载/加载中的版本及状态"""
+    check_admin(x_admin_token)
+    return {"current_version": versions.active, "versions": versions.info()}
+
+@app.post("/admin/versions/{version}/load", status_code=202)
+async def admin_load_version(version: str, body: LoadVersionRequest,
+                             background_tasks: BackgroundTasks,
+                             x_admin_token: Optional[str] = Header(None)):
+    """
+    后台加载新版本（不重启、不阻塞查询）
+
+    写入 strat:{version}: → 构建近邻索引 → 预热 L1 → 发布；activate=true 时再原子切换当前版本。
+    通过 GET /admin/versions 查看进度。
+    """
+    check_admin(x_admin_token)
+    if strategy_store.read_only:
+        raise HTTPException(status_code=409, detail="Strategy store is read-only")
+    file = resolve_data_file(body.file) if body.file else None
+    if versions.is_loading(version):
+        raise HTTPException(status_code=409, detail=f"Version {version} is already loading")
+    state = versions.begin(version)  # 返回前登记为 loading，紧接着的重复请求得到 409
+    background_tasks.add_task(load_version_task, state, file, body.activate)
+    return {"version": version, "status": STATUS_LOADING, "activate": body.activate}
+
+@app.post("/admin/versions/{version}/activate")
+async def admin_activate_version(version: str, x_admin_token: Optional[str] = Header(None)):
+    """切换当前版本（仅限已加载完成的版本）"""
+    check_admin(x_admin_token)
+    try:
+        previous = await activate_version(version)
+    except VersionError as e:
+        return version_error_response(e)
+    peers.channel.publish(peers.EVENT_ACTIVATED, version)
+    return {"previous_version": previous, "current_version": versions.active}
+
+@app.post("/admin/versions/{version}/deprecate")
+async def admin_deprecate_version(version: str, sunset_date: Optional[str] = None,
+                                  x_admin_token: Optional[str] = Header(None)):
+    """标记版本弃用: 之后显式请求该版本返回 410 VERSION_DEPRECATED"""
+    check_admin(x_admin_token)
+    if version == versions.active:
+        raise HTTPException(status_code=409, detail="Cannot deprecate the active version")
+    try:
+        versions.deprecate(version, sunset_date)
+    except VersionError as e:
+        return version_error_response(e)
+    peers.channel.publish(peers.EVENT_DEPRECATED, version, sunset_date=sunset_date)
+    return versions.summary()
+
+# 单次采样分析的最长时长（秒）
+MAX_PROFILE_SECONDS = 60
+
+@app.get("/debug/slow_requests")
+async def get_slow_requests(limit: int = 50, x_admin_token: Optional[str] = Header(None)):
+    """慢请求环形缓冲（新的在前），每条含各阶段耗时分解与标注"""
+    check_admin(x_admin_token)
+    return {**tracing.slow_requests.stats(), "requests": tracing.slow_requests.recent(limit)}
+
+@app.get("/debug/hot_scenes")
+async def get_hot_scenes(limit: int = 50, x_admin_token: Optional[str] = Header(None)):
+    """
+    最热的场景与未命中最多的场景（近似 top-K，count 为上界，error 为误差上界）
+
+    requests 用于容量规划与 L1 大小评估，misses 为下一批待求解场景的优先级
+    """
+    check_admin(x_admin_token)
+    return popularity.snapshot(max(0, limit))
+
+@app.post("/debug/profile", status_code=202)
+async def start_profile(seconds: float = 5.0, interval_ms: float = 5.0,
+                        x_admin_token: Optional[str] = Header(None)):
+    """对事件循环线程启动一次栈采样，结果通过 GET /debug/profile 获取"""
+    check_admin(x_admin_token)
+    if not 0 < seconds <= MAX_PROFILE_SECONDS or interval_ms < 1:
+        raise HTTPException(
+            status_code=422,
+            detail=f"seconds must be in (0, {MAX_PROFILE_SECONDS}], interval_ms >= 1"
+        )
+    if not tracing.profiler.start(threading.get_ident(), seconds, interval_ms):
+        raise HTTPException(status_code=409, detail="A profile capture is already running")
+    return {"status": "running", "seconds": seconds, "interval_ms": interval_ms}
+
+@app.get("/debug/profile")
+async def get_profile(x_admin_token: Optional[str] = Header(None)):
+    """最近一次采样结果（collapsed stacks，按次数降序）"""
+    check_admin(x_admin_token)
+    return {"running": tracing.profiler.running, "last": tracing.profiler.last}
 
 @app.get("/metrics")
-async def get_metrics():
-    """获取基础指标"""
-    # 这里简化实现，实际应该从Redis或监控系统中获取
+async def get_metrics(format: str = "json"):
+    """
+    服务端运行时指标
+    
+    - format=json（默认）: 延迟分位数、命中/回退计数、缓存统计
+    - format=prometheus: Prometheus 文本格式
+    """
+    if format == "prometheus":
+        return PlainTextResponse(
+            metrics.prometheus() + store_flight.prometheus() + admission.controller.prometheus()
+            + strategy_store.prometheus(),
+            media_type="text/plain; version=0.0.4"
+        )
+    
+    snapshot = metrics.snapshot()
     return {
-        "e2e_latency_ms": {"p50": 45, "p95": 120, "p99": 250},
-        "redis_hit_rate": 0.85,
-        "unsupported_rate": 0.05,
+        "e2e_latency_ms": snapshot["latency_ms"]["request"],
+        "redis_hit_rate": snapshot["hit_rate"],
+        "unsupported_rate": snapshot["unsupported_rate"],
+        **snapshot,
+        "solution_version": versions.active,
+        "l1_cache": l1_cache.stats(),
+        "store": strategy_store.stats(),
+        "single_flight": store_flight.stats(),
+        "admission": admission.controller.stats(),
+        "slow_requests": tracing.slow_requests.stats(),
+        "capture": traffic_capture.stats() if traffic_capture is not None else None,
+        "popularity": popularity.stats(),
+        "peers": peers.channel.stats(),
+        "scene_index": scene_key.index_stats(),
         "timestamp": datetime.now().isoformat()
     }
 
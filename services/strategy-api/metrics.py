@@ -0,0 +1,148 @@
+"""
+服务端运行时指标
+
+低开销的进程内埋点:
+    - 延迟直方图（对数分桶，纳秒精度，perf_counter_ns 计时）
+    - 按 street/位置 的 hit / approx / fallback 计数
+    - 在途请求数
+
+导出为 JSON（/metrics）和 Prometheus 文本格式（/metrics?format=prometheus）。
+"""
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# 对数分桶: 1µs 起，每个 2 倍区间 4 个子桶，覆盖到 ~16s（相对误差 < 19%）
+SUB_BUCKETS = 4
+BUCKET_BOUNDS_NS: List[int] = [
+    int(1000 * 2 ** (i / SUB_BUCKETS)) for i in range(SUB_BUCKETS * 24 + 1)
+]
+
+# 计数标签只允许已知取值，防止用户输入撑爆基数
+KNOWN_STREETS = {"preflop", "flop", "turn", "river"}
+KNOWN_POSITIONS = {"UTG", "MP", "CO", "BTN", "SB", "BB"}
+
+
+class LatencyHistogram:
+    """固定对数分桶的延迟直方图"""
+
+    __slots__ = ("counts", "count", "sum_ns", "max_ns")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_NS) + 1)  # 最后一个为溢出桶
+        self.count = 0
+        self.sum_ns = 0
+        self.max_ns = 0
+
+    def record(self, ns: int) -> None:
+        self.counts[bisect_left(BUCKET_BOUNDS_NS, ns)] += 1
+        self.count += 1
+        self.sum_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def quantile(self, q: float) -> float:
+        """分位数（纳秒），在桶内线性插值"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lower = BUCKET_BOUNDS_NS[i - 1] if i > 0 else 0
+                upper = BUCKET_BOUNDS_NS[i] if i < len(BUCKET_BOUNDS_NS) else self.max_ns
+                return lower + (upper - lower) * (rank - seen) / c
+            seen += c
+        return float(self.max_ns)
+
+    def summary_ms(self) -> Dict:
+        return {
+            "count": self.count,
+            "p50": round(self.quantile(0.50) / 1e6, 3),
+            "p95": round(self.quantile(0.95) / 1e6, 3),
+            "p99": round(self.quantile(0.99) / 1e6, 3),
+            "max": round(self.max_ns / 1e6, 3),
+            "mean": round(self.sum_ns / self.count / 1e6, 3) if self.count else 0.0,
+        }
+
+
+class Metrics:
+    """指标注册表"""
+
+    STAGES = ("request", "batch_request", "parse", "fingerprint", "retrieval", "serialization")
+    OUTCOMES = ("hit", "approx", "fallback")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.histograms: Dict[str, LatencyHistogram] = {s: LatencyHistogram() for s in self.STAGES}
+        self.outcomes: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self.in_flight = 0
+        self.started_at = time.time()
+
+    def observe(self, stage: str, ns: int) -> None:
+        self.histograms[stage].record(ns)
+
+    def count_outcome(self, street: str, hero_pos: str, outcome: str) -> None:
+        street = street if street in KNOWN_STREETS else "other"
+        hero_pos = hero_pos if hero_pos in KNOWN_POSITIONS else "other"
+        self.outcomes[(street, hero_pos, outcome)] += 1
+
+    def outcome_totals(self) -> Dict[str, int]:
+        totals = {o: 0 for o in self.OUTCOMES}
+        for (_, _, outcome), n in self.outcomes.items():
+            totals[outcome] += n
+        return totals
+
+    def snapshot(self) -> Dict:
+        totals = self.outcome_totals()
+        lookups = sum(totals.values())
+        by_scene: Dict[str, Dict[str, Dict[str, int]]] = {}
+        for (street, pos, outcome), n in sorted(self.outcomes.items()):
+            by_scene.setdefault(street, {}).setdefault(pos, {})[outcome] = n
+        return {
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "in_flight": self.in_flight,
+            "latency_ms": {s: h.summary_ms() for s, h in self.histograms.items()},
+            "outcomes": totals,
+            "outcomes_by_scene": by_scene,
+            "hit_rate": round(totals["hit"] / lookups, 4) if lookups else 0.0,
+            "unsupported_rate": round(totals["fallback"] / lookups, 4) if lookups else 0.0,
+        }
+
+    def prometheus(self) -> str:
+        """Prometheus 文本格式（直方图单位为秒）"""
+        lines = [
+            "# HELP strategy_stage_latency_seconds Per-stage latency of strategy queries",
+            "# TYPE strategy_stage_latency_seconds histogram",
+        ]
+        name = "strategy_stage_latency_seconds"
+        for stage, h in self.histograms.items():
+            cumulative = 0
+            for bound, c in zip(BUCKET_BOUNDS_NS, h.counts):
+                cumulative += c
+                le = f"{bound / 1e9:.9g}"
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {h.sum_ns / 1e9:.9f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+
+        lines += [
+            "# HELP strategy_lookups_total Strategy lookups by street, position and outcome",
+            "# TYPE strategy_lookups_total counter",
+        ]
+        for (street, pos, outcome), n in sorted(self.outcomes.items()):
+            labels = f'street="{street}",position="{pos}",outcome="{outcome}"'
+            lines.append(f"strategy_lookups_total{{{labels}}} {n}")
+
+        lines += [
+            "# HELP strategy_requests_in_flight Strategy queries currently being served",
+            "# TYPE strategy_requests_in_flight gauge",
+            f"strategy_requests_in_flight {self.in_flight}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,44 @@
+"""
+查询数据模型与指纹（无副作用，可被离线工具与进程池 worker 单独导入）
+
+main 与 evaluator 共用；导入本模块不会创建应用、连接存储或加载数据。
+"""
+from typing import List, Optional
+
+from pydantic import BaseModel, field_validator
+
+import cards
+import scene_key
+
+SOLUTION_VERSION = "v0.1.0"  # 缺省策略版本；运行时当前版本见 main.versions.active
+
+
+class HandState(BaseModel):
+    hand_id: str
+    table_id: str
+    street: str  # preflop, flop, turn, river
+    hero_pos: str  # BTN, SB, BB, UTG, MP, CO
+    effective_stack_bb: float
+    pot_bb: float
+    action_line: str
+    hero_cards: Optional[List[str]] = None
+    board: Optional[List[str]] = None
+
+    @field_validator("hero_cards")
+    @classmethod
+    def check_hero_cards(cls, value: Optional[List[str]]) -> Optional[List[str]]:
+        if value and len(cards.parse_cards(value)) != 2:
+            raise ValueError("hero_cards must contain exactly 2 cards")
+        return value
+
+    @field_validator("board")
+    @classmethod
+    def check_board(cls, value: Optional[List[str]]) -> Optional[List[str]]:
+        if value and len(cards.parse_cards(value)) not in (3, 4, 5):
+            raise ValueError("board must contain 3 to 5 cards")
+        return value
+
+
+def generate_fingerprint(hand_state: HandState) -> str:
+    """基于手牌状态生成唯一指纹（翻后含规范公共牌；已加载场景走索引，其余记忆化哈希）"""
+    return scene_key.fingerprint_for_state(hand_state)
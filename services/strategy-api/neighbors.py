@@ -0,0 +1,153 @@
+"""
+近邻回退引擎
+
+指纹未命中时，在已加载场景中查找最接近的策略，替代固定的 fold-80% fallback:
+    1. 同 street/位置/行动线，目标筹码落在两个已知档位之间 -> 线性插值
+    2. 同 street/位置/行动线，超出已知范围 -> 最近筹码档位
+    3. 同 street/位置，行动线不同 -> 最相似行动线上的最近筹码档位
+    4. 都没有 -> 返回 None，由调用方使用保守 fallback
+
+索引在加载时构建: (street, pos) -> action_line -> 按筹码排序的 (buckets, actions)。
+"""
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import scene_key
+
+# 行动线相似度低于该阈值时不借用其他行动线
+MIN_LINE_SIMILARITY = 0.5
+
+# 相似行动线查找的记忆化上限（LRU）与参与匹配的行动线最大长度（字符）:
+# 行动线来自客户端，不设上限时每个不同的未命中行动线都会常驻内存并触发一次全量比较
+LINE_MATCH_CACHE_SIZE = 4096
+MAX_MATCH_LINE_CHARS = 128
+
+CONFIDENCE_INTERPOLATED = 0.85
+CONFIDENCE_NEAREST_MAX = 0.90
+CONFIDENCE_NEAREST_MIN = 0.65
+CONFIDENCE_PER_BB = 0.005  # 每偏离 1bb 降低的置信度
+
+
+class _Line:
+    """单条行动线上按筹码排序的策略"""
+
+    __slots__ = ("buckets", "actions")
+
+    def __init__(self):
+        self.buckets: List[int] = []
+        self.actions: Dict[int, List[Dict]] = {}
+
+    def add(self, bucket: int, actions: List[Dict]) -> None:
+        if bucket not in self.actions:
+            insort(self.buckets, bucket)
+        self.actions[bucket] = actions
+
+
+def _interpolate(lo: List[Dict], hi: List[Dict], w: float) -> List[Dict]:
+    """按权重 w 在两个动作列表之间线性插值（缺失动作视为 0）"""
+    lo_map = {a["action"]: a for a in lo}
+    hi_map = {a["action"]: a for a in hi}
+    names = list(lo_map) + [name for name in hi_map if name not in lo_map]
+    actions = []
+    for name in names:
+        a, b = lo_map.get(name), hi_map.get(name)
+        freq = (1 - w) * (a["frequency"] if a else 0.0) + w * (b["frequency"] if b else 0.0)
+        ev = (1 - w) * (a["ev"] if a else 0.0) + w * (b["ev"] if b else 0.0)
+        actions.append({"action": name, "frequency": round(freq, 4), "ev": round(ev, 4)})
+    return actions
+
+
+class NeighborIndex:
+    """按 (street, pos) 分组、按筹码排序的近邻查找结构"""
+
+    def __init__(self):
+        self._spots: Dict[Tuple[str, str], Dict[str, _Line]] = {}
+        self._line_match: "OrderedDict[Tuple[str, str, str], Optional[Tuple[str, float]]]" = (
+            OrderedDict()
+        )
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, scene: scene_key.SceneTuple, actions: List[Dict]) -> None:
+        street, pos, bucket, line = scene[:4]  # 翻后场景的近邻不区分公共牌
+        lines = self._spots.setdefault((street, pos), {})
+        entry = lines.get(line)
+        if entry is None:
+            entry = lines[line] = _Line()
+            self._line_match.clear()
+        if bucket not in entry.actions:
+            self.size += 1
+        entry.add(bucket, actions)
+
+    def track(self, records: Iterable[Dict]) -> Iterator[Dict]:
+        """透传加载记录，同时建立索引（只索引带原始 scene 串的记录）"""
+        for record in records:
+            raw = record.get("scene") or record.get("fingerprint", "")
+            if "|" in raw:
+                self.add(scene_key.parse_scene(raw), record["actions"])
+            yield record
+
+    def _closest_line(self, street: str, pos: str, line: str) -> Optional[Tuple[str, float]]:
+        """同一 spot 下最相似的行动线（按 token 序列相似度，只比较前 MAX_MATCH_LINE_CHARS 个字符，
+        结果按 LRU 记忆化）"""
+        line = line[:MAX_MATCH_LINE_CHARS]
+        memo_key = (street, pos, line)
+        memo = self._line_match
+        if memo_key in memo:
+            memo.move_to_end(memo_key)
+            return memo[memo_key]
+        tokens = line.split("_")
+        best = None
+        for candidate in self._spots.get((street, pos), {}):
+            ratio = SequenceMatcher(None, tokens, candidate.split("_")).ratio()
+            if ratio >= MIN_LINE_SIMILARITY and (best is None or ratio > best[1]):
+                best = (candidate, ratio)
+        memo[memo_key] = best
+        if len(memo) > LINE_MATCH_CACHE_SIZE:
+            memo.popitem(last=False)
+        return best
+
+    def lookup(self, scene: scene_key.SceneTuple) -> Optional[Tuple[Dict, float]]:
+        """
+        查找近邻策略
+
+        返回 ({"actions": [...], "source": ...}, confidence)，无可用近邻时返回 None
+        """
+        street, pos, bucket, line = scene[:4]
+        lines = self._spots.get((street, pos))
+        if not lines:
+            return None
+
+        entry = lines.get(line)
+        similarity = 1.0
+        if entry is None:
+            match = self._closest_line(street, pos, line)
+            if match is None:
+                return None
+            entry, similarity = lines[match[0]], match[1]
+
+        buckets = entry.buckets
+        i = bisect_left(buckets, bucket)
+        if similarity == 1.0 and 0 < i < len(buckets) and buckets[i] != bucket:
+            lo, hi = buckets[i - 1], buckets[i]
+            w = (bucket - lo) / (hi - lo)
+            actions = _interpolate(entry.actions[lo], entry.actions[hi], w)
+            return {"actions": actions, "source": "neighbor_interpolated"}, CONFIDENCE_INTERPOLATED
+
+        # 最近筹码档位
+        candidates = [b for b in (buckets[i - 1] if i > 0 else None,
+                                  buckets[i] if i < len(buckets) else None) if b is not None]
+        nearest = min(candidates, key=lambda b: abs(b - bucket))
+        confidence = max(
+            CONFIDENCE_NEAREST_MIN,
+            CONFIDENCE_NEAREST_MAX - CONFIDENCE_PER_BB * abs(nearest - bucket),
+        )
+        source = "neighbor_stack"
+        if similarity < 1.0:
+            confidence = CONFIDENCE_NEAREST_MIN + (confidence - CONFIDENCE_NEAREST_MIN) * similarity
+            source = "neighbor_line"
+        return {"actions": entry.actions[nearest], "source": source}, round(confidence, 3)
@@ -0,0 +1,219 @@
+"""
+紧凑二进制策略文件（mmap 只读存储）
+
+把 JSON 策略记录打包成按 key 排序的定长记录文件，API 启动时 mmap 后
+直接二分查找，不占用 Redis 内存、不受 Redis 内存淘汰影响。
+
+文件布局（小端）:
+    header   : magic "GTOS" | format u16 | max_actions u8 | pad u8 | record_count u32
+    strings  : version | 动作名字典 | 来源字典（u16 个数 + 每项 u8 长度 + utf-8）
+    records  : record_count 条定长记录，按 key_hash 升序
+               key_hash u64 | n_actions u8 | source_id u8
+               | max_actions × (action_id u8, freq u16, ev i16)
+
+key_hash 为 16 位场景指纹（scene_key）的 64 位 blake2b 摘要；频率量化为 1/65535，EV 量化为 0.01bb。
+
+用法:
+    python packed_store.py build --input solutions.jsonl --version v0.1.0 --output strategies.gtos
+    python packed_store.py build --sample --version v0.1.0 --output strategies.gtos
+"""
+import argparse
+import hashlib
+import mmap
+import struct
+from typing import Dict, Iterable, List, Optional
+
+from loader import record_fingerprint
+from storage import StrategyStore
+
+MAGIC = b"GTOS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHBBI")
+RECORD_HEAD = struct.Struct("<QBB")
+ACTION_SLOT = struct.Struct("<BHh")
+KEY = struct.Struct("<Q")
+
+FREQ_SCALE = 65535
+EV_SCALE = 100
+EV_MIN, EV_MAX = -32768, 32767
+
+
+def key_hash(fingerprint: str) -> int:
+    """fingerprint -> 64 位整数 key"""
+    return KEY.unpack(hashlib.blake2b(fingerprint.encode(), digest_size=8).digest())[0]
+
+
+def _pack_strings(items: List[str]) -> bytes:
+    out = [struct.pack("<H", len(items))]
+    for item in items:
+        raw = item.encode("utf-8")
+        out.append(struct.pack("<B", len(raw)) + raw)
+    return b"".join(out)
+
+
+def _unpack_strings(buf, offset: int):
+    (count,) = struct.unpack_from("<H", buf, offset)
+    offset += 2
+    items = []
+    for _ in range(count):
+        (length,) = struct.unpack_from("<B", buf, offset)
+        offset += 1
+        items.append(bytes(buf[offset:offset + length]).decode("utf-8"))
+        offset += length
+    return items, offset
+
+
+def build_packed(records: Iterable[Dict], version: str, output: str) -> Dict:
+    """把 JSON 策略记录转换为紧凑二进制文件，返回统计信息"""
+    action_ids: Dict[str, int] = {}
+    source_ids: Dict[str, int] = {}
+    rows = []
+    max_actions = 0
+
+    for record in records:
+        h = key_hash(record_fingerprint(record))
+        source = record.get("source", "preflop_db")
+        source_id = source_ids.setdefault(source, len(source_ids))
+        slots = []
+        for a in record["actions"]:
+            action_id = action_ids.setdefault(a["action"], len(action_ids))
+            freq = round(a["frequency"] * FREQ_SCALE)
+            ev = min(max(round(a["ev"] * EV_SCALE), EV_MIN), EV_MAX)
+            slots.append((action_id, freq, ev))
+        max_actions = max(max_actions, len(slots))
+        rows.append((h, source_id, slots))
+
+    if len(action_ids) > 256 or len(source_ids) > 256 or max_actions > 255:
+        raise ValueError("Too many distinct actions/sources for packed format")
+
+    rows.sort(key=lambda r: r[0])
+    for prev, cur in zip(rows, rows[1:]):
+        if prev[0] == cur[0]:
+            raise ValueError(f"Duplicate or colliding fingerprint hash {cur[0]:#x}")
+
+    empty_slot = ACTION_SLOT.pack(0, 0, 0)
+    with open(output, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, max_actions, 0, len(rows)))
+        f.write(_pack_strings([version]))
+        f.write(_pack_strings(list(action_ids)))
+        f.write(_pack_strings(list(source_ids)))
+        for h, source_id, slots in rows:
+            f.write(RECORD_HEAD.pack(h, len(slots), source_id))
+            for slot in slots:
+                f.write(ACTION_SLOT.pack(*slot))
+            f.write(empty_slot * (max_actions - len(slots)))
+        size = f.tell()
+
+    return {
+        "version": version,
+        "records": len(rows),
+        "actions": len(action_ids),
+        "record_size": RECORD_HEAD.size + ACTION_SLOT.size * max_actions,
+        "file_bytes": size,
+    }
+
+
+class PackedStore(StrategyStore):
+    """mmap 紧凑策略文件，二分查找，只读"""
+
+    backend = "packed"
+    hit_source = "packed_hit"
+    read_only = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, fmt, self.max_actions, _, self.count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a packed strategy file (format {FORMAT_VERSION})")
+        (self.version,), offset = _unpack_strings(self._mm, HEADER.size)
+        self.action_names, offset = _unpack_strings(self._mm, offset)
+        self.source_names, offset = _unpack_strings(self._mm, offset)
+
+        self._data_offset = offset
+        self._record_size = RECORD_HEAD.size + ACTION_SLOT.size * self.max_actions
+        self._prefix = f"strat:{self.version}:"
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _find(self, h: int) -> int:
+        """二分查找 key_hash，返回记录偏移；不存在返回 -1"""
+        mm, base, size = self._mm, self._data_offset, self._record_size
+        lo, hi = 0, self.count - 1
+        while lo <= hi:
+            mid = (lo + hi) >> 1
+            cur = KEY.unpack_from(mm, base + mid * size)[0]
+            if cur < h:
+                lo = mid + 1
+            elif cur > h:
+                hi = mid - 1
+            else:
+                return base + mid * size
+        return -1
+
+    def _decode(self, offset: int) -> Dict:
+        _, n_actions, source_id = RECORD_HEAD.unpack_from(self._mm, offset)
+        offset += RECORD_HEAD.size
+        actions = []
+        for i in range(n_actions):
+            action_id, freq, ev = ACTION_SLOT.unpack_from(self._mm, offset + i * ACTION_SLOT.size)
+            actions.append({
+                "action": self.action_names[action_id],
+                "frequency": round(freq / FREQ_SCALE, 4),
+                "ev": ev / EV_SCALE,
+            })
+        return {"actions": actions, "source": self.source_names[source_id]}
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        if not key.startswith(self._prefix):
+            return None  # 其他版本的 key 不在本文件中
+        offset = self._find(key_hash(key[len(self._prefix):]))
+        return self._decode(offset) if offset >= 0 else None
+
+    async def get(self, key: str) -> Optional[Dict]:
+        return self.lookup(key)
+
+    async def mget(self, keys: List[str]) -> List[Optional[Dict]]:
+        return [self.lookup(key) for key in keys]
+
+    async def set(self, key: str, value: Dict, ttl: Optional[int] = None) -> None:
+        raise NotImplementedError("PackedStore is read-only; rebuild the file instead")
+
+    async def set_many(self, items: Dict[str, Dict], ttl: Optional[int] = None) -> None:
+        raise NotImplementedError("PackedStore is read-only; rebuild the file instead")
+
+    async def get_active_version(self) -> Optional[str]:
+        return self.version
+
+    async def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+
+
+def main():
+    from loader import iter_records, sample_records
+
+    parser = argparse.ArgumentParser(description="紧凑二进制策略文件工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="JSON Lines -> 二进制策略文件")
+    build.add_argument("--input", help="JSON Lines 策略文件")
+    build.add_argument("--sample", action="store_true", help="使用内置示例数据")
+    build.add_argument("--version", required=True)
+    build.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    if not args.input and not args.sample:
+        parser.error("需要 --input 或 --sample")
+    records = sample_records() if args.sample else iter_records(args.input)
+    stats = build_packed(records, args.version, args.output)
+    print(
+        f"✅ Packed {stats['records']} records ({stats['record_size']} B/record, "
+        f"{stats['actions']} actions) -> {args.output} ({stats['file_bytes']} bytes)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+多 worker 之间的管理事件广播（serve.py）
+
+版本注册表与当前版本指针是进程内状态，POST /admin/versions/... 只落在接收请求的 worker。
+serve.py 为每个 worker 建一对 socketpair:
+
+    worker 完成管理操作后 publish 一条事件（JSON 行）给父进程，
+    父进程的 Relay 转发给其余 worker，各 worker 在自己的事件循环中按顺序重放:
+
+    loaded      {"version", "file"}          共享存储接管已写入的数据，内存存储重新读取同一文件
+    activated   {"version"}                  切换当前版本（本地未加载时先接管）
+    deprecated  {"version", "sunset_date"}
+
+Relay 保留全部事件，意外退出后重新拉起的 worker 先按顺序重放历史，与其他 worker 一致。
+单进程运行（python main.py / uvicorn）时没有通道，publish 为空操作。
+"""
+import asyncio
+import json
+import selectors
+import socket
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional
+
+EVENT_LOADED = "loaded"
+EVENT_ACTIVATED = "activated"
+EVENT_DEPRECATED = "deprecated"
+
+
+class PeerChannel:
+    """worker 端: 向父进程发布事件，并接收其他 worker 的事件"""
+
+    def __init__(self):
+        self.sock: Optional[socket.socket] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.applied = 0
+        self.failed = 0
+
+    def attach(self, sock: socket.socket) -> None:
+        """fork 后在 worker 中调用"""
+        self.sock = sock
+
+    async def start(self, handler: Callable[[Dict], Awaitable[None]]) -> None:
+        """在 worker 的事件循环中开始接收事件（逐条 await handler，保持顺序）"""
+        if self.sock is None or self._task is not None:
+            return
+        reader, self._writer = await asyncio.open_connection(sock=self.sock)
+        self._task = asyncio.get_running_loop().create_task(self._receive(reader, handler))
+
+    async def _receive(self, reader: asyncio.StreamReader, handler) -> None:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return  # 父进程退出
+            try:
+                await handler(json.loads(line))
+                self.applied += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Applying peer event {line.strip()!r} failed: {e!r}")
+
+    def publish(self, op: str, version: str, **fields) -> None:
+        if self._writer is None:
+            return
+        event = {"op": op, "version": version, **fields}
+        self._writer.write(json.dumps(event).encode() + b"\n")
+        self.published += 1
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self._writer is not None,
+            "published": self.published,
+            "applied": self.applied,
+            "failed": self.failed,
+        }
+
+
+class Relay:
+    """父进程端: 把任一 worker 的事件转发给其余 worker（后台线程）"""
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._workers: Dict[int, socket.socket] = {}  # pid -> 父进程端 socket
+        self._buffers: Dict[int, bytes] = {}
+        self.history: List[bytes] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, pid: int, sock: socket.socket) -> None:
+        """登记新 worker，并先把历史事件发给它（重新拉起的 worker 追上其他 worker）"""
+        with self._lock:
+            for line in self.history:
+                sock.sendall(line)
+            self._workers[pid] = sock
+            self._buffers[pid] = b""
+            self._selector.register(sock, selectors.EVENT_READ, pid)
+
+    def remove(self, pid: int) -> None:
+        with self._lock:
+            sock = self._workers.pop(pid, None)
+            self._buffers.pop(pid, None)
+            if sock is not None:
+                try:
+                    self._selector.unregister(sock)
+                except KeyError:
+                    pass  # 读到 EOF 时已注销
+                sock.close()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="peer-relay", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            for key, _ in self._selector.select(timeout=0.5):
+                self._read(key.data, key.fileobj)
+
+    def _read(self, pid: int, sock: socket.socket) -> None:
+        try:
+            data = sock.recv(65536)
+        except OSError:
+            data = b""
+        with self._lock:
+            if pid not in self._workers:
+                return
+            if not data:  # worker 退出，由 serve.py 回收后调用 remove
+                self._selector.unregister(sock)
+                return
+            *lines, self._buffers[pid] = (self._buffers[pid] + data).split(b"\n")
+            for line in lines:
+                self._forward(pid, line + b"\n")
+
+    def _forward(self, origin: int, line: bytes) -> None:
+        self.history.append(line)
+        for pid, sock in self._workers.items():
+            if pid != origin:
+                try:
+                    sock.sendall(line)
+                except OSError:
+                    pass  # 已退出，等待回收
+
+
+channel = PeerChannel()
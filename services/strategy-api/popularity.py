@@ -0,0 +1,151 @@
+"""
+场景热度跟踪（heavy hitters）
+
+查询路径每次查询对场景指纹做一次计数，内存上限固定（Space-Saving 近似 top-K，
+批量淘汰: 候选数达到 2 × capacity 时只保留计数最高的 capacity 个）:
+
+    - requests: 全部查询，用于容量规划、L1 大小评估与预热
+    - misses: 未精确命中（近邻 / 保守策略）的查询，按热度排出下一批待求解的场景
+
+计数为上界估计，error 为误差上界（真实次数 >= count - error）。
+
+关闭时热点集合写入 HOT_SET_FILE，启动时读回（计数按 HOT_FILE_DECAY 衰减后作为先验），
+在数据加载完成和切换版本时按热度预热 L1。多 worker 时各自写入同一文件，以最后退出的为准
+（各 worker 共享监听 socket，流量分布相近）。
+
+    HOT_TRACK_SIZE   每个跟踪器保留的场景数（默认 1024）
+    HOT_SET_FILE     热点集合文件（默认 hot_scenes.json，设为空关闭持久化）
+"""
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import scene_key
+
+HOT_TRACK_SIZE = int(os.getenv("HOT_TRACK_SIZE", "1024"))
+HOT_SET_FILE = os.getenv("HOT_SET_FILE", "hot_scenes.json")
+HOT_FILE_DECAY = 0.5
+FILE_FORMAT = 1
+
+
+class SpaceSaving:
+    """固定内存的近似 top-K 计数"""
+
+    def __init__(self, capacity: int = HOT_TRACK_SIZE):
+        self.capacity = capacity
+        self._entries: Dict[str, list] = {}  # key -> [count, error, label]
+        self.floor = 0  # 已淘汰 key 的最大计数（新 key 的误差上界）
+        self.total = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, key: str, label=None, n: int = 1) -> None:
+        self.total += n
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[0] += n
+            return
+        self._entries[key] = [self.floor + n, self.floor, label]
+        if len(self._entries) >= 2 * self.capacity:
+            self._compact()
+
+    def _compact(self) -> None:
+        ranked = sorted(self._entries.items(), key=lambda item: item[1][0], reverse=True)
+        self.floor = max(self.floor, ranked[self.capacity][1][0])
+        self._entries = dict(ranked[:self.capacity])
+
+    def top(self, limit: int) -> List[Dict]:
+        """计数降序（相同计数按 key），label 为场景元组时转为字符串"""
+        ranked = sorted(self._entries.items(), key=lambda item: (-item[1][0], item[0]))
+        return [
+            {
+                "fingerprint": key,
+                "scene": scene_key.scene_str(label) if isinstance(label, tuple) else label,
+                "count": count,
+                "error": error,
+                "share": round(count / self.total, 4) if self.total else 0.0,
+            }
+            for key, (count, error, label) in ranked[:limit]
+        ]
+
+
+class PopularityTracker:
+    """查询热度与未命中热度"""
+
+    def __init__(self, capacity: int = HOT_TRACK_SIZE):
+        self.requests = SpaceSaving(capacity)
+        self.misses = SpaceSaving(capacity)
+        self.loaded = 0  # 从文件读回的场景数
+
+    def record(self, fingerprint: str, scene, cache_status: str) -> None:
+        self.requests.add(fingerprint, scene)
+        if cache_status != "hit":
+            self.misses.add(fingerprint, scene)
+
+    def hot_fingerprints(self, limit: int) -> List[str]:
+        return [item["fingerprint"] for item in self.requests.top(limit)]
+
+    def snapshot(self, limit: int) -> Dict:
+        return {
+            **self.stats(),
+            "requests": self.requests.top(limit),
+            "misses": self.misses.top(limit),
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "capacity": self.requests.capacity,
+            "total_requests": self.requests.total,
+            "total_misses": self.misses.total,
+            "tracked": {"requests": len(self.requests), "misses": len(self.misses)},
+            "loaded": self.loaded,
+        }
+
+    def save(self, path: str) -> int:
+        """写入热点集合（先写临时文件再替换），返回写入的场景数"""
+        data = {
+            "format": FILE_FORMAT,
+            "saved_at": time.time(),
+            "requests": self.requests.top(self.requests.capacity),
+            "misses": self.misses.top(self.misses.capacity),
+        }
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        return len(data["requests"])
+
+    def load(self, path: str, decay: float = HOT_FILE_DECAY) -> int:
+        """读回热点集合作为先验计数；文件不存在或格式不符时忽略，返回读回的场景数"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if data.get("format") != FILE_FORMAT:
+            return 0
+        for name, sketch in (("requests", self.requests), ("misses", self.misses)):
+            for item in data.get(name, []):
+                n = int(item["count"] * decay)
+                if n > 0:
+                    sketch.add(item["fingerprint"], item.get("scene"), n)
+        self.loaded = len(data.get("requests", []))
+        return self.loaded
+
+
+popularity = PopularityTracker()
+
+
+def load_hot_set(path: Optional[str] = HOT_SET_FILE) -> int:
+    return popularity.load(path) if path else 0
+
+
+def save_hot_set(path: Optional[str] = HOT_SET_FILE) -> int:
+    if not path or not popularity.requests.total:
+        return 0
+    try:
+        return popularity.save(path)
+    except OSError:
+        return 0
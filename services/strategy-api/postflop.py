@@ -0,0 +1,279 @@
+"""
+翻后（flop/turn/river）列式策略表
+
+solver 输出按列存储为 NumPy 数组（每个场景 × 1326 个起手组合 × 动作）:
+    freq.npy  uint16  (scenes, 1326, actions)  频率 × 65535
+    ev.npy    int16   (scenes, 1326, actions)  EV × 100（bb）
+    meta.json 版本、动作表、场景串列表（行号即数组下标，如 "flop|BTN|100|CHECK|AhKd7c"）
+
+行 key 即带规范公共牌的场景元组（scene_key.scene_of），同构公共牌共用一行；
+查询时手牌经 cards 查表映射到规范组合下标，直接数组索引得到该手牌的动作分布。
+数组以 mmap 方式打开，数十万翻牌场景也无需整体读入内存，且没有逐组合的 Python 对象。
+
+用法:
+    python postflop.py build --input flop_solutions.jsonl --version v0.1.0 --output postflop/
+    python postflop.py build --sample 50 --output postflop/
+
+记录格式（每行一个场景）:
+    {"scene": "flop|BTN|100|CHECK", "board": "AhKd7c", "actions": ["check", "bet_33"],
+     "strategy": {"AsKs": {"freq": [0.2, 0.8], "ev": [3.1, 3.4]}, ...}}
+未出现在 strategy 中的组合视为不在范围内（频率全 0）。
+"""
+import argparse
+import json
+import os
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+import cards
+import scene_key
+
+FREQ_SCALE = 65535
+EV_SCALE = 100
+META_FILE = "meta.json"
+FREQ_FILE = "freq.npy"
+EV_FILE = "ev.npy"
+
+POSTFLOP_TABLES = os.getenv("POSTFLOP_TABLES", "postflop")
+
+
+class PostflopTables:
+    """只读的列式翻后策略表（mmap）"""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        self.path = path
+        self.version: str = meta["version"]
+        self.actions: List[str] = meta["actions"]
+        self.rows: Dict[scene_key.SceneTuple, int] = {
+            scene_key.parse_scene(raw): i for i, raw in enumerate(meta["scenes"])
+        }
+        self.freq = np.load(os.path.join(path, FREQ_FILE), mmap_mode="r")
+        self.ev = np.load(os.path.join(path, EV_FILE), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def lookup(self, scene: scene_key.SceneTuple, board, hero_cards) -> Optional[Dict]:
+        """
+        手牌在该场景下的动作分布，格式与存储中的策略一致:
+        {"actions": [{"action", "frequency", "ev"}, ...], "source": "postflop_table"}
+
+        scene 为带公共牌的场景元组；场景未收录或手牌不在范围内时返回 None，
+        牌面无效时抛出 ValueError
+        """
+        row = self.rows.get(scene)
+        if row is None:
+            return None
+        board = cards.parse_cards(board)
+        hole = cards.parse_cards(hero_cards)
+        if len(hole) != 2 or set(hole) & set(board):
+            raise ValueError("Invalid hero_cards/board combination")
+        _, combo = cards.canonical_combo(board, hole)
+        freq = self.freq[row, combo]
+        if not freq.any():
+            return None
+        ev = self.ev[row, combo]
+        return {
+            "actions": [
+                {"action": name, "frequency": round(f / FREQ_SCALE, 4),
+                 "ev": round(e / EV_SCALE, 2)}
+                for name, f, e in zip(self.actions, freq.tolist(), ev.tolist())
+                if f
+            ],
+            "source": "postflop_table",
+        }
+
+    def lookup_range(self, rows: np.ndarray, combos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        向量化查询: rows 与 combos 为等长（或可广播）的下标数组
+
+        返回 (freq, ev)，形状 (..., actions)，已换算为浮点频率与 bb
+        """
+        freq = self.freq[rows, combos].astype(np.float32) / FREQ_SCALE
+        ev = self.ev[rows, combos].astype(np.float32) / EV_SCALE
+        return freq, ev
+
+    def range_of(self, scene: scene_key.SceneTuple) -> Optional[Dict]:
+        """整个范围在该场景下的动作频率（按规范组合下标），用于范围分析"""
+        row = self.rows.get(scene)
+        if row is None:
+            return None
+        freq, ev = self.lookup_range(np.full(cards.NUM_COMBOS, row), np.arange(cards.NUM_COMBOS))
+        in_range = freq.any(axis=1)
+        return {
+            "actions": self.actions,
+            "combos": np.flatnonzero(in_range),
+            "freq": freq[in_range],
+            "ev": ev[in_range],
+        }
+
+
+def load_tables(path: str = POSTFLOP_TABLES) -> Dict[str, PostflopTables]:
+    """打开目录下的策略表（目录本身或每个版本一个子目录），返回 version -> 表"""
+    if not os.path.isdir(path):
+        return {}
+    dirs = [path] if os.path.exists(os.path.join(path, META_FILE)) else [
+        os.path.join(path, d) for d in sorted(os.listdir(path))
+        if os.path.exists(os.path.join(path, d, META_FILE))
+    ]
+    tables = (PostflopTables(d) for d in dirs)
+    return {t.version: t for t in tables}
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+class Replayable:
+    """每次迭代重新调用 factory 得到新的记录迭代器（build_tables 需读两遍）"""
+
+    def __init__(self, factory: Callable[[], Iterable[Dict]]):
+        self.factory = factory
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.factory())
+
+
+def _scene_of_record(record: Dict) -> Tuple[str, List[int]]:
+    """记录 -> (规范公共牌的场景串, 原始公共牌)"""
+    board = cards.parse_cards(record["board"])
+    canonical, _ = cards.canonical_board(board)
+    scene = scene_key.parse_scene(record["scene"])[:4] + (cards.pack_board(canonical),)
+    return scene_key.scene_str(scene), board
+
+
+def build_tables(records: Iterable[Dict], version: str, output: str) -> Dict:
+    """
+    solver 记录 -> 列式策略表目录
+
+    两遍读取 records（列表或 Replayable，不能是一次性迭代器）: 第一遍收集场景行与动作列，
+    第二遍把每条记录直接写入 open_memmap 输出，内存中只保留当前记录，不随场景数增长。
+    公共牌按同构规范化，同构场景只保留第一条；返回构建统计
+    """
+    if iter(records) is records:
+        raise TypeError("build_tables reads records twice; pass a list or a Replayable")
+    start = time.perf_counter()
+    vocab: Dict[str, int] = {}
+    rows: Dict[str, int] = {}
+    duplicates = 0
+
+    for record in records:
+        key, _ = _scene_of_record(record)
+        if key in rows:
+            duplicates += 1
+            continue
+        rows[key] = len(rows)
+        for a in record["actions"]:
+            vocab.setdefault(a, len(vocab))
+
+    os.makedirs(output, exist_ok=True)
+    shape = (len(rows), cards.NUM_COMBOS, len(vocab))
+    freq_out = np.lib.format.open_memmap(
+        os.path.join(output, FREQ_FILE), mode="w+", dtype=np.uint16, shape=shape
+    )
+    ev_out = np.lib.format.open_memmap(
+        os.path.join(output, EV_FILE), mode="w+", dtype=np.int16, shape=shape
+    )
+    written = 0
+    for record in records:
+        key, board = _scene_of_record(record)
+        row = rows[key]
+        if row != written:
+            continue  # 同构重复（首条已写入）
+        written += 1
+        if not record["strategy"]:
+            continue
+        columns = [vocab[a] for a in record["actions"]]
+        combos = []
+        freq = []
+        ev = []
+        for hand, values in record["strategy"].items():
+            combos.append(cards.canonical_combo(board, cards.parse_cards(hand))[1])
+            freq.append(values["freq"])
+            ev.append(values["ev"])
+        index = np.ix_(combos, columns)
+        freq_out[row][index] = np.round(np.asarray(freq) * FREQ_SCALE)
+        ev_out[row][index] = np.round(np.asarray(ev) * EV_SCALE)
+    freq_out.flush()
+    ev_out.flush()
+    del freq_out, ev_out
+
+    actions = sorted(vocab, key=vocab.get)
+    with open(os.path.join(output, META_FILE), "w") as f:
+        json.dump({"version": version, "actions": actions, "scenes": list(rows)}, f)
+
+    return {
+        "version": version,
+        "scenes": len(rows),
+        "duplicates": duplicates,
+        "actions": actions,
+        "bytes": shape[0] * shape[1] * shape[2] * 4,
+        "elapsed_s": round(time.perf_counter() - start, 3),
+    }
+
+
+def sample_records(boards: int = 20, seed: int = 7) -> Iterator[Dict]:
+    """合成的翻牌 c-bet 场景（确定性随机），用于演示与测试"""
+    rng = np.random.default_rng(seed)
+    actions = ["check", "bet_33", "bet_75"]
+    produced = 0
+    seen = set()
+    while produced < boards:
+        board = [int(c) for c in rng.choice(cards.NUM_CARDS, 3, replace=False)]
+        canonical, _ = cards.canonical_board(board)
+        if canonical in seen:
+            continue
+        seen.add(canonical)
+        strategy = {}
+        for combo in range(cards.NUM_COMBOS):
+            hi, lo = cards.combo_cards(combo)
+            if hi in board or lo in board:
+                continue
+            freq = rng.dirichlet(np.ones(len(actions)))
+            strategy[cards.card_str(hi) + cards.card_str(lo)] = {
+                "freq": [round(float(f), 4) for f in freq],
+                "ev": [round(float(e), 2) for e in rng.normal(2.0, 1.5, len(actions))],
+            }
+        yield {
+            "scene": "flop|BTN|100|RAISE_CALL",
+            "board": cards.board_key(board),
+            "actions": actions,
+            "strategy": strategy,
+        }
+        produced += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="翻后列式策略表")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="从 solver 导出的 JSON Lines 构建策略表")
+    source = build.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="JSON Lines 记录文件")
+    source.add_argument("--sample", type=int, metavar="BOARDS", help="生成合成翻牌场景")
+    build.add_argument("--version", default="v0.1.0")
+    build.add_argument("--output", default=POSTFLOP_TABLES)
+    args = parser.parse_args()
+
+    if args.input:
+        records = Replayable(lambda: iter_records(args.input))
+    else:
+        records = Replayable(lambda: sample_records(args.sample))
+    result = build_tables(records, args.version, args.output)
+    print(
+        f"✅ Built {result['scenes']} postflop scenes "
+        f"({result['duplicates']} isomorphic duplicates) "
+        f"x {len(result['actions'])} actions -> {args.output} "
+        f"({result['bytes'] / 1e6:.1f} MB) in {result['elapsed_s']}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
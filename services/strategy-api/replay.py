@@ -0,0 +1,273 @@
+"""
+采集流量重放（延迟回归测试）
+
+读取 capture.py 写出的流量日志，按原始到达节奏（--speed 倍速）开环重放到运行中的
+strategy-api，对每个对比组（策略版本或不同构建的服务地址）依次重放同一份请求序列，比较:
+
+    - 整体与按场景的延迟分位数（从计划发送时刻起算，无 coordinated omission）
+    - 每个请求的结果（hit / approx / miss / HTTP 错误）在两组之间的变化
+
+用法:
+    python replay.py --capture captures/ --versions v0.1.0 v0.2.0 --speed 2
+    python replay.py --capture captures/ --target old=http://localhost:8000 \\
+        --target new=http://localhost:8001 --limit 50000 --output replay.json
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter, defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import scene_key
+from capture import KIND_BATCH, Frame, read_capture
+from metrics import LatencyHistogram
+
+API_BASE = "http://localhost:8000"
+PATHS = {KIND_BATCH: "/v1/strategy/query_batch"}
+DEFAULT_PATH = "/v1/strategy/query"
+MIN_SCENE_SAMPLES = 5  # 按场景比较延迟时要求的最少样本数
+TOP_SCENES = 20
+
+# send(kind, body) -> (status, 响应体)
+Sender = Callable[[int, bytes], Awaitable[Tuple[int, bytes]]]
+
+
+def scene_label(kind: int, body: bytes) -> str:
+    """请求体 -> 场景标签（与服务端指纹使用同一场景元组）"""
+    if kind == KIND_BATCH:
+        return "batch"
+    try:
+        state = json.loads(body)
+        return scene_key.scene_str(scene_key.scene_tuple(
+            state["street"], state["hero_pos"], state["effective_stack_bb"],
+            state["action_line"], state.get("board"),
+        ))
+    except (ValueError, KeyError, TypeError):
+        return "invalid"
+
+
+def outcome_of(kind: int, status: int, body: bytes) -> str:
+    if status != 200:
+        return f"http_{status}"
+    try:
+        data = json.loads(body)["data"]
+    except (ValueError, KeyError):
+        return "bad_response"
+    if kind == KIND_BATCH:
+        return "batch:" + ",".join(item["cache_status"] for item in data)
+    return data["cache_status"]
+
+
+async def replay(frames: List[Frame], send: Sender, speed: float = 1.0) -> Dict:
+    """
+    按到达间隔 / speed 开环发送 frames，返回该组的逐请求结果与延迟
+
+    返回 {"outcomes": [...与 frames 对齐], "latency": 直方图, "by_scene": {场景: 直方图},
+          "max_schedule_lag_ms", "elapsed_s"}
+    """
+    outcomes: List[Optional[str]] = [None] * len(frames)
+    labels = [scene_label(kind, body) for _, kind, body in frames]
+    latency = LatencyHistogram()
+    by_scene: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+    max_lag_ms = 0.0
+
+    async def fire(i: int, intended_ns: int, kind: int, body: bytes):
+        try:
+            status, response = await send(kind, body)
+        except asyncio.TimeoutError:
+            outcomes[i] = "timeout"
+            return
+        except OSError:  # http_sender 把客户端错误转为 ConnectionError
+            outcomes[i] = "error"
+            return
+        elapsed = time.perf_counter_ns() - intended_ns
+        latency.record(elapsed)
+        by_scene[labels[i]].record(elapsed)
+        outcomes[i] = outcome_of(kind, status, response)
+
+    tasks = []
+    first_ns = frames[0][0] if frames else 0
+    start_ns = time.perf_counter_ns()
+    for i, (arrival_ns, kind, body) in enumerate(frames):
+        intended_ns = start_ns + int((arrival_ns - first_ns) / speed)
+        delay = (intended_ns - time.perf_counter_ns()) / 1e9
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            max_lag_ms = max(max_lag_ms, -delay * 1000)
+        tasks.append(asyncio.create_task(fire(i, intended_ns, kind, body)))
+    await asyncio.gather(*tasks)
+
+    return {
+        "outcomes": outcomes,
+        "labels": labels,
+        "latency": latency,
+        "by_scene": by_scene,
+        "max_schedule_lag_ms": round(max_lag_ms, 3),
+        "elapsed_s": round((time.perf_counter_ns() - start_ns) / 1e9, 3),
+    }
+
+
+def summarize(name: str, run: Dict) -> Dict:
+    return {
+        "name": name,
+        "requests": len(run["outcomes"]),
+        "outcomes": dict(Counter(run["outcomes"])),
+        "latency_ms": run["latency"].summary_ms(),
+        "max_schedule_lag_ms": run["max_schedule_lag_ms"],
+        "elapsed_s": run["elapsed_s"],
+    }
+
+
+def compare(base_name: str, base: Dict, other_name: str, other: Dict) -> Dict:
+    """两组重放结果对比: 结果变化的请求与按场景的 p95 变化（样本足够的场景）"""
+    transitions: Counter = Counter()
+    changed_scenes: Counter = Counter()
+    for label, a, b in zip(base["labels"], base["outcomes"], other["outcomes"]):
+        if a != b:
+            transitions[f"{a} -> {b}"] += 1
+            changed_scenes[label] += 1
+
+    scenes = []
+    for label, hist in base["by_scene"].items():
+        other_hist = other["by_scene"].get(label)
+        if other_hist is None or min(hist.count, other_hist.count) < MIN_SCENE_SAMPLES:
+            continue
+        a, b = hist.summary_ms(), other_hist.summary_ms()
+        scenes.append({
+            "scene": label,
+            "samples": hist.count,
+            "p50_ms": [a["p50"], b["p50"]],
+            "p95_ms": [a["p95"], b["p95"]],
+            "p95_delta_ms": round(b["p95"] - a["p95"], 3),
+        })
+    scenes.sort(key=lambda s: s["p95_delta_ms"], reverse=True)
+
+    a, b = base["latency"].summary_ms(), other["latency"].summary_ms()
+    return {
+        "base": base_name,
+        "other": other_name,
+        "changed_outcomes": sum(transitions.values()),
+        "transitions": dict(transitions.most_common()),
+        "changed_scenes": [
+            {"scene": scene, "requests": n} for scene, n in changed_scenes.most_common(TOP_SCENES)
+        ],
+        "p95_delta_ms": round(b["p95"] - a["p95"], 3),
+        "p99_delta_ms": round(b["p99"] - a["p99"], 3),
+        "scene_regressions": scenes[:TOP_SCENES],
+    }
+
+
+def http_sender(session, base_url: str, version: Optional[str], timeout: float) -> Sender:
+    """aiohttp 发送函数（aiohttp 见 requirements-dev.txt，只在实际重放时导入）"""
+    import aiohttp
+
+    headers = {"content-type": "application/json"}
+    if version:
+        headers["x-solution-version"] = version
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async def send(kind: int, body: bytes) -> Tuple[int, bytes]:
+        url = base_url.rstrip("/") + PATHS.get(kind, DEFAULT_PATH)
+        try:
+            async with session.post(url, data=body, headers=headers, timeout=client_timeout) as r:
+                return r.status, await r.read()
+        except aiohttp.ClientError as e:
+            raise ConnectionError(str(e)) from e
+
+    return send
+
+
+def parse_target(text: str) -> Tuple[str, str]:
+    """"name=url" 或 "url" -> (name, url)"""
+    name, sep, url = text.partition("=")
+    return (name, url) if sep else (text, text)
+
+
+def build_arms(targets: List[str], versions: List[str]) -> List[Tuple[str, str, Optional[str]]]:
+    """对比组: 每个服务地址 × 每个版本（未指定版本时用服务端当前版本）"""
+    arms = []
+    for target in targets or [API_BASE]:
+        name, url = parse_target(target)
+        for version in versions or [None]:
+            label = name if not version else (version if len(targets) <= 1 else f"{name}@{version}")
+            arms.append((label, url, version))
+    return arms
+
+
+async def run_all(frames: List[Frame], arms, speed: float, timeout: float,
+                  connections: int, cooldown: float) -> Dict:
+    import aiohttp
+
+    connector = aiohttp.TCPConnector(limit=connections, keepalive_timeout=60)
+    runs = {}
+    async with aiohttp.ClientSession(connector=connector) as session:
+        for i, (label, url, version) in enumerate(arms):
+            if i:
+                await asyncio.sleep(cooldown)
+            print(f"▶️  Replaying {len(frames)} requests against {label} ({url}) at {speed}x ...")
+            runs[label] = await replay(frames, http_sender(session, url, version, timeout), speed)
+    return runs
+
+
+def report(runs: Dict[str, Dict]) -> Dict:
+    names = list(runs)
+    return {
+        "arms": [summarize(name, runs[name]) for name in names],
+        "comparisons": [
+            compare(names[0], runs[names[0]], name, runs[name]) for name in names[1:]
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="采集流量重放与对比")
+    parser.add_argument("--capture", nargs="+", required=True, help="采集目录或分段文件")
+    parser.add_argument("--target", action="append", default=[],
+                        help="服务地址，可写 name=url，多次指定以对比不同构建")
+    parser.add_argument("--versions", nargs="+", default=[], help="对比的策略版本")
+    parser.add_argument("--speed", type=float, default=1.0, help="重放倍速")
+    parser.add_argument("--limit", type=int, help="最多重放的请求数")
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--connections", type=int, default=256)
+    parser.add_argument("--cooldown", type=float, default=5, help="两组之间的间隔秒数")
+    parser.add_argument("--output", help="报告输出路径（JSON）")
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error("--speed 必须大于 0")
+
+    frames = []
+    for frame in read_capture(args.capture):
+        if args.limit is not None and len(frames) >= args.limit:
+            break
+        frames.append(frame)
+    if not frames:
+        parser.error("采集日志为空")
+    arms = build_arms(args.target, args.versions)
+
+    runs = asyncio.run(run_all(frames, arms, args.speed, args.timeout, args.connections,
+                               args.cooldown))
+    result = report(runs)
+    for arm in result["arms"]:
+        lat = arm["latency_ms"]
+        print(
+            f"📊 {arm['name']}: p50 {lat['p50']:.2f}ms p95 {lat['p95']:.2f}ms "
+            f"p99 {lat['p99']:.2f}ms, outcomes {arm['outcomes']}"
+        )
+    for diff in result["comparisons"]:
+        print(
+            f"🔀 {diff['base']} -> {diff['other']}: {diff['changed_outcomes']} changed outcomes "
+            f"{diff['transitions']}, p95 {diff['p95_delta_ms']:+.2f}ms"
+        )
+        for scene in diff["scene_regressions"][:5]:
+            before, after = scene["p95_ms"]
+            print(f"    {scene['scene']}: p95 {before:.2f} -> {after:.2f}ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"📄 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
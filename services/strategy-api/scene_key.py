@@ -0,0 +1,134 @@
+"""
+场景 key 统一模块
+
+加载器与查询共用同一套规范化与指纹规则:
+    HandState -> 场景元组 (street, hero_pos, stack_bucket, action_line[, board])
+              -> 指纹 sha256("street|pos|bucket|line[|board]")[:16]
+
+翻后场景带公共牌时，公共牌经花色同构规范化（cards 查表）后以整数 key 追加到元组末尾，
+指纹串中为规范公共牌文本（如 "AhKd7c"），同构公共牌得到同一指纹；
+翻前或未提供公共牌的场景与原有指纹完全一致。
+
+场景元组由驻留字符串和整数组成，可直接作为 dict key；
+加载时登记的场景进入索引，查询命中索引时完全跳过哈希；
+其余场景的指纹经 LRU 记忆化。
+"""
+import hashlib
+import sys
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+
+import cards
+
+# (street, hero_pos, stack_bucket, action_line) 或追加规范公共牌整数 key 的五元组
+SceneTuple = Tuple
+
+STACK_BUCKET_BB = 10  # 筹码离散化粒度
+FINGERPRINT_MEMO_SIZE = 65536
+
+# 加载时建立的场景索引: 场景元组 -> 指纹
+_index: Dict[SceneTuple, str] = {}
+
+
+def stack_bucket(effective_stack_bb: float) -> int:
+    """筹码离散化（向下取整到 10bb）"""
+    return int(effective_stack_bb / STACK_BUCKET_BB) * STACK_BUCKET_BB
+
+
+@lru_cache(maxsize=cards.BOARD_MEMO_SIZE)
+def _board_code(board) -> int:
+    canonical, _ = cards.canonical_board(cards.parse_cards(board))
+    return cards.pack_board(canonical)
+
+
+def board_code(board: Sequence) -> int:
+    """公共牌（["Ah", "Kd", "7c"] / "AhKd7c"）-> 规范公共牌整数 key（按原始牌面记忆化）"""
+    return _board_code(board if isinstance(board, str) else tuple(board))
+
+
+def scene_tuple(
+    street: str, hero_pos: str, effective_stack_bb: float, action_line: str,
+    board: Optional[Sequence] = None,
+) -> SceneTuple:
+    """规范化场景: street 小写、位置/行动线大写，字符串驻留；翻后公共牌规范化为整数 key"""
+    street = sys.intern(street.strip().lower())
+    scene = (
+        street,
+        sys.intern(hero_pos.strip().upper()),
+        stack_bucket(effective_stack_bb),
+        sys.intern(action_line.strip().upper()),
+    )
+    if board and street != "preflop":
+        return scene + (board_code(board),)
+    return scene
+
+
+def parse_scene(raw: str) -> SceneTuple:
+    """解析原始场景串 "preflop|BTN|50|OPEN" / "flop|BTN|100|RAISE_CALL|AhKd7c" """
+    parts = raw.split("|")
+    if len(parts) == 5:
+        street, hero_pos, stack, action_line, board = parts
+        return scene_tuple(street, hero_pos, float(stack), action_line, board)
+    street, hero_pos, stack, action_line = raw.split("|", 3)
+    return scene_tuple(street, hero_pos, float(stack), action_line)
+
+
+def scene_str(scene: SceneTuple) -> str:
+    """场景元组 -> 原始场景串（指纹输入）"""
+    key_string = f"{scene[0]}|{scene[1]}|{scene[2]}|{scene[3]}"
+    if len(scene) == 5:
+        key_string += "|" + cards.board_key(cards.unpack_board(scene[4]))
+    return key_string
+
+
+@lru_cache(maxsize=FINGERPRINT_MEMO_SIZE)
+def _hash_scene(scene: SceneTuple) -> str:
+    return hashlib.sha256(scene_str(scene).encode()).hexdigest()[:16]
+
+
+def fingerprint(scene: SceneTuple) -> str:
+    """场景元组 -> 16位指纹（优先查加载索引，其次记忆化哈希）"""
+    fp = _index.get(scene)
+    if fp is None:
+        fp = _hash_scene(scene)
+    return fp
+
+
+def scene_of(hand_state) -> SceneTuple:
+    """HandState -> 场景元组"""
+    return scene_tuple(
+        hand_state.street,
+        hand_state.hero_pos,
+        hand_state.effective_stack_bb,
+        hand_state.action_line,
+        hand_state.board,
+    )
+
+
+def fingerprint_for_state(hand_state) -> str:
+    """HandState -> 指纹"""
+    return fingerprint(scene_of(hand_state))
+
+
+def register(scene: SceneTuple) -> str:
+    """加载时登记已知场景，返回其指纹"""
+    fp = _index.get(scene)
+    if fp is None:
+        fp = _index[scene] = _hash_scene(scene)
+    return fp
+
+
+def register_raw(raw: str) -> str:
+    """登记原始场景串，返回其指纹"""
+    return register(parse_scene(raw))
+
+
+def index_stats() -> Dict:
+    memo = _hash_scene.cache_info()
+    return {
+        "indexed_scenes": len(_index),
+        "memo_size": memo.currsize,
+        "memo_hits": memo.hits,
+        "memo_misses": memo.misses,
+        **cards.memo_stats(),
+    }
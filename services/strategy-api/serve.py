@@ -0,0 +1,131 @@
+"""
+生产模式多进程启动
+
+父进程先加载策略数据（内存 strategy_db、场景索引、近邻索引、mmap 文件），
+gc.freeze() 后再 fork 出 N 个 worker，worker 共享同一监听 socket，
+预加载的数据以写时复制方式共享，不再各自运行 load_sample_data。
+版本加载 / 切换 / 弃用等管理操作经父进程转发给所有 worker（peers.py），无需重启。
+
+用法:
+    python serve.py --workers 4
+    WEB_CONCURRENCY=4 API_PORT=8000 python serve.py
+"""
+import argparse
+import asyncio
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+import main
+import peers
+
+DEFAULT_WORKERS = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+DEFAULT_HOST = os.getenv("API_HOST", "0.0.0.0")
+DEFAULT_PORT = int(os.getenv("API_PORT", "8000"))
+
+
+def preload() -> None:
+    """在父进程中完成数据加载，并冻结 GC 减少 fork 后的写时复制"""
+    async def run():
+        await main.load_sample_data()
+        if main.strategy_store.remote:
+            # 连接绑定父进程事件循环，worker 中会按需重建连接池
+            await main.strategy_store.close()
+
+    asyncio.run(run())
+    main.preloaded = True
+    gc.collect()
+    gc.freeze()
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, log_level: str) -> None:
+    """worker 进程: 在继承的 socket 上运行 uvicorn"""
+    config = uvicorn.Config(main.app, log_level=log_level, access_log=False)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(sock: socket.socket, log_level: str, relay: peers.Relay) -> int:
+    parent_end, worker_end = socket.socketpair()
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        parent_end.close()
+        peers.channel.attach(worker_end)
+        try:
+            run_worker(sock, log_level)
+        finally:
+            os._exit(0)
+    worker_end.close()
+    relay.add(pid, parent_end)
+    return pid
+
+
+def serve(workers: int, host: str, port: int, log_level: str = "warning") -> None:
+    start = time.perf_counter()
+    preload()
+    print(f"✅ Preloaded strategy data in {time.perf_counter() - start:.2f}s")
+
+    sock = bind_socket(host, port)
+    relay = peers.Relay()
+    children = {spawn(sock, log_level, relay) for _ in range(workers)}
+    relay.start()
+    print(f"🚀 Serving on http://{host}:{port} with {workers} workers (pids {sorted(children)})")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    # 回收退出的 worker；非停止状态下意外退出则重新拉起
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        relay.remove(pid)
+        if not stopping:
+            print(f"⚠️ Worker {pid} exited ({status}), restarting", file=sys.stderr)
+            children.add(spawn(sock, log_level, relay))
+
+    sock.close()
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="GTO Strategy API 多进程服务")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+    serve(args.workers, args.host, args.port, args.log_level)
+
+
+if __name__ == "__main__":
+    cli()
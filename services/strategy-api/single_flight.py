@@ -0,0 +1,85 @@
+"""
+服务端请求合并（single-flight）
+
+高峰期多张桌同时查询同一热门场景（如 BTN 100bb open）时，
+L1 未命中的并发请求按 cache key 合并为一次存储查询与解析，
+其余请求等待同一结果（与 api-client.js 的 inFlightPromise 相同思路）。
+
+查询在独立 task 中执行，发起者被取消不会影响其他等待者。
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+
+class SingleFlight:
+    """按 key 合并并发中的异步查询，带发起/合并计数"""
+
+    def __init__(self):
+        # key -> (task, index)；index 为 None 表示单 key 查询，否则为批量结果中的位置
+        self._calls: Dict[str, Tuple[asyncio.Future, Any]] = {}
+        self.fetches = 0  # 实际发起查询的 key 数
+        self.coalesced = 0  # 合并到已有查询的 key 数
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def _release(self, keys: List[str], task: asyncio.Future) -> None:
+        for key in keys:
+            entry = self._calls.get(key)
+            if entry is not None and entry[0] is task:
+                del self._calls[key]
+
+    async def do(self, key: str, fetch: Callable[[str], Awaitable]) -> Any:
+        """查询单个 key；已有相同 key 的查询在途时等待其结果"""
+        entry = self._calls.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(fetch(key))
+            self._calls[key] = (task, None)
+            task.add_done_callback(lambda t: self._release([key], t))
+            self.fetches += 1
+        else:
+            self.coalesced += 1
+            task, _ = entry
+        return await asyncio.shield(task)
+
+    async def do_many(self, keys: List[str], fetch_many: Callable[[List[str]], Awaitable]) -> List:
+        """
+        批量查询: 在途的 key 复用已有查询，其余 key 合并为一次 fetch_many
+
+        返回与 keys 顺序一致的结果列表
+        """
+        new_keys = [k for k in dict.fromkeys(keys) if k not in self._calls]
+        if new_keys:
+            task = asyncio.ensure_future(fetch_many(new_keys))
+            for i, key in enumerate(new_keys):
+                self._calls[key] = (task, i)
+            task.add_done_callback(lambda t: self._release(new_keys, t))
+            self.fetches += len(new_keys)
+        self.coalesced += len(keys) - len(new_keys)
+
+        entries = [self._calls[k] for k in keys]
+        results = []
+        for task, index in entries:
+            value = await asyncio.shield(task)
+            results.append(value if index is None else value[index])
+        return results
+
+    def stats(self) -> Dict:
+        total = self.fetches + self.coalesced
+        return {
+            "in_flight": len(self._calls),
+            "fetches": self.fetches,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0,
+        }
+
+    def prometheus(self) -> str:
+        """Prometheus 文本格式的合并计数"""
+        return "\n".join([
+            "# HELP strategy_store_fetches_total Storage lookups issued after L1 miss",
+            "# TYPE strategy_store_fetches_total counter",
+            f"strategy_store_fetches_total {self.fetches}",
+            "# HELP strategy_store_coalesced_total Lookups served by an in-flight storage fetch",
+            "# TYPE strategy_store_coalesced_total counter",
+            f"strategy_store_coalesced_total {self.coalesced}",
+        ]) + "\n"
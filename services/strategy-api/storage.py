@@ -0,0 +1,322 @@
+"""
+策略存储后端
+
+统一 Redis (redis.asyncio 连接池) 与内存 dict 两种存储的异步接口，
+查询路径只依赖 StrategyStore，不再关心底层是哪种存储。
+"""
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Dict, List, Optional
+
+# Redis 连接配置（docker-compose 通过 REDIS_URL 注入）
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", "64"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))  # 秒
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.5"))  # 秒
+
+# 策略 key 的 TTL（导入时写入）；剩余 TTL 低于续期窗口的命中 key 在后台续期为完整 TTL，
+# 避免热点 key 在高峰期集中过期变成 fallback。窗口为 0 时关闭续期
+STRATEGY_TTL = int(os.getenv("STRATEGY_TTL", "86400"))  # 秒
+REDIS_REFRESH_WINDOW = int(os.getenv("REDIS_REFRESH_WINDOW", "3600"))  # 秒
+
+# 存储后端选择: auto（Redis 可用则用 Redis，否则内存）| redis | redis_hash（紧凑哈希布局）
+# | memory | packed
+STRATEGY_BACKEND = os.getenv("STRATEGY_BACKEND", "auto")
+PACKED_STRATEGY_FILE = os.getenv("PACKED_STRATEGY_FILE", "strategies.gtos")
+
+# 当前生效版本指针（批量导入完成后切换）
+ACTIVE_VERSION_KEY = "strat:active_version"
+
+
+class _Unavailable:
+    """读取结果未知（远程存储熔断 / 超时 / 出错且副本中没有）: 假值，但不是确定的未命中"""
+
+    __slots__ = ()
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __repr__(self) -> str:
+        return "UNAVAILABLE"
+
+
+UNAVAILABLE = _Unavailable()
+
+
+class StrategyStore:
+    """策略存储接口: key -> {"actions": [...], "source": ...}"""
+
+    backend = "base"
+    hit_source = "hit"
+    read_only = False
+    remote = False  # 查询是否有网络往返（决定是否做并发请求合并）
+
+    async def get(self, key: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    async def mget(self, keys: List[str]) -> List[Optional[Dict]]:
+        """批量查询，按 keys 顺序返回（未命中为 None）"""
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Dict, ttl: Optional[int] = None) -> None:
+        raise NotImplementedError
+
+    async def set_many(self, items: Dict[str, Dict], ttl: Optional[int] = None) -> None:
+        """批量写入（一次往返）"""
+        raise NotImplementedError
+
+    async def get_active_version(self) -> Optional[str]:
+        raise NotImplementedError
+
+    async def set_active_version(self, version: str) -> None:
+        raise NotImplementedError
+
+    def scan_version(self, version: str, batch: int = 1000) -> AsyncIterator[Dict[str, Dict]]:
+        """分块遍历一个版本的全部策略（{key: value}），用于构建进程内副本"""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict:
+        return {"backend": self.backend}
+
+    def prometheus(self) -> str:
+        return ""
+
+
+class MemoryStore(StrategyStore):
+    """内存存储（Redis 不可用时的降级方案）"""
+
+    backend = "memory"
+    hit_source = "memory_hit"
+
+    def __init__(self, db: Optional[Dict[str, Dict]] = None):
+        self.db = db if db is not None else {}
+        self.active_version: Optional[str] = None
+
+    async def get(self, key: str) -> Optional[Dict]:
+        return self.db.get(key)
+
+    async def mget(self, keys: List[str]) -> List[Optional[Dict]]:
+        db = self.db
+        return [db.get(key) for key in keys]
+
+    async def set(self, key: str, value: Dict, ttl: Optional[int] = None) -> None:
+        self.db[key] = value
+
+    async def set_many(self, items: Dict[str, Dict], ttl: Optional[int] = None) -> None:
+        self.db.update(items)
+
+    async def get_active_version(self) -> Optional[str]:
+        return self.active_version
+
+    async def set_active_version(self, version: str) -> None:
+        self.active_version = version
+
+    async def scan_version(self, version: str, batch: int = 1000) -> AsyncIterator[Dict[str, Dict]]:
+        prefix = f"strat:{version}:"
+        keys = [key for key in self.db if key.startswith(prefix)]
+        for start in range(0, len(keys), batch):
+            yield {key: self.db[key] for key in keys[start:start + batch]}
+
+
+class RedisStore(StrategyStore):
+    """基于 redis.asyncio 连接池的非阻塞存储"""
+
+    backend = "redis"
+    hit_source = "redis_hit"
+    remote = True
+    decode_responses = True
+
+    def __init__(
+        self,
+        url: str = REDIS_URL,
+        pool_size: int = REDIS_POOL_SIZE,
+        socket_timeout: float = REDIS_SOCKET_TIMEOUT,
+        connect_timeout: float = REDIS_CONNECT_TIMEOUT,
+        refresh_window: int = REDIS_REFRESH_WINDOW,
+        refresh_ttl: int = STRATEGY_TTL,
+    ):
+        self.url = url
+        self.pool_size = pool_size
+        self.socket_timeout = socket_timeout
+        self.connect_timeout = connect_timeout
+        self.refresh_window = refresh_window
+        self.refresh_ttl = refresh_ttl
+        self._client = None
+        self._loop = None
+        self._refreshing: set = set()  # 正在续期的 key
+        self._tasks: set = set()
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    @property
+    def client(self):
+        """
+        按事件循环惰性创建连接池
+
+        连接绑定在创建它的事件循环上；TestClient 等场景每次请求可能跑在新的
+        事件循环里，检测到循环变化时重建连接池。
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            import redis.asyncio as aioredis
+
+            pool = aioredis.ConnectionPool.from_url(
+                self.url,
+                max_connections=self.pool_size,
+                socket_timeout=self.socket_timeout,
+                socket_connect_timeout=self.connect_timeout,
+                decode_responses=self.decode_responses,
+            )
+            self._client = aioredis.Redis(connection_pool=pool)
+            self._loop = loop
+        return self._client
+
+    @staticmethod
+    def _encode(value: Dict) -> str:
+        # 下划线开头的字段为进程内缓存（如预编码 bytes），不写入 Redis
+        return json.dumps({k: v for k, v in value.items() if not k.startswith("_")})
+
+    async def get(self, key: str) -> Optional[Dict]:
+        if not self.refresh_window:
+            raw = await self.client.get(key)
+            return json.loads(raw) if raw else None
+        # GET + TTL 同一次往返，顺带发现临近过期的 key
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.ttl(key)
+            raw, ttl = await pipe.execute()
+        if raw:
+            self._maybe_refresh([(key, ttl)])
+        return json.loads(raw) if raw else None
+
+    async def mget(self, keys: List[str]) -> List[Optional[Dict]]:
+        if not keys:
+            return []
+        if not self.refresh_window:
+            raws = await self.client.mget(keys)
+            return [json.loads(raw) if raw else None for raw in raws]
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.mget(keys)
+            for key in keys:
+                pipe.ttl(key)
+            raws, *ttls = await pipe.execute()
+        self._maybe_refresh([(k, t) for k, raw, t in zip(keys, raws, ttls) if raw])
+        return [json.loads(raw) if raw else None for raw in raws]
+
+    def _maybe_refresh(self, key_ttls: List[tuple]) -> None:
+        """剩余 TTL 低于续期窗口的 key 在后台续期（TTL -1 表示不过期，跳过）"""
+        due = [
+            k for k, ttl in key_ttls
+            if 0 <= ttl < self.refresh_window and k not in self._refreshing
+        ]
+        if not due:
+            return
+        self._refreshing.update(due)
+        task = asyncio.get_running_loop().create_task(self._refresh(due))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, keys: List[str]) -> None:
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.expire(key, self.refresh_ttl)
+                await pipe.execute()
+            self.refreshes += len(keys)
+        except Exception:
+            self.refresh_errors += 1  # 续期失败不影响查询，下次命中时重试
+        finally:
+            self._refreshing.difference_update(keys)
+
+    async def set(self, key: str, value: Dict, ttl: Optional[int] = None) -> None:
+        if ttl:
+            await self.client.setex(key, ttl, self._encode(value))
+        else:
+            await self.client.set(key, self._encode(value))
+
+    async def set_many(self, items: Dict[str, Dict], ttl: Optional[int] = None) -> None:
+        # 非事务 pipeline: 一次往返写入整块
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                if ttl:
+                    pipe.setex(key, ttl, self._encode(value))
+                else:
+                    pipe.set(key, self._encode(value))
+            await pipe.execute()
+
+    async def get_active_version(self) -> Optional[str]:
+        return await self.client.get(ACTIVE_VERSION_KEY)
+
+    async def set_active_version(self, version: str) -> None:
+        await self.client.set(ACTIVE_VERSION_KEY, version)
+
+    async def scan_version(self, version: str, batch: int = 1000) -> AsyncIterator[Dict[str, Dict]]:
+        """SCAN strat:{version}:* + MGET（不续期），每块最多 batch 个 key"""
+        keys: List[str] = []
+        async for key in self.client.scan_iter(match=f"strat:{version}:*", count=batch):
+            keys.append(key)
+            if len(keys) >= batch:
+                yield await self._read_many(keys)
+                keys = []
+        if keys:
+            yield await self._read_many(keys)
+
+    async def _read_many(self, keys: List[str]) -> Dict[str, Dict]:
+        raws = await self.client.mget(keys)
+        return {key: json.loads(raw) for key, raw in zip(keys, raws) if raw}
+
+    def stats(self) -> Dict:
+        return {
+            "backend": self.backend,
+            "refresh_window_s": self.refresh_window,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "refreshing": len(self._refreshing),
+        }
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose(close_connection_pool=True)
+            self._client = None
+            self._loop = None
+
+
+def redis_available(url: str = REDIS_URL, timeout: float = REDIS_CONNECT_TIMEOUT) -> bool:
+    """启动时同步探测 Redis 是否可用"""
+    try:
+        import redis
+
+        probe = redis.Redis.from_url(url, socket_connect_timeout=timeout, socket_timeout=timeout)
+        probe.ping()
+        probe.close()
+        return True
+    except Exception:
+        return False
+
+
+def create_store(
+    db: Optional[Dict[str, Dict]] = None, backend: str = STRATEGY_BACKEND
+) -> StrategyStore:
+    """
+    按 STRATEGY_BACKEND 创建存储
+
+    auto 模式下 Redis 可用时返回 RedisStore，否则退回到内存存储；
+    packed 模式 mmap PACKED_STRATEGY_FILE（只读）；redis_hash 模式使用分桶哈希紧凑布局。
+    """
+    if backend == "packed":
+        from packed_store import PackedStore
+
+        return PackedStore(PACKED_STRATEGY_FILE)
+    if backend == "redis_hash":
+        from hash_store import RedisHashStore
+
+        return RedisHashStore()
+    if backend == "memory":
+        return MemoryStore(db)
+    if backend == "redis" or redis_available():
+        return RedisStore()
+    return MemoryStore(db)
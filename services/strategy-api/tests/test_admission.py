@@ -0,0 +1,102 @@
+"""
+测试: 查询接口准入控制
+验证: 延迟升高时并发上限收缩、过载时单条查询降级（L1）而批量查询 503 + Retry-After、
+      已过期的截止时间返回 504，以及正常负载下查询不受影响
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+import main  # noqa: E402
+import scene_key  # noqa: E402
+from admission import AdaptiveLimit, AdmissionController, AdmissionMiddleware  # noqa: E402
+
+HAND = {
+    "hand_id": "adm_001",
+    "table_id": "table_001",
+    "street": "preflop",
+    "hero_pos": "CO",
+    "effective_stack_bb": 100,
+    "pot_bb": 1.5,
+    "action_line": "ADMISSION_LINE",
+}
+DATA = {
+    "actions": [
+        {"action": "raise_2.5x", "frequency": 0.7, "ev": 1.1},
+        {"action": "fold", "frequency": 0.3, "ev": 0.0},
+    ],
+    "source": "preflop_db",
+}
+
+
+def saturated_client(limit: int = 2) -> tuple:
+    """并发名额已占满且不允许排队的准入控制"""
+    controller = AdmissionController(AdaptiveLimit(initial=limit, min_limit=1), max_queue=0)
+    controller.inflight = limit
+    app = AdmissionMiddleware(main.app, controller, degrade=main.degraded_query)
+    return TestClient(app), controller
+
+
+def test_limit_shrinks_when_latency_rises():
+    limiter = AdaptiveLimit(initial=100, min_limit=4, window=10)
+    for _ in range(50):
+        limiter.sample(1_000_000, inflight=100)  # 基线 1ms，并发打满
+    baseline = limiter.limit
+    for _ in range(50):
+        limiter.sample(10_000_000, inflight=100)  # 延迟升至 10ms
+    assert limiter.limit < baseline * 0.8
+    assert limiter.limit >= 4
+
+
+def test_overload_degrades_single_query_from_l1():
+    hand_state = main.HandState(**HAND)
+    version = main.versions.resolve(None).version
+    main.l1_cache.set(f"strat:{version}:{scene_key.fingerprint_for_state(hand_state)}", DATA)
+    client, controller = saturated_client()
+
+    response = client.post("/v1/strategy/query", json=HAND)
+    assert response.status_code == 200
+    assert response.headers["x-degraded"] == "overload"
+    assert "retry-after" not in response.headers  # 降级结果是成功响应
+    data = response.json()["data"]
+    assert data["cache_status"] == "hit"
+    assert data["actions"][0]["action"] == "raise_2.5x"
+    assert controller.shed["queue_full"] == 1
+    assert controller.degraded == 1
+
+
+def test_overload_rejects_batch_with_retry_after():
+    client, controller = saturated_client()
+    response = client.post("/v1/strategy/query_batch", json=[HAND, HAND])
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    error = response.json()["error"]
+    assert error["code"] == "OVERLOADED"
+    assert error["details"]["reason"] == "queue_full"
+    assert controller.degraded == 0
+
+
+def test_expired_deadline_returns_504():
+    controller = AdmissionController()
+    client = TestClient(AdmissionMiddleware(main.app, controller))
+    response = client.post(
+        "/v1/strategy/query", json=HAND, headers={"X-Request-Timeout-Ms": "0"}
+    )
+    assert response.status_code == 504
+    assert "retry-after" not in response.headers
+    assert response.json()["error"]["code"] == "DEADLINE_EXCEEDED"
+    assert controller.expired == 1
+    assert controller.inflight == 0
+
+
+def test_normal_load_passes_through():
+    controller = AdmissionController()
+    client = TestClient(AdmissionMiddleware(main.app, controller))
+    response = client.post("/v1/strategy/query", json={**HAND, "hand_id": "adm_002"})
+    assert response.status_code == 200
+    assert "x-degraded" not in response.headers
+    assert controller.admitted == 1
+    assert controller.inflight == 0
+    assert controller.stats()["shed"] == {"queue_full": 0, "queue_timeout": 0}
@@ -0,0 +1,54 @@
+"""
+测试: 开环压测脚本
+验证: 命中请求取自指定的策略文件（含翻后公共牌场景），以及超时的请求按放弃时刻计入延迟分位数
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("aiohttp")  # 压测工具依赖（requirements-dev.txt）
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark  # noqa: E402
+
+
+def test_hit_payloads_from_scene_file():
+    records = [
+        {"scene": "preflop|CO|40|OPEN", "actions": []},
+        {"scene": "flop|BTN|100|RAISE_CALL|AhKd7c", "actions": []},
+        {"fingerprint": "0123456789abcdef", "actions": []},  # 无法还原成请求
+    ]
+    hits = benchmark.build_payloads(records=records)["hit"]
+
+    assert [h["hero_pos"] for h in hits] == ["CO", "BTN"]
+    assert hits[0]["effective_stack_bb"] == 40.0 and "board" not in hits[0]
+    assert hits[1]["board"] == ["Ah", "Kd", "7c"]
+    with pytest.raises(ValueError):
+        benchmark.build_payloads(records=records[2:])
+
+
+class TimeoutSession:
+    """每个请求都超时的会话替身"""
+
+    def post(self, url, json, timeout):
+        return self
+
+    async def __aenter__(self):
+        await asyncio.sleep(0.05)
+        raise asyncio.TimeoutError
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def test_timeouts_count_toward_latency():
+    result = asyncio.run(benchmark.run_load_test(
+        TimeoutSession(), rps=40, duration=0.25, mix={"hit": 1.0},
+    ))
+
+    assert result["timeouts"] == result["total_requests"] == 10
+    assert result["latency_ms"]["count"] == 10
+    assert result["latency_ms"]["p99"] >= 50  # 不是只统计成功的快请求
@@ -0,0 +1,55 @@
+"""
+测试: 牌面编码与规范化查表
+验证: 牌面写法、组合下标表、规范组合与逐置换暴力计算一致、公共牌整数 key 往返
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cards  # noqa: E402
+
+
+def test_card_spellings():
+    assert cards.parse_card("Ah") == cards.parse_card("ah") == cards.parse_card("AH")
+    assert cards.parse_card("10d") == cards.parse_card("Td")
+    assert cards.card_str(cards.parse_card("tc")) == "Tc"
+    with pytest.raises(ValueError):
+        cards.parse_card("1x")
+    with pytest.raises(ValueError):
+        cards.parse_cards(["Ah", "ah"])
+
+
+def test_combo_table_symmetric():
+    a, b = cards.parse_cards("AsKd")
+    assert cards.combo_index(a, b) == cards.combo_index(b, a)
+    assert cards.combo_cards(cards.combo_index(a, b)) == (max(a, b), min(a, b))
+
+
+@pytest.mark.parametrize("board", ["AhKd7c", "Ks9sTs", "7h7sKd", "QcQd2h5s", "Jh8h3c3d9s"])
+def test_canonical_combo_matches_brute_force(board):
+    """查表结果与逐个置换计算的规范组合一致"""
+    parsed = cards.parse_cards(board)
+    canonical, perms = cards.canonical_board(parsed)
+    for hi, lo in [(c1, c2) for c1 in range(52) for c2 in range(c1) if c1 % 7 == 0][:40]:
+        if hi in parsed or lo in parsed:
+            continue
+        expected = min(
+            cards.combo_index(cards.permute(hi, p), cards.permute(lo, p)) for p in perms
+        )
+        assert cards.canonical_combo(parsed, (hi, lo)) == (canonical, expected)
+
+
+def test_flop_order_does_not_matter():
+    a = cards.canonical_board(cards.parse_cards("AhKd7c"))
+    b = cards.canonical_board(cards.parse_cards("7cAhKd"))
+    assert a == b
+
+
+def test_pack_board_roundtrip():
+    canonical, _ = cards.canonical_board(cards.parse_cards("2c2d2hAsKs"))
+    packed = cards.pack_board(canonical)
+    assert cards.unpack_board(packed) == canonical
+    assert 0 < packed < 1 << 30
@@ -0,0 +1,84 @@
+"""
+测试: 手牌历史离线评估
+验证: 覆盖率 / 动作一致率 / EV 损失统计、无效记录计数、进程池并行结果与单进程一致，
+      以及导入 evaluator 不会加载整个应用（worker 只需 models）
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from evaluator import evaluate, iter_lines  # noqa: E402
+from loader import sample_records  # noqa: E402
+
+
+def hand(i, pos, stack, line, hero_action=None):
+    record = {
+        "hand_id": f"h{i}",
+        "table_id": "t1",
+        "street": "preflop",
+        "hero_pos": pos,
+        "effective_stack_bb": stack,
+        "pot_bb": 1.5,
+        "action_line": line,
+    }
+    if hero_action:
+        record["hero_action"] = hero_action
+    return json.dumps(record)
+
+
+@pytest.fixture(scope="module")
+def config(tmp_path_factory):
+    path = tmp_path_factory.mktemp("evaluator") / "strategies.jsonl"
+    with open(path, "w") as f:
+        for record in sample_records():
+            f.write(json.dumps(record) + "\n")
+    return {"version": "v_eval", "strategies": str(path), "postflop": str(path.parent)}
+
+
+def test_report_metrics(config):
+    lines = [
+        hand(1, "BTN", 100, "OPEN", "raise_2.5x"),  # 推荐动作（频率 0.45）
+        hand(2, "BTN", 100, "OPEN", "call"),  # EV 损失 3.5 - 1.8
+        hand(3, "BB", 100, "OPEN", "limp"),  # 不在策略中
+        hand(4, "BTN", 100, "UNKNOWN_LINE", "fold"),  # 未覆盖
+        hand(5, "CO", 100, "OPEN"),  # 命中但无实际动作
+        "{not json",
+    ]
+    result = evaluate(lines, config, workers=1, chunk_size=4)
+
+    assert result["hands"] == 5 and result["invalid"] == 1
+    assert result["hits"] == 4 and result["coverage"] == 0.8
+    assert result["scored"] == 3 and result["off_strategy"] == 1
+    assert result["agreement_rate"] == pytest.approx(1 / 3, abs=1e-4)
+    assert result["ev_lost_bb"] == pytest.approx(1.7)
+    assert result["coverage_by_scene"]["preflop/BTN"] == {"hands": 3, "coverage": 0.6667}
+    assert result["top_missing_scenes"][0]["scene"].endswith("UNKNOWN_LINE")
+    assert result["hands_per_s"] > 0
+
+
+def test_process_pool_matches_single_process(config, tmp_path):
+    path = tmp_path / "hands.jsonl"
+    positions = ["BTN", "SB", "BB", "UTG", "MP", "CO"]
+    with open(path, "w") as f:
+        for i in range(600):
+            line = ["OPEN", "CALL", "RAISE", "LIMP"][i % 4]
+            f.write(hand(i, positions[i % 6], 20 + i % 200, line, "fold") + "\n")
+
+    single = evaluate(iter_lines(str(path)), config, workers=1, chunk_size=64)
+    pooled = evaluate(iter_lines(str(path)), config, workers=2, chunk_size=64)
+
+    timing = {"workers", "elapsed_s", "hands_per_s"}
+    assert {k: v for k, v in pooled.items() if k not in timing} == \
+        {k: v for k, v in single.items() if k not in timing}
+    assert single["hands"] == 600 and 0 < single["coverage"] < 1
+
+
+def test_import_does_not_load_app():
+    code = "import sys, evaluator; assert 'main' not in sys.modules"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], cwd=root, check=True)
@@ -0,0 +1,144 @@
+"""
+测试: 远程存储熔断与进程内副本
+验证: 慢请求在调用超时内回退到副本、连续失败后熔断打开不再访问远程存储、
+      半开探测成功后恢复、副本快照与当前版本写入同步，以及 serve.py 预加载后
+      worker 启动副本同步、故障期间的未知结果不写负缓存
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+import main  # noqa: E402
+import serve  # noqa: E402
+from failover import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, FailoverStore  # noqa: E402
+from storage import UNAVAILABLE, MemoryStore  # noqa: E402
+
+VALUE = {"actions": [{"action": "fold", "frequency": 1.0, "ev": 0.0}], "source": "test"}
+
+
+class FlakyStore(MemoryStore):
+    """可注入延迟与故障的远程存储替身，记录调用次数"""
+
+    backend = "redis"
+    hit_source = "redis_hit"
+    remote = True
+
+    def __init__(self, db=None):
+        super().__init__(db)
+        self.delay = 0.0
+        self.down = False
+        self.calls = 0
+
+    async def get(self, key):
+        return (await self.mget([key]))[0]
+
+    async def mget(self, keys):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.down:
+            raise ConnectionError("redis down")
+        return await super().mget(keys)
+
+
+def make_store(open_s=60.0):
+    primary = FlakyStore({"strat:v1:a": VALUE, "strat:v1:b": VALUE, "strat:v0:a": VALUE})
+    store = FailoverStore(primary, CircuitBreaker(failures=3, open_s=open_s), call_timeout_ms=20)
+    store.version = "v1"
+    asyncio.run(store.sync())
+    return primary, store
+
+
+def test_sync_snapshots_active_version_and_mirrors_writes():
+    primary, store = make_store()
+    assert sorted(store.replica.db) == ["strat:v1:a", "strat:v1:b"]
+
+    asyncio.run(store.set_many({"strat:v1:c": VALUE, "strat:v2:c": VALUE}))
+    assert "strat:v1:c" in store.replica.db
+    assert "strat:v2:c" not in store.replica.db
+    assert "strat:v2:c" in primary.db
+    assert store.stats()["replica"]["records"] == 3
+
+
+def test_slow_primary_falls_back_within_timeout():
+    primary, store = make_store()
+    primary.delay = 1.0
+
+    async def timed():
+        start = asyncio.get_running_loop().time()
+        result = await store.get("strat:v1:a")
+        return result, asyncio.get_running_loop().time() - start
+
+    result, elapsed = asyncio.run(timed())
+    assert result == VALUE
+    assert elapsed < 0.5
+    assert store.timeouts == 1
+    assert store.breaker.state == CLOSED  # 未达到连续失败阈值
+
+
+def test_breaker_opens_then_recovers_via_half_open_probe():
+    primary, store = make_store(open_s=0.05)
+    primary.down = True
+    for _ in range(3):
+        assert asyncio.run(store.mget(["strat:v1:a", "strat:v1:x"])) == [VALUE, UNAVAILABLE]
+    assert store.breaker.state == OPEN
+    assert store.hit_source == "replica_hit"
+
+    calls = primary.calls
+    assert asyncio.run(store.get("strat:v1:b")) == VALUE
+    assert primary.calls == calls  # 打开期间不访问远程存储
+
+    asyncio.run(asyncio.sleep(0.06))
+    assert store.breaker.allow()  # 半开: 只放行一个探测请求
+    assert store.breaker.state == HALF_OPEN
+    assert not store.breaker.allow()
+    store.breaker.failure()
+    assert store.breaker.state == OPEN
+
+    primary.down = False
+    asyncio.run(asyncio.sleep(0.06))
+    assert asyncio.run(store.get("strat:v0:a")) == VALUE  # 探测成功，副本外的 key 也可读
+    assert store.breaker.state == CLOSED
+    assert store.hit_source == "redis_hit"
+    assert store.stats()["breaker"]["opens"] == 2
+
+
+def test_worker_follows_active_version_after_preload(monkeypatch):
+    """serve.py 路径: 父进程预加载并关闭存储，worker 启动钩子构建副本；故障期间不写负缓存"""
+    primary = FlakyStore()
+    store = FailoverStore(primary, CircuitBreaker(failures=1, open_s=60), call_timeout_ms=200)
+    monkeypatch.setattr(main, "strategy_store", store)
+    monkeypatch.setattr(main, "failover", store)
+    monkeypatch.setattr(main, "preloaded", False)
+    monkeypatch.setattr(serve.gc, "freeze", lambda: None)
+
+    serve.preload()
+    assert main.preloaded
+    assert store._task is None and not store.replica.db
+
+    hand = {
+        "hand_id": "fo_001", "table_id": "table_001", "street": "preflop", "hero_pos": "CO",
+        "effective_stack_bb": 100, "pot_bb": 1.5, "action_line": "OPEN",
+    }
+    with TestClient(main.app) as client:  # worker 启动
+        deadline = time.monotonic() + 5
+        while not store.replica.db and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert store.version == main.versions.active
+        assert len(store.replica.db) == len(primary.db)
+
+        main.l1_cache.clear()
+        primary.down = True
+        data = client.post("/v1/strategy/query", json=hand).json()["data"]
+        assert data["cache_status"] == "hit"
+        assert data["source"] == "replica_hit"
+        assert store.breaker.state == OPEN
+
+        unknown = {**hand, "action_line": "FAILOVER_UNKNOWN"}
+        client.post("/v1/strategy/query", json=unknown)
+        key = f"strat:{main.versions.active}:{main.generate_fingerprint(main.HandState(**unknown))}"
+        assert main.l1_cache.get(key) is None  # 结果未知，不记为“不存在”
@@ -0,0 +1,57 @@
+"""
+测试: 快速序列化路径
+验证: 拼接编码的响应与 Pydantic 模型序列化结果一致，预编码只计算一次
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fast_json  # noqa: E402
+from main import QueryResponse, build_advice, encode_advice  # noqa: E402
+
+DATA = {
+    "actions": [
+        {"action": "raise_2.5x", "frequency": 0.45, "ev": 3.5},
+        {"action": "fold", "frequency": 0.3, "ev": 0.0},
+    ],
+    "source": "preflop_db",
+}
+
+
+def test_fast_path_matches_pydantic_schema():
+    """快速路径输出与 QueryResponse.model_dump 等价（含字段顺序）"""
+    for cached_data, source in ((dict(DATA), "memory_hit"), (None, "memory_hit")):
+        model = QueryResponse(
+            success=True,
+            data=build_advice("req_1", "abcdef0123456789", cached_data, source, 3),
+            request_id="req_1",
+            server_latency_ms=7,
+        )
+        advice, cache_status = encode_advice("req_1", "abcdef0123456789", cached_data, source, 3)
+        body = fast_json.query_response_bytes(advice, "req_1", 7)
+
+        assert cache_status == model.data.cache_status
+        assert list(json.loads(body)) == list(model.model_dump())
+        assert json.loads(body) == json.loads(model.model_dump_json())
+
+
+def test_actions_encoded_once():
+    """动作列表编码结果缓存在策略 dict 上"""
+    data = dict(DATA)
+    first = fast_json.actions_bytes(data)
+
+    data["actions"] = []  # 缓存命中时不再重新编码
+    assert fast_json.actions_bytes(data) is first
+    assert json.loads(first) == DATA["actions"]
+
+
+def test_batch_response_bytes():
+    """批量响应为 data 数组"""
+    advice, _ = encode_advice("req_2", "0123456789abcdef", dict(DATA), "l1_hit", 0)
+    body = json.loads(fast_json.batch_response_bytes([advice, advice], "req_2", 1))
+
+    assert body["success"] is True
+    assert len(body["data"]) == 2
+    assert body["data"][0]["cache_status"] == "hit"
@@ -0,0 +1,183 @@
+"""
+测试: Redis 紧凑哈希布局
+验证: 二进制编码与动作字典、分块写入时字典 id 稳定、按桶批量查询、按桶遍历整个版本，
+      布局 key 丢失后拒绝新建布局，以及每场景字节数估算满足 listpack 条件
+"""
+import asyncio
+import fnmatch
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hash_store import Layout, RedisHashStore, estimate_footprint  # noqa: E402
+from loader import bulk_load, record_fingerprint, sample_records  # noqa: E402
+
+
+class FakeRedis:
+    """内存中的 Redis 替身（只实现本布局用到的命令），记录每次 pipeline 的命令数"""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+        self.batches = []
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value):
+        self.data[key] = value.encode() if isinstance(value, str) else value
+
+    async def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    async def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    async def hmget(self, key, fields):
+        bucket = self.data.get(key, {})
+        return [bucket.get(f) for f in fields]
+
+    async def expire(self, key, ttl):
+        self.ttls[key] = ttl
+
+    async def ttl(self, key):
+        return self.ttls.get(key, -1) if key in self.data else -2
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def scan_iter(self, match, count=None):
+        for key in list(self.data):
+            if fnmatch.fnmatchcase(key, match):
+                yield key
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        return lambda *args, **kwargs: self.calls.append(method(*args, **kwargs))
+
+    async def execute(self):
+        self.client.batches.append(len(self.calls))
+        return [await call for call in self.calls]
+
+
+def make_store(buckets):
+    store = RedisHashStore(buckets=buckets, refresh_window=0)
+    store._client = FakeRedis()
+    return store
+
+
+def run(store, coro_fn):
+    async def wrapper():
+        store._loop = asyncio.get_running_loop()  # 复用替身客户端，不重建连接池
+        return await coro_fn()
+    return asyncio.run(wrapper())
+
+
+def test_layout_roundtrip_quantized():
+    layout = Layout(buckets=4)
+    value = {
+        "actions": [
+            {"action": "raise_2.5x", "frequency": 0.45, "ev": 2.537},
+            {"action": "fold", "frequency": 0.55, "ev": -400.0},
+        ],
+        "source": "preflop_db",
+    }
+    raw = layout.encode(value)
+    decoded = Layout.loads(layout.dumps()).decode(raw)
+
+    assert len(raw) == 2 + 2 * 5
+    assert decoded["source"] == "preflop_db"
+    assert [a["action"] for a in decoded["actions"]] == ["raise_2.5x", "fold"]
+    assert abs(decoded["actions"][0]["frequency"] - 0.45) < 1e-4
+    assert decoded["actions"][0]["ev"] == 2.54
+    assert decoded["actions"][1]["ev"] == -327.68  # 超出 int16 范围时截断
+
+
+def test_bulk_load_and_mget():
+    """分块写入后所有场景可查回，一次查询只需一次 pipeline 往返"""
+    store = make_store(buckets=4)
+    records = list(sample_records())
+
+    run(store, lambda: bulk_load(store, records, "v9", chunk_size=50, ttl=600))
+    keys = [f"strat:v9:{record_fingerprint(r)}" for r in records]
+    store._layouts.clear()  # 模拟另一个进程: 从 Redis 读取布局
+    store._client.batches.clear()
+    results = run(store, lambda: store.mget(keys + ["strat:v9:0000000000000000"]))
+
+    assert store._client.batches == [4]  # 每个桶一条 HMGET
+    assert results[-1] is None
+    for record, data in zip(records, results):
+        assert data["source"] == record["source"]
+        assert [a["action"] for a in data["actions"]] == [a["action"] for a in record["actions"]]
+    buckets = [k for k in store._client.data if ":b:" in k]
+    assert len(buckets) == 4
+    assert all(store._client.ttls[b] == 600 for b in buckets)
+
+
+def test_scan_version_reads_every_record():
+    """副本快照: 按桶遍历还原出全部 key"""
+    store = make_store(buckets=4)
+    records = list(sample_records())
+    run(store, lambda: bulk_load(store, records, "v9", chunk_size=50, ttl=600))
+
+    async def scan():
+        db = {}
+        async for chunk in store.scan_version("v9", batch=256):
+            db.update(chunk)
+        return db
+
+    store._client.batches.clear()
+    db = run(store, scan)
+    assert sorted(db) == sorted(f"strat:v9:{record_fingerprint(r)}" for r in records)
+    assert store._client.batches == [2, 2]  # 每次 pipeline 约 batch 条记录对应的桶数
+
+
+def test_evicted_layout_refuses_new_layout():
+    """布局 key 被淘汰而桶仍在: 另一个进程写入时不能新建布局（id 会与已有值错位）"""
+    store = make_store(buckets=4)
+    records = list(sample_records())
+    run(store, lambda: bulk_load(store, records, "v9", chunk_size=50, ttl=600))
+    run(store, lambda: store.client.delete("strat:v9:layout"))
+    store._layouts.clear()
+
+    value = {"actions": [{"action": "check", "frequency": 1.0, "ev": 0.0}], "source": "solver"}
+    with pytest.raises(ValueError, match="missing"):
+        run(store, lambda: store.set("strat:v9:0123456789abcdef", value))
+    assert "strat:v9:layout" not in store._client.data
+
+    run(store, lambda: store.set("strat:v10:0123456789abcdef", value))  # 新版本照常写入
+    assert run(store, lambda: store.get("strat:v10:0123456789abcdef")) == value
+
+
+def test_unknown_version_is_miss():
+    store = make_store(buckets=4)
+    assert run(store, lambda: store.get("strat:v404:0123456789abcdef")) is None
+
+
+def test_footprint_estimate():
+    """示例数据: 哈希布局满足 listpack 条件，每场景字节数显著下降"""
+    stats = estimate_footprint(sample_records())
+
+    assert stats["records"] == 270
+    assert stats["listpack"] is True
+    assert stats["max_value_bytes"] == 2 + 3 * 5
+    assert stats["ratio"] >= 5
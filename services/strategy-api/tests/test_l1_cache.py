@@ -0,0 +1,149 @@
+"""
+测试: 进程内 L1 缓存
+验证: LRU/TTL 淘汰、命中计数、版本切换失效、负缓存与过期后宽限期内返回旧数据，
+      以及查询路径命中 L1 / 负缓存跳过存储
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+import main  # noqa: E402
+from l1_cache import MISSING, StrategyCache  # noqa: E402
+from main import app, l1_cache  # noqa: E402
+
+client = TestClient(app)
+
+DATA = {"actions": [{"action": "fold", "frequency": 1.0, "ev": 0.0}], "source": "test"}
+
+
+def test_lru_eviction():
+    """超过容量时淘汰最久未使用的条目"""
+    cache = StrategyCache(max_size=2, ttl=60)
+    cache.set("strat:v1:a", DATA)
+    cache.set("strat:v1:b", DATA)
+    cache.get("strat:v1:a")  # a 变为最近使用
+    cache.set("strat:v1:c", DATA)
+
+    assert cache.get("strat:v1:b") is None
+    assert cache.get("strat:v1:a") is DATA
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry():
+    """过期条目视为未命中"""
+    cache = StrategyCache(max_size=8, ttl=-1)
+    cache.set("strat:v1:a", DATA)
+
+    assert cache.get("strat:v1:a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_version_invalidation():
+    """切换版本时清除旧版本条目"""
+    cache = StrategyCache(max_size=8, ttl=60)
+    cache.set_version("v1")
+    cache.set("strat:v1:a", DATA)
+    cache.set("strat:v2:a", DATA)
+
+    assert cache.set_version("v2") == 1
+    assert cache.get("strat:v1:a") is None
+    assert cache.get("strat:v2:a") is DATA
+
+
+def test_query_served_from_l1():
+    """已缓存的场景直接从 L1 返回"""
+    from main import SOLUTION_VERSION, generate_fingerprint, HandState
+
+    payload = {
+        "hand_id": "test_l1_001",
+        "table_id": "table_001",
+        "street": "preflop",
+        "hero_pos": "CO",
+        "effective_stack_bb": 60,
+        "pot_bb": 1.5,
+        "action_line": "L1_ONLY_LINE",
+    }
+    fingerprint = generate_fingerprint(HandState(**payload))
+    l1_cache.set(f"strat:{SOLUTION_VERSION}:{fingerprint}", DATA)
+
+    data = client.post("/v1/strategy/query", json=payload).json()
+
+    assert data["data"]["source"] == "l1_hit"
+    assert data["data"]["cache_status"] == "hit"
+
+
+def test_negative_cache_expires():
+    """负缓存在 negative_ttl 内返回 MISSING，之后按未命中处理"""
+    cache = StrategyCache(max_size=8, ttl=60, negative_ttl=0.05)
+    cache.set_missing("strat:v1:a")
+
+    assert cache.get("strat:v1:a") is MISSING
+    assert cache.stats()["negative_hits"] == 1
+    time.sleep(0.06)
+    assert cache.get("strat:v1:a") is None
+
+
+def test_stale_entry_served_within_grace():
+    """过期条目在宽限期内返回旧数据并通知刷新；负缓存过期不走宽限期"""
+    cache = StrategyCache(max_size=8, ttl=-1, negative_ttl=-1, stale_ttl=60)
+    stale_keys = []
+    cache.on_stale = stale_keys.append
+    cache.set("strat:v1:a", DATA)
+    cache.set_missing("strat:v1:b")
+
+    assert cache.get("strat:v1:a") is DATA
+    assert cache.get("strat:v1:b") is None
+    assert stale_keys == ["strat:v1:a"]
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_refresh_replaces_stale_entry(monkeypatch):
+    """后台刷新用存储中的数据替换过期条目"""
+    key = "strat:v9:refresh"
+    fresh = {"actions": [{"action": "call", "frequency": 1.0, "ev": 0.5}], "source": "test"}
+
+    async def fake_fetch(cache_key):
+        return fresh if cache_key == key else None
+
+    monkeypatch.setattr(main, "fetch_strategy", fake_fetch)
+    l1_cache._put(key, DATA, -1)
+
+    async def serve_stale():
+        data = l1_cache.get(key)
+        await asyncio.gather(*main.background_tasks)
+        return data
+
+    assert asyncio.run(serve_stale()) is DATA
+    assert l1_cache.get(key) is fresh
+    assert key not in main.revalidating
+
+
+def test_negative_cache_skips_store(monkeypatch):
+    """未命中的场景记入负缓存，再次查询不访问存储"""
+    calls = []
+    original = main.strategy_store.get
+
+    async def counting_get(cache_key):
+        calls.append(cache_key)
+        return await original(cache_key)
+
+    monkeypatch.setattr(main.strategy_store, "get", counting_get)
+    payload = {
+        "hand_id": "test_l1_neg",
+        "table_id": "table_001",
+        "street": "preflop",
+        "hero_pos": "CO",
+        "effective_stack_bb": 60,
+        "pot_bb": 1.5,
+        "action_line": "NEGATIVE_CACHE_LINE",
+    }
+
+    first = client.post("/v1/strategy/query", json=payload).json()["data"]
+    second = client.post("/v1/strategy/query", json=payload).json()["data"]
+
+    assert len(calls) == 1
+    assert first["cache_status"] == second["cache_status"] != "hit"
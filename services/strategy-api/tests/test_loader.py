@@ -0,0 +1,58 @@
+"""
+测试: 策略批量导入
+验证: 流式读取 JSON Lines、分块写入、新版本命名空间并行导入后再切换
+"""
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scene_key  # noqa: E402
+from loader import bulk_load, iter_records, load_and_activate, sample_records  # noqa: E402
+from storage import MemoryStore  # noqa: E402
+
+
+def test_sample_records_count():
+    """示例数据为 6 位置 × 9 筹码 × 5 行动线"""
+    records = list(sample_records())
+
+    assert len(records) == 270
+    assert records[0]["scene"] == "preflop|BTN|20|OPEN"
+
+
+def test_bulk_load_chunks_from_file(tmp_path):
+    """从文件流式读取并按块写入"""
+    path = tmp_path / "solutions.jsonl"
+    with open(path, "w") as f:
+        for record in sample_records():
+            f.write(json.dumps(record) + "\n")
+        f.write("\n")
+
+    store = MemoryStore()
+    reports = []
+    result = asyncio.run(
+        bulk_load(store, iter_records(str(path)), "v9.9.9", chunk_size=100, progress=reports.append)
+    )
+
+    assert result["records"] == 270
+    assert result["chunks"] == 3
+    assert len(store.db) == 270
+    fingerprint = scene_key.fingerprint(scene_key.parse_scene("preflop|BTN|20|OPEN"))
+    assert f"strat:v9.9.9:{fingerprint}" in store.db
+
+
+def test_side_by_side_version_switch():
+    """新版本写入独立命名空间，导入完成后才切换指针"""
+    store = MemoryStore()
+    asyncio.run(load_and_activate(store, sample_records(), "v1"))
+    assert asyncio.run(store.get_active_version()) == "v1"
+
+    staged = asyncio.run(load_and_activate(store, sample_records(), "v2", activate=False))
+    assert staged["activated"] is False
+    assert asyncio.run(store.get_active_version()) == "v1"
+    assert len(store.db) == 540
+
+    asyncio.run(store.set_active_version("v2"))
+    assert asyncio.run(store.get_active_version()) == "v2"
@@ -0,0 +1,61 @@
+"""
+测试: 服务端指标
+验证: 直方图分位数、按 street/位置计数，以及 JSON / Prometheus 导出
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from main import app  # noqa: E402
+from metrics import LatencyHistogram, Metrics, metrics  # noqa: E402
+
+client = TestClient(app)
+
+
+def test_histogram_quantiles():
+    """分位数误差在分桶精度内"""
+    h = LatencyHistogram()
+    for us in range(1, 1001):
+        h.record(us * 1000)
+
+    assert h.count == 1000
+    assert abs(h.quantile(0.5) - 500_000) / 500_000 < 0.2
+    assert abs(h.quantile(0.99) - 990_000) / 990_000 < 0.2
+    assert h.summary_ms()["max"] == 1.0
+
+
+def test_outcome_labels_are_bounded():
+    """未知 street/位置归入 other"""
+    m = Metrics()
+    m.count_outcome("preflop", "BTN", "hit")
+    m.count_outcome("preflop", "WEIRD_POS", "fallback")
+
+    assert m.outcomes[("preflop", "BTN", "hit")] == 1
+    assert m.outcomes[("preflop", "other", "fallback")] == 1
+    assert m.snapshot()["unsupported_rate"] == 0.5
+
+
+def test_metrics_endpoint_reflects_queries():
+    """查询后 /metrics 反映真实计数与延迟"""
+    metrics.reset()
+    client.post("/v1/strategy/query", json={
+        "hand_id": "test_metrics_001",
+        "table_id": "table_001",
+        "street": "preflop",
+        "hero_pos": "UNKNOWN_POS",
+        "effective_stack_bb": 999,
+        "pot_bb": 1.5,
+        "action_line": "WEIRD_ACTION_SEQUENCE",
+    })
+
+    data = client.get("/metrics").json()
+    assert data["outcomes"]["fallback"] == 1
+    assert data["latency_ms"]["request"]["count"] == 1
+    assert data["e2e_latency_ms"]["p50"] > 0
+    assert data["in_flight"] == 0
+
+    text = client.get("/metrics", params={"format": "prometheus"}).text
+    assert 'strategy_lookups_total{street="preflop",position="other",outcome="fallback"} 1' in text
+    assert 'strategy_stage_latency_seconds_count{stage="request"} 1' in text
@@ -0,0 +1,94 @@
+"""
+测试: 近邻回退引擎
+验证: 筹码插值、最近档位、相似行动线借用、行动线匹配记忆化有上限，
+      以及查询未命中时返回近邻策略
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scene_key  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from main import app  # noqa: E402
+import neighbors  # noqa: E402
+from neighbors import NeighborIndex  # noqa: E402
+
+LO = [
+    {"action": "raise_2.5x", "frequency": 0.4, "ev": 2.0},
+    {"action": "fold", "frequency": 0.6, "ev": 0.0},
+]
+HI = [
+    {"action": "raise_2.5x", "frequency": 0.8, "ev": 4.0},
+    {"action": "fold", "frequency": 0.2, "ev": 0.0},
+]
+
+
+def build_index():
+    index = NeighborIndex()
+    index.add(scene_key.parse_scene("preflop|BTN|40|OPEN"), LO)
+    index.add(scene_key.parse_scene("preflop|BTN|80|OPEN"), HI)
+    return index
+
+
+def test_interpolates_between_stack_buckets():
+    """落在两个档位之间时线性插值"""
+    data, confidence = build_index().lookup(scene_key.parse_scene("preflop|BTN|60|OPEN"))
+
+    assert data["source"] == "neighbor_interpolated"
+    assert data["actions"][0] == {"action": "raise_2.5x", "frequency": 0.6, "ev": 3.0}
+    assert 0.6 < confidence < 0.95
+
+
+def test_nearest_stack_outside_range():
+    """超出已知范围时使用最近档位，置信度随距离下降"""
+    index = build_index()
+    near, near_conf = index.lookup(scene_key.parse_scene("preflop|BTN|90|OPEN"))
+    far, far_conf = index.lookup(scene_key.parse_scene("preflop|BTN|300|OPEN"))
+
+    assert near["source"] == "neighbor_stack"
+    assert near["actions"] is HI
+    assert far_conf < near_conf
+
+
+def test_similar_action_line():
+    """行动线不同但相似时借用最相似行动线"""
+    index = build_index()
+    index.add(scene_key.parse_scene("preflop|BTN|40|FOLD_FOLD_RAISE"), HI)
+
+    data, _ = index.lookup(scene_key.parse_scene("preflop|BTN|40|FOLD_FOLD_FOLD_RAISE"))
+    assert data["source"] == "neighbor_line"
+    assert index.lookup(scene_key.parse_scene("preflop|BTN|40|CHECK_CHECK_CHECK")) is None
+    assert index.lookup(scene_key.parse_scene("preflop|UNKNOWN|40|OPEN")) is None
+
+
+def test_line_match_memo_is_bounded(monkeypatch):
+    """大量不同的未命中行动线: 记忆化按 LRU 淘汰，超长行动线截断后再匹配"""
+    monkeypatch.setattr(neighbors, "LINE_MATCH_CACHE_SIZE", 8)
+    index = build_index()
+    for i in range(100):
+        index.lookup(("preflop", "BTN", 60, f"OPEN_X{i}"))
+    assert len(index._line_match) == 8
+
+    long_line = "OPEN_" + "_".join(["CALL"] * 10_000)
+    index.lookup(("preflop", "BTN", 60, long_line))
+    assert all(len(key[2]) <= neighbors.MAX_MATCH_LINE_CHARS for key in index._line_match)
+
+
+def test_query_miss_uses_neighbor():
+    """未命中的已知 spot 返回近邻策略而不是固定 fallback"""
+    with TestClient(app) as client:
+        response = client.post("/v1/strategy/query", json={
+            "hand_id": "test_neighbor_001",
+            "table_id": "table_001",
+            "street": "preflop",
+            "hero_pos": "CO",
+            "effective_stack_bb": 125,  # 位于 100 与 150 档之间
+            "pot_bb": 1.5,
+            "action_line": "OPEN",
+        })
+
+    data = response.json()["data"]
+    assert data["cache_status"] == "approx"
+    assert data["source"] == "neighbor_interpolated"
+    assert 0.6 < data["confidence"] < 0.95
@@ -0,0 +1,62 @@
+"""
+测试: 紧凑二进制策略文件
+验证: JSON 记录转换、mmap 二分查找、量化精度，以及作为 API 存储后端
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loader import record_fingerprint, sample_records  # noqa: E402
+from packed_store import PackedStore, build_packed  # noqa: E402
+
+
+def test_build_and_lookup(tmp_path):
+    """所有记录可查回，频率/EV 在量化精度内一致"""
+    path = str(tmp_path / "strategies.gtos")
+    records = list(sample_records())
+    stats = build_packed(records, "v0.1.0", path)
+    store = PackedStore(path)
+
+    assert stats["records"] == len(records) == len(store)
+    for record in records:
+        data = store.lookup(f"strat:v0.1.0:{record_fingerprint(record)}")
+        assert data["source"] == record["source"]
+        assert [a["action"] for a in data["actions"]] == [a["action"] for a in record["actions"]]
+        for got, want in zip(data["actions"], record["actions"]):
+            assert abs(got["frequency"] - want["frequency"]) < 1e-4
+            assert abs(got["ev"] - want["ev"]) <= 0.005
+
+    asyncio.run(store.close())
+
+
+def test_lookup_miss_and_other_version(tmp_path):
+    """未知场景与其他版本 key 返回 None"""
+    path = str(tmp_path / "strategies.gtos")
+    build_packed(sample_records(), "v0.1.0", path)
+    store = PackedStore(path)
+
+    fingerprint = record_fingerprint({"scene": "preflop|BTN|20|OPEN"})
+    assert store.lookup("strat:v0.1.0:0000000000000000") is None
+    assert store.lookup(f"strat:v0.2.0:{fingerprint}") is None
+    results = asyncio.run(store.mget([f"strat:v0.1.0:{fingerprint}", "strat:v0.1.0:x"]))
+    assert results[0] is not None and results[1] is None
+    assert asyncio.run(store.get_active_version()) == "v0.1.0"
+
+    asyncio.run(store.close())
+
+
+def test_create_store_packed_backend(tmp_path, monkeypatch):
+    """STRATEGY_BACKEND=packed 时启动选择 mmap 存储"""
+    path = str(tmp_path / "strategies.gtos")
+    build_packed(sample_records(), "v0.1.0", path)
+    monkeypatch.setattr("storage.PACKED_STRATEGY_FILE", path)
+
+    from storage import create_store
+
+    store = create_store(backend="packed")
+    assert store.backend == "packed"
+    assert store.read_only is True
+
+    asyncio.run(store.close())
@@ -0,0 +1,141 @@
+"""
+测试: 多 worker 管理事件广播
+验证: 一个 worker 发布的事件转发给其余 worker、重新拉起的 worker 重放历史事件、
+      重放加载 / 切换 / 弃用后本进程版本状态与发起方一致，
+      以及 serve.py 多 worker 下经管理接口切换版本后所有 worker 都返回新版本
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+import peers  # noqa: E402
+from main import SOLUTION_VERSION, activate_version, versions  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def restore_versions():
+    yield
+    asyncio.run(activate_version(SOLUTION_VERSION))
+    for version in list(versions.versions):
+        versions.discard(version)
+    versions.loading.clear()
+
+
+def test_relay_forwards_to_other_workers_and_replays_history():
+    relay = peers.Relay()
+    pairs = {pid: socket.socketpair() for pid in (1, 2, 3)}
+    for pid in (1, 2):
+        relay.add(pid, pairs[pid][0])
+    relay.start()
+
+    async def run():
+        received = {1: [], 2: [], 3: []}
+        channels = {pid: peers.PeerChannel() for pid in pairs}
+        for pid, channel in channels.items():
+            channel.attach(pairs[pid][1])
+
+            async def handler(event, pid=pid):
+                received[pid].append(event)
+
+            if pid != 3:
+                await channel.start(handler)
+        channels[1].publish(peers.EVENT_LOADED, "v0.2.0", file=None)
+        channels[1].publish(peers.EVENT_ACTIVATED, "v0.2.0")
+        await wait_for(lambda: len(received[2]) == 2)
+
+        relay.add(3, pairs[3][0])  # 重新拉起的 worker
+        await channels[3].start(lambda event: collect(received[3], event))
+        await wait_for(lambda: len(received[3]) == 2)
+        await asyncio.sleep(0.05)
+        return received, channels
+
+    received, channels = asyncio.run(run())
+    assert received[1] == []  # 不回送给发起方
+    assert [e["op"] for e in received[2]] == ["loaded", "activated"]
+    assert received[3] == received[2]
+    assert channels[2].stats()["applied"] == 2
+    relay.remove(1)
+
+
+async def collect(target, event):
+    target.append(event)
+
+
+async def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.01)
+
+
+def test_apply_peer_events(restore_versions):
+    """内存存储: 重放加载（读取同一来源）→ 切换 → 弃用旧版本"""
+    async def run():
+        await main.apply_peer_event({"op": "loaded", "version": "v0.2.0", "file": None})
+        await main.apply_peer_event({"op": "activated", "version": "v0.2.0"})
+        await main.apply_peer_event(
+            {"op": "deprecated", "version": SOLUTION_VERSION, "sunset_date": "2026-03-01"}
+        )
+
+    asyncio.run(run())
+    assert versions.get("v0.2.0").records == 270
+    assert versions.active == "v0.2.0"
+    assert versions.get(SOLUTION_VERSION).deprecated
+    assert asyncio.run(main.strategy_store.get_active_version()) != "v0.2.0"  # 重放不写指针
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_serve_switch_reaches_every_worker():
+    port = free_port()
+    env = {**os.environ, "ADMIN_TOKEN": "peer-token", "HOT_SET_FILE": "", "REDIS_URL": ""}
+    proc = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", "2", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                if httpx.get(f"{base}/ready").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            assert time.monotonic() < deadline and proc.poll() is None
+            time.sleep(0.1)
+
+        response = httpx.post(
+            f"{base}/admin/versions/v0.2.0/load", json={"activate": True},
+            headers={"X-Admin-Token": "peer-token"},
+        )
+        assert response.status_code == 202
+
+        # 每次新建连接，由任意 worker 接收；所有 worker 都切换后连续多次都返回新版本
+        streak = 0
+        while streak < 20:
+            assert time.monotonic() < deadline + 30
+            current = httpx.get(f"{base}/v1/version").json()["current_version"]
+            streak = streak + 1 if current == "v0.2.0" else 0
+            time.sleep(0.02)
+        applied = [httpx.get(f"{base}/metrics").json()["peers"] for _ in range(20)]
+        assert all(p["enabled"] for p in applied)
+        assert any(p["applied"] == 2 for p in applied)  # 非发起方重放了 loaded + activated
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
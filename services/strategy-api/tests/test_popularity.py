@@ -0,0 +1,101 @@
+"""
+测试: 场景热度跟踪与预热
+验证: 固定内存下找出高频场景且计数误差有界、热点集合持久化后按衰减读回、
+      /debug/hot_scenes 返回查询与未命中热点，以及按热度预热 L1
+"""
+import asyncio
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+import main  # noqa: E402
+import scene_key  # noqa: E402
+from popularity import PopularityTracker, SpaceSaving  # noqa: E402
+
+ADMIN_TOKEN = "test-admin-token"
+client = TestClient(main.app, headers={"X-Admin-Token": ADMIN_TOKEN})
+
+HAND = {
+    "hand_id": "hot_001",
+    "table_id": "table_001",
+    "street": "preflop",
+    "hero_pos": "SB",
+    "effective_stack_bb": 100,
+    "pot_bb": 1.5,
+    "action_line": "HOT_LINE",
+}
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", ADMIN_TOKEN)
+
+
+def test_space_saving_bounded_and_finds_heavy_hitters():
+    sketch = SpaceSaving(capacity=64)  # 误差上界 N / capacity < 200
+    rng = random.Random(7)
+    stream = [f"hot{i}" for i in range(5) for _ in range(200)]
+    stream += [f"cold{rng.randrange(100_000)}" for _ in range(5000)]
+    rng.shuffle(stream)
+    for key in stream:
+        sketch.add(key)
+
+    assert len(sketch) < 2 * 64
+    top = sketch.top(5)
+    assert sorted(item["fingerprint"] for item in top) == [f"hot{i}" for i in range(5)]
+    for item in top:
+        assert item["count"] - item["error"] <= 200 <= item["count"]
+
+
+def test_hot_set_roundtrip_with_decay(tmp_path):
+    tracker = PopularityTracker(capacity=8)
+    scene = scene_key.scene_tuple("preflop", "BTN", 100, "F_F_F")
+    for _ in range(10):
+        tracker.record("aaaa", scene, "hit")
+    tracker.record("bbbb", scene, "miss")
+    path = str(tmp_path / "hot.json")
+    assert tracker.save(path) == 2
+
+    restored = PopularityTracker(capacity=8)
+    assert restored.load(path) == 2
+    assert restored.hot_fingerprints(1) == ["aaaa"]
+    assert restored.requests.top(1)[0]["count"] == 5
+    assert restored.requests.top(1)[0]["scene"] == scene_key.scene_str(scene)
+    assert restored.misses.top(5) == []  # 计数 1 衰减后为 0
+    assert PopularityTracker().load(str(tmp_path / "missing.json")) == 0
+
+
+def test_hot_scenes_endpoint_reports_requests_and_misses():
+    for i in range(3):
+        client.post("/v1/strategy/query", json={**HAND, "hand_id": f"hot_{i}"})
+    response = client.get("/debug/hot_scenes", params={"limit": 1000})
+    assert response.status_code == 200
+    body = response.json()
+
+    fingerprint = scene_key.fingerprint_for_state(main.HandState(**HAND))
+    requests = {item["fingerprint"]: item for item in body["requests"]}
+    misses = {item["fingerprint"]: item for item in body["misses"]}
+    assert requests[fingerprint]["count"] >= 3
+    assert "HOT_LINE" in requests[fingerprint]["scene"]
+    assert misses[fingerprint]["count"] >= 3  # 库中没有该场景
+    assert body["total_requests"] >= 3
+
+
+def test_prewarm_puts_hot_scenes_in_l1():
+    hand_state = main.HandState(**{**HAND, "action_line": "PREWARM_LINE"})
+    fingerprint = scene_key.fingerprint_for_state(hand_state)
+    version = main.versions.active
+    key = f"strat:{version}:{fingerprint}"
+    data = {"actions": [{"action": "fold", "frequency": 1.0, "ev": 0.0}], "source": "preflop_db"}
+    asyncio.run(main.strategy_store.set(key, data))
+    for _ in range(1000):
+        main.popularity.record(fingerprint, scene_key.scene_of(hand_state), "hit")
+    main.l1_cache.invalidate_version(version)
+
+    assert asyncio.run(main.prewarm_l1(version)) >= 1
+    assert main.l1_cache.peek(key)["actions"][0]["action"] == "fold"
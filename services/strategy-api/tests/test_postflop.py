@@ -0,0 +1,130 @@
+"""
+测试: 翻后列式策略表
+验证: 组合下标编码、公共牌花色同构、构建/查询一致、同构公共牌共用一行、
+      两遍流式构建（Replayable 与列表结果一致，一次性迭代器被拒绝），
+      以及查询接口对 flop 场景返回手牌对应的动作分布
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+import cards  # noqa: E402
+import main  # noqa: E402
+import postflop  # noqa: E402
+import scene_key  # noqa: E402
+
+client = TestClient(main.app)
+
+SUIT_SWAP = str.maketrans("cdhs", "hscd")  # c->h, d->s, h->c, s->d
+
+
+@pytest.fixture(scope="module")
+def tables(tmp_path_factory):
+    records = list(postflop.sample_records(boards=3))
+    swapped = dict(records[0], board=records[0]["board"].translate(SUIT_SWAP))
+    output = tmp_path_factory.mktemp("postflop")
+    stats = postflop.build_tables(records + [swapped], main.SOLUTION_VERSION, str(output))
+    assert stats["scenes"] == 3 and stats["duplicates"] == 1  # 同构公共牌只保留一条
+    return postflop.PostflopTables(str(output)), records
+
+
+def test_combo_index_roundtrip():
+    seen = set()
+    for hi in range(cards.NUM_CARDS):
+        for lo in range(hi):
+            index = cards.combo_index(lo, hi)
+            assert cards.combo_cards(index) == (hi, lo)
+            seen.add(index)
+    assert seen == set(range(cards.NUM_COMBOS))
+
+
+def test_isomorphic_boards_share_canonical_form():
+    a, _ = cards.canonical_board(tuple(cards.parse_cards("AhKd7c")))
+    b, _ = cards.canonical_board(tuple(cards.parse_cards("7dAsKc")))
+    c, _ = cards.canonical_board(tuple(cards.parse_cards("AhKh7c")))
+    assert a == b
+    assert a != c  # 同花听牌面与彩虹面不同构
+
+
+def test_lookup_matches_solver_output(tables):
+    tables, records = tables
+    record = records[1]
+    scene = scene_key.parse_scene(f"{record['scene']}|{record['board']}")
+    hand, values = next(iter(record["strategy"].items()))
+    result = tables.lookup(scene, record["board"], [hand[:2], hand[2:]])
+
+    assert result["source"] == "postflop_table"
+    by_action = {a["action"]: a for a in result["actions"]}
+    for name, freq, ev in zip(record["actions"], values["freq"], values["ev"]):
+        assert by_action[name]["frequency"] == pytest.approx(freq, abs=1e-4)
+        assert by_action[name]["ev"] == pytest.approx(ev, abs=0.01)
+
+
+def test_streaming_build_matches_list(tables, tmp_path):
+    """Replayable 重放生成器两遍构建，结果与列表输入逐字节一致"""
+    tables, records = tables
+    swapped = dict(records[0], board=records[0]["board"].translate(SUIT_SWAP))
+    replay = postflop.Replayable(lambda: [*postflop.sample_records(boards=3), swapped])
+    postflop.build_tables(replay, main.SOLUTION_VERSION, str(tmp_path))
+    streamed = postflop.PostflopTables(str(tmp_path))
+
+    assert streamed.rows == tables.rows
+    assert np.array_equal(streamed.freq, tables.freq)
+    assert np.array_equal(streamed.ev, tables.ev)
+    with pytest.raises(TypeError):
+        postflop.build_tables(postflop.sample_records(boards=1), "v0", str(tmp_path / "x"))
+
+
+def test_isomorphic_board_lookup(tables):
+    """花色置换后的公共牌与手牌得到相同的动作分布"""
+    tables, records = tables
+    record = records[0]
+    board = record["board"].translate(SUIT_SWAP)
+    scene = scene_key.parse_scene(f"{record['scene']}|{record['board']}")
+    swapped_scene = scene_key.parse_scene(f"{record['scene']}|{board}")
+    assert scene == swapped_scene
+    hand = next(iter(record["strategy"]))
+    original = tables.lookup(scene, record["board"], hand)
+    swapped = tables.lookup(swapped_scene, board, hand.translate(SUIT_SWAP))
+    assert original == swapped
+
+
+def test_range_lookup_is_vectorized(tables):
+    tables, records = tables
+    record = records[1]  # 彩虹面: 无非平凡的花色对称，每个组合各占一行
+    result = tables.range_of(scene_key.parse_scene(f"{record['scene']}|{record['board']}"))
+    assert len(result["combos"]) == len(record["strategy"])  # 与公共牌冲突的组合不在范围内
+    assert result["freq"].shape == (len(record["strategy"]), len(tables.actions))
+    assert np.allclose(result["freq"].sum(axis=1), 1.0, atol=1e-3)
+
+
+def test_query_flop_with_hero_cards(tables):
+    tables, records = tables
+    record = records[0]
+    hand = next(iter(record["strategy"]))
+    original = main.postflop_tables
+    main.postflop_tables = {main.SOLUTION_VERSION: tables}
+    try:
+        response = client.post("/v1/strategy/query", json={
+            "hand_id": "pf_001",
+            "table_id": "table_001",
+            "street": "flop",
+            "hero_pos": "BTN",
+            "effective_stack_bb": 100,
+            "pot_bb": 6.5,
+            "action_line": "RAISE_CALL",
+            "hero_cards": [hand[:2], hand[2:]],
+            "board": [record["board"][i:i + 2] for i in (0, 2, 4)],
+        })
+    finally:
+        main.postflop_tables = original
+
+    data = response.json()["data"]
+    assert data["source"] == "postflop_table"
+    assert data["cache_status"] == "hit"
+    assert {a["action"] for a in data["actions"]} <= set(record["actions"])
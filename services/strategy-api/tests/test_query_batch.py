@@ -0,0 +1,66 @@
+"""
+测试: 批量查询
+验证: 按请求顺序返回每个场景的建议，命中/fallback语义与单条查询一致
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from main import (  # noqa: E402
+    app,
+    strategy_store,
+    HandState,
+    MAX_BATCH_SIZE,
+    SOLUTION_VERSION,
+    generate_fingerprint,
+)
+
+client = TestClient(app)
+
+
+def make_state(table_id, hero_pos, action_line):
+    return {
+        "hand_id": f"test_batch_{table_id}",
+        "table_id": table_id,
+        "street": "preflop",
+        "hero_pos": hero_pos,
+        "effective_stack_bb": 100,
+        "pot_bb": 1.5,
+        "action_line": action_line,
+    }
+
+
+def test_query_batch_mixed_hit_and_miss():
+    """批量查询: 命中与未命中混合，顺序与请求一致"""
+    hit_state = make_state("table_001", "MP", "BATCH_HIT_LINE")
+    miss_state = make_state("table_002", "UNKNOWN_POS", "BATCH_MISS_LINE")
+    fingerprint = generate_fingerprint(HandState(**hit_state))
+    test_data = {
+        "actions": [{"action": "raise_2.5x", "frequency": 1.0, "ev": 2.0}],
+        "source": "preflop_db",
+    }
+    asyncio.run(strategy_store.set(f"strat:{SOLUTION_VERSION}:{fingerprint}", test_data, ttl=3600))
+
+    response = client.post("/v1/strategy/query_batch", json=[miss_state, hit_state, miss_state])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["success"] is True
+    statuses = [item["cache_status"] for item in body["data"]]
+    assert statuses == ["miss", "hit", "miss"]
+    assert body["data"][1]["scene_fingerprint"] == fingerprint
+    assert body["data"][1]["actions"] == test_data["actions"]
+    assert body["data"][0]["source"] == "fallback"
+    assert body["data"][0]["confidence"] < 0.7
+
+
+def test_query_batch_too_large():
+    """超过批量上限返回413"""
+    states = [make_state(f"t{i}", "BTN", "OPEN") for i in range(MAX_BATCH_SIZE + 1)]
+
+    response = client.post("/v1/strategy/query_batch", json=states)
+
+    assert response.status_code == 413
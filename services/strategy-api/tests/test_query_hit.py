@@ -2,15 +2,15 @@
 测试: 缓存命中场景
 验证: Redis中存在策略数据时，API正确返回
 """
+import asyncio
 import hashlib
-import json
 import os
 import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from fastapi.testclient import TestClient  # noqa: E402
-from main import app, USE_REDIS, redis_client, SOLUTION_VERSION  # noqa: E402
+from main import app, strategy_store, SOLUTION_VERSION  # noqa: E402
 
 client = TestClient(app)
 
@@ -40,12 +40,7 @@ def test_query_hit():
         "source": "preflop_db",
     }
 
-    if USE_REDIS:
-        redis_client.setex(cache_key, 3600, json.dumps(test_data))
-    else:
-        from main import strategy_db  # noqa: E402
-
-        strategy_db[cache_key] = test_data
+    asyncio.run(strategy_store.set(cache_key, test_data, ttl=3600))
 
     # 执行查询
     response = client.post(
@@ -0,0 +1,91 @@
+"""
+测试: 场景 key 统一
+验证: 规范化规则、加载索引与查询指纹一致，预加载数据可被查询命中
+"""
+import hashlib
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scene_key  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from main import app  # noqa: E402
+
+
+def test_fingerprint_format_unchanged():
+    """指纹仍为 sha256("street|pos|bucket|line") 前16位"""
+    scene = scene_key.scene_tuple("preflop", "BTN", 105.5, "FOLD_FOLD_FOLD_FOLD")
+    expected = hashlib.sha256(b"preflop|BTN|100|FOLD_FOLD_FOLD_FOLD").hexdigest()[:16]
+
+    assert scene == ("preflop", "BTN", 100, "FOLD_FOLD_FOLD_FOLD")
+    assert scene_key.fingerprint(scene) == expected
+
+
+def test_canonicalization():
+    """大小写与空白不影响场景 key"""
+    a = scene_key.scene_tuple(" Preflop", "btn ", 59, "open")
+    b = scene_key.parse_scene("preflop|BTN|50|OPEN")
+
+    assert a == b
+    assert scene_key.fingerprint(a) == scene_key.fingerprint(b)
+
+
+def test_register_populates_index():
+    """登记的场景进入索引"""
+    fp = scene_key.register_raw("river|BB|300|CHECK_BET")
+
+    assert scene_key._index[scene_key.parse_scene("river|BB|300|CHECK_BET")] == fp
+    assert scene_key.index_stats()["indexed_scenes"] >= 1
+
+
+def test_preloaded_scene_is_hit():
+    """启动加载的示例数据可被查询命中（加载与查询 key 一致）"""
+    with TestClient(app) as client:
+        response = client.post("/v1/strategy/query", json={
+            "hand_id": "test_scene_001",
+            "table_id": "table_001",
+            "street": "preflop",
+            "hero_pos": "BTN",
+            "effective_stack_bb": 100,
+            "pot_bb": 1.5,
+            "action_line": "OPEN",
+        })
+
+    data = response.json()["data"]
+    assert data["cache_status"] == "hit"
+    assert data["actions"][0]["action"] == "raise_2.5x"
+
+
+def test_board_folded_into_fingerprint():
+    """翻后公共牌规范化后进入指纹: 同构公共牌同指纹，不同公共牌不同指纹"""
+    plain = scene_key.scene_tuple("flop", "BTN", 100, "RAISE_CALL")
+    a = scene_key.scene_tuple("flop", "BTN", 100, "RAISE_CALL", ["Ah", "Kd", "7c"])
+    b = scene_key.scene_tuple("flop", "BTN", 100, "RAISE_CALL", ["7d", "As", "Kc"])
+    c = scene_key.scene_tuple("flop", "BTN", 100, "RAISE_CALL", ["Ah", "Kh", "7c"])
+
+    assert a == b and a != c
+    assert scene_key.fingerprint(a) == scene_key.fingerprint(b) != scene_key.fingerprint(c)
+    assert scene_key.fingerprint(plain) != scene_key.fingerprint(a)
+    assert scene_key.parse_scene(scene_key.scene_str(a)) == a
+
+
+def test_preflop_ignores_board():
+    """翻前场景不带公共牌，指纹与原规则一致"""
+    scene = scene_key.scene_tuple("preflop", "BTN", 100, "OPEN", ["Ah", "Kd", "7c"])
+    assert scene == ("preflop", "BTN", 100, "OPEN")
+
+
+def test_invalid_cards_rejected():
+    """无效牌面在请求校验阶段返回 422"""
+    response = TestClient(app).post("/v1/strategy/query", json={
+        "hand_id": "sk_001",
+        "table_id": "table_001",
+        "street": "flop",
+        "hero_pos": "BTN",
+        "effective_stack_bb": 100,
+        "pot_bb": 6,
+        "action_line": "RAISE_CALL",
+        "board": ["Ah", "Kd", "Zz"],
+    })
+    assert response.status_code == 422
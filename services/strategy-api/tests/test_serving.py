@@ -0,0 +1,77 @@
+"""
+测试: 生产服务模式
+验证: 就绪检查在数据加载后返回200，预加载后 worker 启动不重复加载，
+      存储中已有当前版本时启动不写入数据（近邻索引从存储重建）
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from loader import load_and_activate  # noqa: E402
+from storage import MemoryStore  # noqa: E402
+
+
+def test_ready_after_startup():
+    """启动加载完成后 /ready 返回200"""
+    with TestClient(main.app) as client:
+        response = client.get("/ready")
+
+    assert response.status_code == 200
+    assert response.json()["solution_version"] == main.SOLUTION_VERSION
+
+
+def test_ready_gated_until_loaded(monkeypatch):
+    """数据未就绪时返回503"""
+    monkeypatch.setattr(main, "data_ready", False)
+    response = TestClient(main.app).get("/ready")
+
+    assert response.status_code == 503
+
+
+def test_preloaded_worker_skips_loading(monkeypatch):
+    """父进程已预加载时，worker 启动钩子不再加载数据"""
+    async def fail(*args, **kwargs):
+        raise AssertionError("bulk_load should not run in a preloaded worker")
+
+    monkeypatch.setattr(main, "preloaded", True)
+    monkeypatch.setattr(main, "bulk_load", fail)
+
+    with TestClient(main.app) as client:
+        assert client.get("/health").status_code == 200
+
+
+def test_startup_adopts_active_version_without_writing(monkeypatch):
+    """loader.py --activate 导入的版本: 重启后原样服务，不被示例数据覆盖"""
+    store = MemoryStore()
+    records = [
+        {"scene": f"preflop|BTN|{stack}|OPEN", "source": "solver",
+         "actions": [{"action": "raise_2.5x", "frequency": 0.99, "ev": 3.0},
+                     {"action": "fold", "frequency": 0.01, "ev": 0.0}]}
+        for stack in (40, 100)
+    ]
+    asyncio.run(load_and_activate(store, records, "v9.9.9"))
+    before = {k: dict(v) for k, v in store.db.items()}
+    monkeypatch.setattr(main, "strategy_store", store)
+    monkeypatch.delenv("STRATEGY_FILE", raising=False)
+    for name in ("versions", "loading"):
+        monkeypatch.setattr(main.versions, name, dict(getattr(main.versions, name)))
+    monkeypatch.setattr(main.versions, "active", main.versions.active)
+
+    hand = {"hand_id": "adopt_001", "table_id": "table_001", "street": "preflop",
+            "hero_pos": "BTN", "effective_stack_bb": 100, "pot_bb": 1.5, "action_line": "OPEN"}
+    with TestClient(main.app) as client:
+        hit = client.post("/v1/strategy/query", json=hand).json()["data"]
+        approx = client.post("/v1/strategy/query",
+                             json={**hand, "effective_stack_bb": 70}).json()["data"]
+
+    assert main.versions.active == "v9.9.9"
+    assert hit["cache_status"] == "hit"
+    assert hit["actions"][0]["frequency"] == 0.99
+    assert approx["cache_status"] == "approx"  # 近邻索引来自存储中的记录
+    assert len(store.db) == len(before)
+    for key, value in store.db.items():
+        assert {k: v for k, v in value.items() if not k.startswith("_")} == before[key]
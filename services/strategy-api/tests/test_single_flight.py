@@ -0,0 +1,127 @@
+"""
+测试: 服务端请求合并（single-flight）
+验证: 相同 key 的并发查询只发起一次存储查询、批量查询复用在途 key、
+      异常传递给所有等待者，以及查询接口在远程存储下的合并计数
+"""
+import asyncio
+import os
+import sys
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+import main  # noqa: E402
+from single_flight import SingleFlight  # noqa: E402
+from storage import MemoryStore  # noqa: E402
+
+DATA = {"actions": [{"action": "fold", "frequency": 1.0, "ev": 0.0}], "source": "test"}
+
+
+class SlowStore(MemoryStore):
+    """模拟有网络往返的远程存储，记录查询次数"""
+
+    remote = True
+    hit_source = "redis_hit"
+
+    def __init__(self, db):
+        super().__init__(db)
+        self.calls = []
+
+    async def get(self, key):
+        self.calls.append([key])
+        await asyncio.sleep(0.01)
+        return await super().get(key)
+
+    async def mget(self, keys):
+        self.calls.append(list(keys))
+        await asyncio.sleep(0.01)
+        return await super().mget(keys)
+
+
+def test_concurrent_same_key_fetched_once():
+    store = SlowStore({"k": DATA})
+    flight = SingleFlight()
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", store.get) for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert all(r is DATA for r in results)
+    assert store.calls == [["k"]]
+    assert flight.stats()["coalesced"] == 9
+    assert len(flight) == 0  # 完成后释放
+
+
+def test_do_many_reuses_in_flight_keys():
+    store = SlowStore({"a": DATA, "b": DATA})
+    flight = SingleFlight()
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("a", store.get))
+        await asyncio.sleep(0)
+        batch = await flight.do_many(["a", "b", "c", "b"], store.mget)
+        return await first, batch
+
+    single, batch = asyncio.run(run())
+    assert single is DATA
+    assert batch == [DATA, DATA, None, DATA]
+    assert store.calls == [["a"], ["b", "c"]]
+    assert flight.fetches == 3 and flight.coalesced == 2
+
+
+def test_errors_reach_all_waiters():
+    flight = SingleFlight()
+
+    async def failing(key):
+        await asyncio.sleep(0.01)
+        raise ConnectionError("redis down")
+
+    async def run():
+        return await asyncio.gather(
+            *(flight.do("k", failing) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ConnectionError) for r in results)
+    assert len(flight) == 0
+
+
+def test_query_coalesces_on_remote_store():
+    """并发查询同一场景: 一次存储查询，其余请求计入 coalesced"""
+    original_store, original_flight = main.strategy_store, main.store_flight
+    main.strategy_store = store = SlowStore(main.strategy_db)
+    main.store_flight = SingleFlight()
+    main.l1_cache.clear()
+    payload = {
+        "hand_id": "sf_001",
+        "table_id": "table_001",
+        "street": "river",
+        "hero_pos": "SB",
+        "effective_stack_bb": 40,
+        "pot_bb": 20,
+        "action_line": "CHECK_CHECK",
+    }
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(
+                *(client.post("/v1/strategy/query", json=payload) for _ in range(8))
+            )
+
+    try:
+        responses = asyncio.run(run())
+        assert all(r.status_code == 200 for r in responses)
+        assert len(store.calls) == 1
+        assert main.store_flight.stats()["coalesced"] == 7
+    finally:
+        main.strategy_store, main.store_flight = original_store, original_flight
+
+
+def test_coalesced_counters_exported():
+    """合并计数出现在 /metrics 的 JSON 与 Prometheus 输出中"""
+    client = TestClient(main.app)
+    assert "coalesced" in client.get("/metrics").json()["single_flight"]
+    assert "strategy_store_coalesced_total" in client.get("/metrics?format=prometheus").text
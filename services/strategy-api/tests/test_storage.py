@@ -0,0 +1,115 @@
+"""
+测试: 存储后端
+验证: 内存存储与 Redis 存储共享同一异步接口，Redis 不可用时自动降级，
+      临近过期的热点 key 在后台续期
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import MemoryStore, RedisStore, create_store  # noqa: E402
+
+
+def test_memory_store_roundtrip():
+    """内存存储读写"""
+    db = {}
+    store = MemoryStore(db)
+    value = {"actions": [{"action": "fold", "frequency": 1.0, "ev": 0.0}], "source": "test"}
+
+    asyncio.run(store.set("strat:test:abc", value, ttl=60))
+
+    assert db["strat:test:abc"] == value
+    assert asyncio.run(store.get("strat:test:abc")) == value
+    assert asyncio.run(store.get("strat:test:missing")) is None
+
+
+def test_create_store_falls_back_to_memory(monkeypatch):
+    """Redis 不可达时返回内存存储，并复用传入的 dict"""
+    monkeypatch.setattr("storage.redis_available", lambda *a, **kw: False)
+    db = {}
+    store = create_store(db)
+
+    assert store.backend == "memory"
+    assert store.db is db
+
+
+def test_redis_store_pool_config():
+    """Redis 存储按配置创建连接池"""
+    store = RedisStore(url="redis://example:6380/2", pool_size=8, socket_timeout=0.1)
+
+    async def build():
+        return store.client
+
+    client = asyncio.run(build())
+    pool = client.connection_pool
+    assert pool.max_connections == 8
+    assert pool.connection_kwargs["host"] == "example"
+    assert pool.connection_kwargs["socket_timeout"] == 0.1
+
+
+def test_memory_store_mget_preserves_order():
+    """批量查询按 key 顺序返回，未命中为 None"""
+    store = MemoryStore({"a": {"actions": []}, "c": {"actions": [], "source": "c"}})
+
+    results = asyncio.run(store.mget(["c", "b", "a"]))
+
+    assert results == [{"actions": [], "source": "c"}, None, {"actions": []}]
+
+
+class FakePipeline:
+    """记录命令的 Redis pipeline 替身，TTL 取自 ttls"""
+
+    def __init__(self, data, ttls, log):
+        self.data, self.ttls, self.log = data, ttls, log
+        self.results = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def get(self, key):
+        self.results.append(self.data.get(key))
+
+    def mget(self, keys):
+        self.results.append([self.data.get(k) for k in keys])
+
+    def ttl(self, key):
+        self.results.append(self.ttls.get(key, -2))
+
+    def expire(self, key, ttl):
+        self.log.append((key, ttl))
+        self.results.append(True)
+
+    async def execute(self):
+        return self.results
+
+
+def test_redis_store_refreshes_expiring_keys():
+    """剩余 TTL 低于窗口的命中 key 续期为完整 TTL，同一 key 不重复续期"""
+    import json
+
+    store = RedisStore(refresh_window=100, refresh_ttl=3600)
+    data = {k: json.dumps({"actions": [], "source": k}) for k in ("hot", "cold", "forever")}
+    ttls = {"hot": 5, "cold": 3000, "forever": -1}
+    expired = []
+
+    class FakeClient:
+        def pipeline(self, transaction=True):
+            return FakePipeline(data, ttls, expired)
+
+    async def run():
+        store._client, store._loop = FakeClient(), asyncio.get_running_loop()
+        results = await store.mget(["hot", "cold", "forever", "missing"])
+        await store.get("hot")  # 续期进行中，不再重复发起
+        await asyncio.gather(*store._tasks)
+        return results
+
+    results = asyncio.run(run())
+
+    assert [r and r["source"] for r in results] == ["hot", "cold", "forever", None]
+    assert expired == [("hot", 3600)]
+    assert store.stats()["refreshes"] == 1
@@ -0,0 +1,79 @@
+"""
+测试: WebSocket 策略订阅
+验证: 增量合并、指纹不变时不重复推送、多桌独立状态与错误帧，
+      非 JSON / 二进制 / 非对象帧返回错误帧后连接继续可用
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from main import app  # noqa: E402
+
+client = TestClient(app)
+
+BASE_STATE = {
+    "hand_id": "test_ws_001",
+    "table_id": "table_001",
+    "street": "preflop",
+    "hero_pos": "BTN",
+    "effective_stack_bb": 100,
+    "pot_bb": 1.5,
+    "action_line": "OPEN",
+}
+
+
+def test_stream_pushes_only_on_scene_change():
+    """相同场景的增量不触发推送，场景变化时推送新建议"""
+    with client.websocket_connect("/v1/strategy/stream") as ws:
+        ws.send_json(BASE_STATE)
+        first = ws.receive_json()
+        assert first["type"] == "advice"
+        assert first["table_id"] == "table_001"
+
+        # pot 变化不影响场景指纹 -> 不推送；随后改变行动线 -> 推送
+        ws.send_json({"table_id": "table_001", "pot_bb": 3.0})
+        ws.send_json({"table_id": "table_001", "action_line": "RAISE"})
+        second = ws.receive_json()
+        assert second["type"] == "advice"
+        assert second["data"]["scene_fingerprint"] != first["data"]["scene_fingerprint"]
+
+
+def test_stream_tables_are_independent():
+    """不同桌独立维护状态"""
+    with client.websocket_connect("/v1/strategy/stream") as ws:
+        ws.send_json(BASE_STATE)
+        ws.send_json(dict(BASE_STATE, table_id="table_002", hero_pos="SB"))
+        frames = [ws.receive_json(), ws.receive_json()]
+
+        assert [f["table_id"] for f in frames] == ["table_001", "table_002"]
+        assert frames[0]["data"]["scene_fingerprint"] != frames[1]["data"]["scene_fingerprint"]
+
+
+def test_stream_incomplete_state_returns_error():
+    """状态不完整时返回错误帧，连接保持可用"""
+    with client.websocket_connect("/v1/strategy/stream") as ws:
+        ws.send_json({"table_id": "table_003", "street": "preflop"})
+        error = ws.receive_json()
+        assert error["type"] == "error"
+        assert error["table_id"] == "table_003"
+
+        ws.send_json(dict(BASE_STATE, table_id="table_003"))
+        assert ws.receive_json()["type"] == "advice"
+
+
+def test_stream_malformed_frames_keep_connection():
+    """坏帧返回错误帧，同一连接上随后的有效帧照常推送"""
+    with client.websocket_connect("/v1/strategy/stream") as ws:
+        ws.send_text("not json")
+        assert ws.receive_json() == {"type": "error", "detail": "Frame is not valid JSON"}
+        ws.send_bytes(b"\xff\xfe")
+        assert ws.receive_json()["type"] == "error"
+        ws.send_text("[1, 2]")
+        assert ws.receive_json() == {"type": "error", "detail": "Frame must be a JSON object"}
+
+        ws.send_json(dict(BASE_STATE, table_id="table_004"))
+        advice = ws.receive_json()
+        assert advice["type"] == "advice"
+        assert advice["table_id"] == "table_004"
@@ -0,0 +1,98 @@
+"""
+测试: 分阶段追踪与慢请求采样
+验证: Server-Timing 响应头、慢请求环形缓冲与调试端点、栈采样分析器
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+import main  # noqa: E402
+import tracing  # noqa: E402
+from main import app  # noqa: E402
+
+ADMIN_TOKEN = "test-admin-token"
+client = TestClient(app, headers={"X-Admin-Token": ADMIN_TOKEN})
+
+HAND = {
+    "hand_id": "trace_001",
+    "table_id": "table_001",
+    "street": "preflop",
+    "hero_pos": "CO",
+    "effective_stack_bb": 100,
+    "pot_bb": 1.5,
+    "action_line": "OPEN",
+}
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", ADMIN_TOKEN)
+
+
+def test_server_timing_header():
+    """查询响应带各阶段耗时"""
+    response = client.post("/v1/strategy/query", json=HAND)
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    stages = [part.split(";")[0] for part in timing.split(", ")]
+    assert stages == ["parse", "fingerprint", "retrieval", "serialization", "total"]
+
+
+def test_slow_request_ring_buffer():
+    """超过阈值的请求写入缓冲，容量满后丢弃最旧记录"""
+    log = tracing.SlowRequestLog(threshold_ms=1, size=2)
+    for i, total_ms in enumerate([0.5, 2, 3, 4]):
+        trace = tracing.Trace("POST", f"/r{i}")
+        trace.total_ns = int(total_ms * 1e6)
+        log.offer(trace)
+    assert [e["path"] for e in log.recent()] == ["/r3", "/r2"]
+    assert log.stats()["total"] == 3
+
+
+def test_slow_requests_endpoint():
+    """阈值为 0 时每个请求都被记录，含阶段分解与标注"""
+    original = tracing.slow_requests.threshold_ns
+    tracing.slow_requests.threshold_ns = 0
+    try:
+        client.post("/v1/strategy/query", json=HAND)
+    finally:
+        tracing.slow_requests.threshold_ns = original
+
+    entry = client.get("/debug/slow_requests?limit=1").json()["requests"][0]
+    assert entry["path"] == "/v1/strategy/query"
+    assert entry["status"] == 200
+    assert set(entry["stages_ms"]) == {"parse", "fingerprint", "retrieval", "serialization"}
+    assert entry["tags"]["cache_status"] in ("hit", "approx", "miss")
+
+
+def test_sampling_profiler():
+    """对忙碌线程采样得到包含其函数名的 collapsed stacks"""
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_loop)
+    worker.start()
+    profiler = tracing.SamplingProfiler()
+    try:
+        assert profiler.start(worker.ident, seconds=0.2, interval_ms=2)
+        assert not profiler.start(worker.ident, seconds=0.2)  # 同时只允许一次采集
+        profiler.wait(timeout=5)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert profiler.last["samples"] > 0
+    assert any("busy_loop" in line for line in profiler.last["collapsed"])
+
+
+def test_profile_endpoint_validates_duration():
+    assert client.post("/debug/profile?seconds=0").status_code == 422
+    assert client.post("/debug/profile?seconds=600").status_code == 422
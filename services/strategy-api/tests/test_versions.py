@@ -0,0 +1,165 @@
+"""
+测试: 策略版本热切换
+验证: X-Solution-Version 选择已加载版本、VERSION_NOT_AVAILABLE/DEPRECATED 错误码、
+      管理接口后台加载新版本并原子切换当前版本、未配置令牌时管理接口关闭、
+      加载文件限制在 STRATEGY_DATA_DIR 内、重复的加载请求在后台任务开始前即被拒绝
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+import main  # noqa: E402
+from main import SOLUTION_VERSION, activate_version, app, versions  # noqa: E402
+from versions import VersionError, VersionRegistry  # noqa: E402
+
+ADMIN_TOKEN = "test-admin-token"
+client = TestClient(app, headers={"X-Admin-Token": ADMIN_TOKEN})
+
+HAND = {
+    "hand_id": "ver_001",
+    "table_id": "table_001",
+    "street": "preflop",
+    "hero_pos": "BTN",
+    "effective_stack_bb": 100,
+    "pot_bb": 1.5,
+    "action_line": "OPEN",
+}
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", ADMIN_TOKEN)
+
+
+@pytest.fixture
+def restore_versions():
+    """测试结束后恢复缺省版本为当前版本，并移除测试加载的版本"""
+    yield
+    asyncio.run(activate_version(SOLUTION_VERSION))  # 同时恢复存储中的 active version 指针
+    for version in list(versions.versions):
+        versions.discard(version)
+    versions.loading.clear()
+
+
+def test_registry_resolve_and_deprecate():
+    """未指定版本用当前版本；未加载 409；弃用版本显式请求 410"""
+    registry = VersionRegistry("v1")
+    registry.publish(registry.begin("v1"), records=10)
+    assert registry.resolve(None).version == "v1"
+
+    with pytest.raises(VersionError) as e:
+        registry.resolve("v9")
+    assert (e.value.code, e.value.status_code) == ("VERSION_NOT_AVAILABLE", 409)
+
+    registry.publish(registry.begin("v2"), records=10)
+    assert registry.activate("v2") == "v1"
+    registry.deprecate("v1", sunset_date="2026-03-01")
+    with pytest.raises(VersionError) as e:
+        registry.resolve("v1")
+    assert (e.value.code, e.value.status_code) == ("VERSION_DEPRECATED", 410)
+    assert e.value.details["latest_version"] == "v2"
+    assert registry.summary()["deprecated_versions"] == ["v1"]
+
+
+def test_registry_reload_keeps_serving():
+    """重新加载期间旧状态继续服务，发布时整体替换"""
+    registry = VersionRegistry("v1")
+    old = registry.begin("v1")
+    registry.publish(old, records=1)
+    new = registry.begin("v1")
+    assert registry.resolve("v1") is old
+    assert registry.is_loading("v1")
+    registry.publish(new, records=2)
+    assert registry.resolve("v1") is new
+    assert not registry.is_loading("v1")
+
+
+def test_unknown_version_header():
+    """请求未加载版本返回 409 VERSION_NOT_AVAILABLE"""
+    response = client.post(
+        "/v1/strategy/query", json=HAND, headers={"X-Solution-Version": "v9.9.9"}
+    )
+    assert response.status_code == 409
+    error = response.json()["error"]
+    assert error["code"] == "VERSION_NOT_AVAILABLE"
+    assert SOLUTION_VERSION in error["details"]["available_versions"]
+
+
+def test_version_endpoint():
+    response = client.get("/v1/version")
+    assert response.status_code == 200
+    assert response.json()["current_version"] == versions.active
+
+
+def test_hot_swap(restore_versions):
+    """后台加载新版本 → 按请求头选择 → 切换当前版本 → 弃用旧版本"""
+    response = client.post("/admin/versions/v0.2.0/load", json={"activate": False})
+    assert response.status_code == 202
+    assert versions.get("v0.2.0").records == 270  # 示例数据（TestClient 同步执行后台任务）
+    assert versions.active == SOLUTION_VERSION
+
+    response = client.post(
+        "/v1/strategy/query", json=HAND, headers={"X-Solution-Version": "v0.2.0"}
+    )
+    assert response.json()["data"]["solution_version"] == "v0.2.0"
+    assert response.json()["data"]["cache_status"] == "hit"
+
+    response = client.post("/admin/versions/v0.2.0/activate")
+    assert response.json() == {"previous_version": SOLUTION_VERSION, "current_version": "v0.2.0"}
+    response = client.post("/v1/strategy/query", json=HAND)
+    assert response.json()["data"]["solution_version"] == "v0.2.0"
+
+    assert client.post("/admin/versions/v0.2.0/deprecate").status_code == 409  # 当前版本
+    client.post(f"/admin/versions/{SOLUTION_VERSION}/deprecate?sunset_date=2026-03-01")
+    response = client.post(
+        "/v1/strategy/query", json=HAND, headers={"X-Solution-Version": SOLUTION_VERSION}
+    )
+    assert response.status_code == 410
+    assert response.json()["error"]["details"]["sunset_date"] == "2026-03-01"
+
+
+def test_activate_unloaded_version():
+    response = client.post("/admin/versions/v9.9.9/activate")
+    assert response.status_code == 409
+    assert versions.active == SOLUTION_VERSION
+
+
+def test_admin_disabled_without_token(monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+    assert client.post("/admin/versions/v0.2.0/load", json={}).status_code == 503
+    assert client.get("/debug/hot_scenes").status_code == 503
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "other-token")
+    assert client.post("/admin/versions/v0.2.0/load", json={}).status_code == 403
+
+
+def test_load_file_confined_to_data_dir(monkeypatch, tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (tmp_path / "outside.jsonl").write_text("{}\n")
+    monkeypatch.setattr(main, "STRATEGY_DATA_DIR", str(data_dir))
+
+    for file in ("../outside.jsonl", str(tmp_path / "outside.jsonl"), "/etc/passwd"):
+        response = client.post("/admin/versions/v0.2.0/load", json={"file": file})
+        assert response.status_code == 403, file
+    response = client.post("/admin/versions/v0.2.0/load", json={"file": "missing.jsonl"})
+    assert response.status_code == 404
+    assert "v0.2.0" not in versions.versions
+
+
+def test_duplicate_load_rejected_before_task_runs(monkeypatch, restore_versions):
+    """加载状态在返回 202 前登记: 后台任务尚未开始时，第二个请求即得到 409"""
+    tasks = []
+
+    async def pending(state, file, activate):
+        tasks.append(state)
+
+    monkeypatch.setattr(main, "load_version_task", pending)
+    assert client.post("/admin/versions/v0.3.0/load", json={}).status_code == 202
+    assert versions.is_loading("v0.3.0")
+    assert client.post("/admin/versions/v0.3.0/load", json={}).status_code == 409
+    assert [state.version for state in tasks] == ["v0.3.0"]
@@ -0,0 +1,234 @@
+"""
+请求分阶段追踪
+
+    - TracingMiddleware: 纯 ASGI 中间件，为每个 HTTP 请求建立 Trace，
+      响应头附带 Server-Timing（各阶段耗时，毫秒，小数精度）
+    - observe / span: 处理函数内记录阶段耗时（同时计入 metrics 直方图）
+    - 慢请求（总耗时 >= SLOW_REQUEST_MS）连同完整分解写入有界环形缓冲，供调试端点查询
+    - SamplingProfiler: 按需（或慢请求触发）对事件循环线程做栈采样，输出 collapsed stacks
+
+阶段:
+    parse          请求到达 → 处理函数开始（读取 body、路由、Pydantic 校验）
+    fingerprint    场景规范化 + 指纹
+    retrieval      L1 + 存储查询
+    serialization  构造响应体
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from metrics import metrics
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "50"))
+SLOW_REQUEST_BUFFER = int(os.getenv("SLOW_REQUEST_BUFFER", "256"))
+# 慢请求触发采样的时长（秒），0 为关闭
+PROFILE_ON_SLOW_S = float(os.getenv("PROFILE_ON_SLOW_S", "0"))
+
+
+class Trace:
+    """单个请求的阶段耗时与标注"""
+
+    __slots__ = ("method", "path", "start_ns", "total_ns", "status", "spans", "tags", "wall_time")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.start_ns = time.perf_counter_ns()
+        self.total_ns = 0
+        self.status = 0
+        self.spans: List[tuple] = []  # (stage, ns)
+        self.tags: Dict[str, object] = {}
+        self.wall_time = time.time()
+
+    def add(self, stage: str, ns: int) -> None:
+        self.spans.append((stage, ns))
+
+    def server_timing(self) -> str:
+        elapsed_ns = time.perf_counter_ns() - self.start_ns
+        parts = [f"{stage};dur={ns / 1e6:.3f}" for stage, ns in self.spans]
+        parts.append(f"total;dur={elapsed_ns / 1e6:.3f}")
+        return ", ".join(parts)
+
+    def to_dict(self) -> Dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "timestamp": self.wall_time,
+            "total_ms": round(self.total_ns / 1e6, 3),
+            "stages_ms": {stage: round(ns / 1e6, 3) for stage, ns in self.spans},
+            "tags": self.tags,
+        }
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("strategy_trace", default=None)
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+def observe(stage: str, ns: int) -> None:
+    """记录阶段耗时: 计入 metrics 直方图，并附加到当前请求的 Trace"""
+    metrics.observe(stage, ns)
+    trace = _current.get()
+    if trace is not None:
+        trace.add(stage, ns)
+
+
+def begin_handler(start_ns: int) -> None:
+    """处理函数开始: 记录 parse 阶段（中间件入口 → 处理函数）"""
+    trace = _current.get()
+    if trace is not None:
+        observe("parse", start_ns - trace.start_ns)
+
+
+def annotate(**tags) -> None:
+    """为当前请求附加标注（版本、缓存状态等），随慢请求记录输出"""
+    trace = _current.get()
+    if trace is not None:
+        trace.tags.update(tags)
+
+
+@contextmanager
+def span(stage: str):
+    """计时代码块: with tracing.span("stage"): ..."""
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter_ns() - start)
+
+
+class SlowRequestLog:
+    """慢请求环形缓冲（超出容量丢弃最旧的记录）"""
+
+    def __init__(self, threshold_ms: float = SLOW_REQUEST_MS, size: int = SLOW_REQUEST_BUFFER):
+        self.threshold_ns = int(threshold_ms * 1e6)
+        self.entries: deque = deque(maxlen=size)
+        self.total = 0
+
+    def offer(self, trace: Trace) -> bool:
+        if trace.total_ns < self.threshold_ns:
+            return False
+        self.entries.append(trace.to_dict())
+        self.total += 1
+        return True
+
+    def recent(self, limit: int = 50) -> List[Dict]:
+        """最近的慢请求，新的在前"""
+        return list(reversed(self.entries))[:limit]
+
+    def stats(self) -> Dict:
+        return {
+            "threshold_ms": self.threshold_ns / 1e6,
+            "capacity": self.entries.maxlen,
+            "buffered": len(self.entries),
+            "total": self.total,
+        }
+
+
+class SamplingProfiler:
+    """
+    栈采样分析器（无外部依赖）
+
+    后台线程按固定间隔读取目标线程（事件循环线程）的当前栈，
+    聚合为 collapsed stacks（"a;b;c 次数"，可直接生成火焰图）。
+    同一时间只运行一次采集。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.last: Optional[Dict] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, thread_id: int, seconds: float, interval_ms: float = 5.0,
+              reason: str = "manual") -> bool:
+        """开始采集，已在采集中时返回 False"""
+        with self._lock:
+            if self.running:
+                return False
+            self._thread = threading.Thread(
+                target=self._run, args=(thread_id, seconds, interval_ms / 1000, reason),
+                name="sampling-profiler", daemon=True,
+            )
+            self._thread.start()
+            return True
+
+    def _run(self, thread_id: int, seconds: float, interval: float, reason: str) -> None:
+        stacks: Counter = Counter()
+        samples = 0
+        started = time.time()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                break
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            stacks[";".join(reversed(names))] += 1
+            samples += 1
+            time.sleep(interval)
+        self.last = {
+            "reason": reason,
+            "started_at": started,
+            "duration_s": round(time.time() - started, 3),
+            "interval_ms": interval * 1000,
+            "samples": samples,
+            "collapsed": [f"{stack} {n}" for stack, n in stacks.most_common()],
+        }
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+
+slow_requests = SlowRequestLog()
+profiler = SamplingProfiler()
+
+
+class TracingMiddleware:
+    """纯 ASGI 中间件（避免 BaseHTTPMiddleware 的额外 task 与流包装开销）"""
+
+    def __init__(self, app, slow_log: SlowRequestLog = slow_requests,
+                 profile_on_slow_s: float = PROFILE_ON_SLOW_S):
+        self.app = app
+        self.slow_log = slow_log
+        self.profile_on_slow_s = profile_on_slow_s
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(scope["method"], scope["path"])
+        token = _current.set(trace)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            trace.total_ns = time.perf_counter_ns() - trace.start_ns
+            if self.slow_log.offer(trace) and self.profile_on_slow_s > 0:
+                profiler.start(threading.get_ident(), self.profile_on_slow_s, reason="slow_request")
@@ -0,0 +1,160 @@
+"""
+策略版本注册表
+
+记录进程内已加载的策略版本及其状态，支持:
+    - 后台加载新版本（loading -> ready），加载期间旧版本照常服务
+    - 原子切换当前版本指针（单次赋值，请求要么看到旧版本要么看到新版本）
+    - 按请求 X-Solution-Version 选择已加载版本，错误码见 docs/version_strategy.md
+"""
+import time
+from typing import Dict, List, Optional
+
+from neighbors import NeighborIndex
+
+STATUS_LOADING = "loading"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+
+class VersionError(Exception):
+    """版本协商失败（映射为 docs/version_strategy.md 中的错误响应）"""
+
+    def __init__(self, code: str, status_code: int, message: str, details: Dict):
+        super().__init__(message)
+        self.code = code
+        self.status_code = status_code
+        self.message = message
+        self.details = details
+
+    def to_response(self) -> Dict:
+        return {
+            "success": False,
+            "error": {"code": self.code, "message": self.message, "details": self.details},
+        }
+
+
+class VersionState:
+    """单个版本的加载状态与其近邻索引"""
+
+    def __init__(self, version: str):
+        self.version = version
+        self.status = STATUS_LOADING
+        self.neighbor_index = NeighborIndex()
+        self.records = 0
+        self.started_at = time.time()
+        self.ready_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.deprecated = False
+        self.sunset_date: Optional[str] = None
+
+    def info(self) -> Dict:
+        return {
+            "version": self.version,
+            "status": self.status,
+            "records": self.records,
+            "neighbor_scenes": len(self.neighbor_index),
+            "started_at": self.started_at,
+            "ready_at": self.ready_at,
+            "deprecated": self.deprecated,
+            "sunset_date": self.sunset_date,
+            "error": self.error,
+        }
+
+
+class VersionRegistry:
+    """已加载版本 + 当前版本指针"""
+
+    def __init__(self, active: str):
+        self.active = active
+        self.versions: Dict[str, VersionState] = {}
+        self.loading: Dict[str, VersionState] = {}
+
+    def begin(self, version: str) -> VersionState:
+        """开始加载某版本（重新加载时旧状态在新状态发布前继续服务）"""
+        state = VersionState(version)
+        self.loading[version] = state
+        return state
+
+    def publish(self, state: VersionState, records: int) -> None:
+        """加载完成，版本可被请求选择（单次赋值替换旧状态）"""
+        state.records = records
+        state.status = STATUS_READY
+        state.ready_at = time.time()
+        self.versions[state.version] = state
+        self.loading.pop(state.version, None)
+
+    def fail(self, state: VersionState, error: str) -> None:
+        """加载失败: 已发布的同名版本不受影响，失败状态保留在 loading 中供查询"""
+        state.status = STATUS_FAILED
+        state.error = error
+
+    def discard(self, version: str) -> None:
+        """移除版本（不能移除当前版本）"""
+        if version != self.active:
+            self.versions.pop(version, None)
+
+    def require(self, version: str) -> VersionState:
+        """已加载完成的版本，否则抛出 VERSION_NOT_AVAILABLE"""
+        state = self.versions.get(version)
+        if state is None or state.status != STATUS_READY:
+            raise VersionError(
+                "VERSION_NOT_AVAILABLE", 409,
+                f"Version {version} is not available",
+                {"requested_version": version, "available_versions": self.supported()},
+            )
+        return state
+
+    def activate(self, version: str) -> str:
+        """原子切换当前版本（取消其弃用标记），返回旧版本"""
+        self.require(version).deprecated = False
+        previous, self.active = self.active, version
+        return previous
+
+    def deprecate(self, version: str, sunset_date: Optional[str] = None) -> None:
+        """标记弃用: 显式请求该版本返回 VERSION_DEPRECATED"""
+        state = self.require(version)
+        state.deprecated = True
+        state.sunset_date = sunset_date
+
+    def get(self, version: str) -> Optional[VersionState]:
+        return self.versions.get(version)
+
+    def is_loading(self, version: str) -> bool:
+        state = self.loading.get(version)
+        return state is not None and state.status == STATUS_LOADING
+
+    def resolve(self, requested: Optional[str]) -> VersionState:
+        """请求版本 -> 已加载版本状态；未指定时使用当前版本"""
+        version = requested or self.active
+        state = self.require(version)
+        if state.deprecated and requested:
+            raise VersionError(
+                "VERSION_DEPRECATED", 410,
+                f"Version {version} is deprecated, please upgrade to {self.active}",
+                {
+                    "requested_version": version,
+                    "latest_version": self.active,
+                    "sunset_date": state.sunset_date,
+                },
+            )
+        return state
+
+    def supported(self) -> List[str]:
+        return sorted(
+            v for v, s in self.versions.items() if s.status == STATUS_READY and not s.deprecated
+        )
+
+    def deprecated_versions(self) -> List[str]:
+        return sorted(v for v, s in self.versions.items() if s.deprecated)
+
+    def info(self) -> List[Dict]:
+        states = {**self.versions, **self.loading}
+        return [states[v].info() for v in sorted(states)]
+
+    def summary(self) -> Dict:
+        return {
+            "current_version": self.active,
+            "supported_versions": self.supported(),
+            "deprecated_versions": self.deprecated_versions(),
+            "latest_version": self.active,
+        }
@@ -27,7 +27,7 @@ cd services/strategy-api
 
 # 激活venv并启动
 source .venv/bin/activate
-python main.py &
+python serve.py --workers "${API_WORKERS:-1}" &
 API_PID=$!
 cd ../..
 